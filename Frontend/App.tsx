@@ -1,5 +1,5 @@
 
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useMemo, useRef } from 'react';
 import Sidebar from './components/Sidebar';
 import TopologyGraph from './components/TopologyGraph';
 import TrafficChart from './components/TrafficChart';
@@ -10,7 +10,7 @@ import DashboardFooter from './components/DashboardFooter';
 import ReportView from './components/ReportView';
 import { GoogleGenAI } from "@google/genai";
 import { INITIAL_TOPOLOGY, BASE_COST_PER_GBPS, LINKS } from './constants';
-import { fetchTraffic, fetchLinkStats, fetchFinancials, fetchTopology, API_BASE_URL } from './services/api';
+import { fetchDashboard, trafficWithCapacity, API_BASE_URL } from './services/api';
 import { TrafficDataPoint, LinkStats, Financials, Topology } from './types';
 import LoginPage from './components/Auth/LoginPage';
 import SignupPage from './components/Auth/SignupPage';
@@ -58,8 +58,11 @@ const App: React.FC = () => {
 
   // Data States
   const [topology, setTopology] = useState<Topology>(INITIAL_TOPOLOGY);
-  const [points, setPoints] = useState<TrafficDataPoint[]>([]);
-  const [stats, setStats] = useState<LinkStats>({
+  // Stats and raw traffic rows of every link, streamed once; optimization is refetched per buffer size
+  const [linkData, setLinkData] = useState<Record<string, { stats: LinkStats; traffic: any[] }>>({});
+  const [optimization, setOptimization] = useState<Record<string, any>>({});
+  const linksLoaded = useRef(false);
+  const stats = useMemo<LinkStats>(() => linkData[selectedLink]?.stats ?? {
     id: selectedLink,
     name: selectedLink,
     p99: 0,
@@ -68,7 +71,13 @@ const App: React.FC = () => {
     peak: 0,
     utilization: 0,
     cellCount: 0
-  });
+  }, [linkData, selectedLink]);
+  const points = useMemo<TrafficDataPoint[]>(() => {
+    const traffic = linkData[selectedLink]?.traffic;
+    if (!traffic) return [];
+    const linkOpt = optimization[selectedLink];
+    return trafficWithCapacity(traffic, linkOpt ? linkOpt.optimal_capacity : 100);
+  }, [linkData, optimization, selectedLink]);
   const [financials, setFinancials] = useState<Financials>({
     totalSavings: 0,
     capexReduction: 0,
@@ -84,62 +93,53 @@ const App: React.FC = () => {
     }
   }, [isDarkMode]);
 
-  // Fetch Topology on Mount
+  // Topology and per-link traffic don't depend on buffer size or cost: stream them once,
+  // the selected link first so it paints before the others arrive
   useEffect(() => {
-    const loadTopology = async () => {
-      try {
-        const data = await fetchTopology();
+    if (view !== 'dashboard' || linksLoaded.current) return;
+
+    const controller = new AbortController();
+    fetchDashboard(selectedLink, bufferSize, cost, {
+      onTopology: (data) => {
         setTopology(data);
         setLogs(prev => [...prev, 'Topology data loaded from backend.']);
-      } catch (error) {
-        console.error("Failed to load topology", error);
-        setLogs(prev => [...prev, 'Error: Failed to load topology. Using cached default.']);
+      },
+      onLink: (linkId, linkStats, traffic) => {
+        setLinkData(prev => ({ ...prev, [linkId]: { stats: linkStats, traffic } }));
+        if (linkId === selectedLink) setLogs(prev => [...prev, `DEBUG STATS: ${JSON.stringify(linkStats)}`]);
       }
-    };
-    if (view === 'dashboard') {
-      loadTopology();
-    }
+    }, { sections: ['topology', 'links'], signal: controller.signal })
+      .then(() => { linksLoaded.current = true; })
+      .catch((error) => {
+        if (controller.signal.aborted) return;
+        console.error("Failed to fetch dashboard", error);
+        setLogs(prev => [...prev, `Error: Dashboard load failed: ${error}`]);
+      });
+
+    return () => controller.abort();
   }, [view]);
 
-  // Fetch Data when parameters change
+  // Buffer size and cost only change the optimization and financials. Each change cancels
+  // the previous request, so a slower older response can't overwrite a newer one.
   useEffect(() => {
     if (view !== 'dashboard') return;
 
-    const loadData = async () => {
-      // Independent fetches to prevent cascade failure
-
-      // 1. Traffic Data
-      try {
-        const trafficDisplay = await fetchTraffic(selectedLink, bufferSize);
-        setPoints(trafficDisplay);
-      } catch (error) {
-        console.error("Failed to fetch traffic", error);
-        setLogs(prev => [...prev, `Error: Traffic load failed for ${selectedLink}`]);
-      }
-
-      // 2. Link Statistics (P99, P95, etc.)
-      try {
-        const linkStats = await fetchLinkStats(selectedLink);
-        setStats(linkStats);
-        setLogs(prev => [...prev, `DEBUG STATS: ${JSON.stringify(linkStats)}`]);
-      } catch (error) {
-        console.error("Failed to fetch link stats", error);
-        setLogs(prev => [...prev, `Error: Statistics failed for ${selectedLink}`]);
-      }
-
-      // 3. Financials
-      try {
-        const finData = await fetchFinancials(bufferSize, cost);
+    const controller = new AbortController();
+    fetchDashboard(selectedLink, bufferSize, cost, {
+      onOptimization: setOptimization,
+      onFinancials: (finData) => {
         setFinancials(finData);
         setLogs(prev => [...prev, `DEBUG FIN: ${JSON.stringify(finData)}`]);
-      } catch (error) {
-        console.error("Failed to fetch financials", error);
-        setLogs(prev => [...prev, `Error: Financial calc failed: ${error}`]);
       }
-    };
-
-    loadData();
-  }, [selectedLink, bufferSize, cost, view]);
+    }, { sections: ['optimization', 'financials'], signal: controller.signal })
+      .catch((error) => {
+        if (controller.signal.aborted) return;
+        console.error("Failed to fetch optimization", error);
+        setLogs(prev => [...prev, `Error: Optimization failed for ${bufferSize}µs: ${error}`]);
+      });
+
+    return () => controller.abort();
+  }, [bufferSize, cost, view]);
 
   useEffect(() => {
     if (view === 'dashboard') {
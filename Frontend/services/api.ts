@@ -27,11 +27,8 @@ const mapFrontendToBackendId = (frontendId: string): string => {
     return REVERSE_LINK_ID_MAP[frontendId] || frontendId;
 };
 
-export const fetchTopology = async (): Promise<Topology> => {
-    const response = await fetch(`${API_BASE_URL}/topology`);
-    const data = await response.json();
-
-    // Transform backend topology to frontend structure
+// Transform backend topology to frontend structure
+const mapTopology = (data: any): Topology => {
     const nodes = data.nodes.map((n: any) => {
         let id = n.id;
         if (n.group === 'link') {
@@ -78,23 +75,44 @@ export const fetchTopology = async (): Promise<Topology> => {
     return { nodes, links };
 };
 
+// Backend: { peak_gbps, p99_gbps, p95_gbps, avg_gbps, link_id }
+const mapLinkStats = (linkId: string, data: any, cellCount: number = 8): LinkStats => ({
+    id: linkId,
+    name: linkId,
+    p99: data.p99_gbps,
+    p95: data.p95_gbps,
+    avg: data.avg_gbps,
+    peak: data.peak_gbps,
+    utilization: (data.avg_gbps / (data.peak_gbps + 20)) * 100, // Rough estimate if not provided
+    cellCount
+});
+
+const mapTraffic = (data: any[], capacity: number): TrafficDataPoint[] =>
+    data.map((d: any) => ({
+        time: new Date(d.time * 1000).toISOString().substr(11, 8), // Assuming timestamp is epoch seconds
+        actual: d.gbps,
+        capacity: capacity,
+        burst: 0 // Backend doesn't give burst metric currently
+    }));
+
+// Backend: { estimated_savings, total_peak_capacity_gbps, total_optimal_capacity_gbps, ... }
+const mapFinancials = (data: any): Financials => ({
+    totalSavings: data.estimated_savings,
+    capexReduction: data.estimated_savings * 0.7, // Assuming 70% is CapEx
+    efficiencyGain: (data.saved_capacity_gbps / data.total_optimal_capacity_gbps) * 100 // Rough calc
+});
+
+export const fetchTopology = async (): Promise<Topology> => {
+    const response = await fetch(`${API_BASE_URL}/topology`);
+    return mapTopology(await response.json());
+};
+
 export const fetchLinkStats = async (linkId: string): Promise<LinkStats> => {
     const backendId = mapFrontendToBackendId(linkId);
     const response = await fetch(`${API_BASE_URL}/stats/${backendId}`);
     if (!response.ok) throw new Error('Failed to fetch stats');
-    const data = await response.json();
-
-    // Backend: { peak_gbps, p99_gbps, p95_gbps, avg_gbps, link_id }
-    return {
-        id: linkId,
-        name: linkId,
-        p99: data.p99_gbps,
-        p95: data.p95_gbps,
-        avg: data.avg_gbps,
-        peak: data.peak_gbps,
-        utilization: (data.avg_gbps / (data.peak_gbps + 20)) * 100, // Rough estimate if not provided
-        cellCount: 8 // Backend doesn't return cell count in stats, hardcode or fetch from topology
-    };
+    // Backend doesn't return cell count in stats, hardcode or fetch from topology
+    return mapLinkStats(linkId, await response.json());
 };
 
 export const fetchTraffic = async (linkId: string, bufferSize: number): Promise<TrafficDataPoint[]> => {
@@ -115,12 +133,7 @@ export const fetchTraffic = async (linkId: string, bufferSize: number): Promise<
     const linkOpt = optData[backendId];
     const capacity = linkOpt ? linkOpt.optimal_capacity : 100;
 
-    return data.map((d: any) => ({
-        time: new Date(d.time * 1000).toISOString().substr(11, 8), // Assuming timestamp is epoch seconds
-        actual: d.gbps,
-        capacity: capacity,
-        burst: 0 // Backend doesn't give burst metric currently
-    }));
+    return mapTraffic(data, capacity);
 };
 
 export const fetchFinancials = async (bufferSize: number, costPerGbps: number): Promise<Financials> => {
@@ -130,14 +143,75 @@ export const fetchFinancials = async (bufferSize: number, costPerGbps: number):
         body: JSON.stringify({ buffer_size_us: bufferSize, cost_per_gbps: costPerGbps })
     });
     if (!response.ok) throw new Error('Failed to fetch financials');
-    const data = await response.json();
+    return mapFinancials(await response.json());
+};
 
-    // Backend: { estimated_savings, total_peak_capacity_gbps, total_optimal_capacity_gbps, ... }
-    return {
-        totalSavings: data.estimated_savings,
-        capexReduction: data.estimated_savings * 0.7, // Assuming 70% is CapEx
-        efficiencyGain: (data.saved_capacity_gbps / data.total_optimal_capacity_gbps) * 100 // Rough calc
+export interface DashboardHandlers {
+    onTopology?: (topology: Topology) => void;
+    onLink?: (linkId: string, stats: LinkStats, traffic: any[]) => void;
+    onOptimization?: (optimization: Record<string, any>) => void;
+    onFinancials?: (financials: Financials) => void;
+}
+
+export type DashboardSection = 'topology' | 'links' | 'optimization' | 'financials';
+
+export interface DashboardOptions {
+    // Subset to stream (default: all); the topology and links don't depend on buffer size or cost
+    sections?: DashboardSection[];
+    // Aborting cancels the request and stops the handlers from firing
+    signal?: AbortSignal;
+}
+
+// Backend traffic rows for a link, turned into chart points once its capacity is known
+export const trafficWithCapacity = mapTraffic;
+
+/**
+ * Everything the dashboard needs in one request. The backend streams NDJSON
+ * ({"section", "data"} per line: topology, each link with linkId's first,
+ * optimization, financials), and each handler fires as soon as its section
+ * has arrived instead of after the whole response.
+ */
+export const fetchDashboard = async (
+    linkId: string, bufferSize: number, costPerGbps: number, handlers: DashboardHandlers,
+    { sections, signal }: DashboardOptions = {}
+): Promise<void> => {
+    const params = new URLSearchParams({
+        buffer_size_us: String(bufferSize),
+        cost_per_gbps: String(costPerGbps),
+        link: mapFrontendToBackendId(linkId)
+    });
+    if (sections) params.set('sections', sections.join(','));
+    const response = await fetch(`${API_BASE_URL}/dashboard?${params}`, { signal });
+    if (!response.ok || !response.body) throw new Error('Failed to fetch dashboard');
+
+    const handle = (line: string) => {
+        if (!line.trim() || signal?.aborted) return;
+        const { section, data } = JSON.parse(line);
+        if (section === 'topology') handlers.onTopology?.(mapTopology(data));
+        else if (section === 'link') {
+            const id = mapBackendToFrontendId(data.link_id);
+            handlers.onLink?.(id, mapLinkStats(id, data.stats, data.cells.length), data.traffic);
+        }
+        else if (section === 'optimization') {
+            // Keyed by frontend link ID
+            handlers.onOptimization?.(Object.fromEntries(
+                Object.entries(data).map(([id, opt]) => [mapBackendToFrontendId(id), opt])));
+        }
+        else if (section === 'financials') handlers.onFinancials?.(mapFinancials(data));
     };
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffered += decoder.decode(value, { stream: true });
+        const lines = buffered.split('\n');
+        buffered = lines.pop() ?? '';
+        lines.forEach(handle);
+    }
+    handle(buffered + decoder.decode());
 };
 
 export const fetchOptimization = async (bufferSize: number) => {
@@ -19,7 +19,7 @@ export interface LinkStats {
 
 export interface Node {
   id: string;
-  group: 'link' | 'cell';
+  group: 'link' | 'cell' | 'core' | 'uplink'; // core/uplink: aggregation tiers from hierarchy.json
   x?: number;
   y?: number;
 }
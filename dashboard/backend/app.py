@@ -1,14 +1,25 @@
-from flask import Flask, jsonify, request
+from flask import Blueprint, Flask, Response, abort, g, jsonify, request, stream_with_context
 from flask_cors import CORS
 try:
-    from .logic import NetworkLogic
+    from .auth import AuthOverloaded, HashPool, TTLCache
+    from .logic import DASHBOARD_SECTIONS, DEFAULT_COST_PER_GBPS, TIERS, warm_up_kernels
+    from .metrics import init_metrics
+    from .profiling import init_profiling, request_timings, span
+    from .registry import DatasetRegistry, UnknownSiteError
+    from .reloader import DatasetReloader
 except ImportError:
-    from logic import NetworkLogic
+    from auth import AuthOverloaded, HashPool, TTLCache
+    from logic import DASHBOARD_SECTIONS, DEFAULT_COST_PER_GBPS, TIERS, warm_up_kernels
+    from metrics import init_metrics
+    from profiling import init_profiling, request_timings, span
+    from registry import DatasetRegistry, UnknownSiteError
+    from reloader import DatasetReloader
+import json
 import os
+import threading
 from dotenv import load_dotenv
-from flask_pymongo import PyMongo
 from flask_bcrypt import Bcrypt
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import JWTManager, create_access_token, current_user, jwt_required, get_jwt_identity
 from datetime import timedelta
 
 # Load environment variables
@@ -20,30 +31,135 @@ app.config["MONGO_URI"] = os.getenv("MONGO_URI")
 app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "fallback-secret-key")
 app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(days=1)
 
-print(f"Loaded MONGO_URI: {app.config['MONGO_URI'][:20]}...")
+# Only the scheme: the rest of the URI carries credentials
+mongo_uri = app.config["MONGO_URI"]
+print(f"Loaded MONGO_URI: {mongo_uri.split('://')[0] + '://...' if mongo_uri else 'not set'}")
+
+# Connection pool per worker process. A request that can't get a connection within
+# waitQueueTimeoutMS fails fast instead of holding its thread.
+MONGO_POOL_OPTIONS = {
+    "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "20")),
+    "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+    "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000")),
+    "waitQueueTimeoutMS": int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000")),
+    "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+}
+
+def ensure_user_indexes(db):
+    """Unique index on users.email, so sign-up and login lookups never scan the collection."""
+    from pymongo.errors import DuplicateKeyError
+    # An index on email that already exists (e.g. one made by hand) serves the lookups as it is;
+    # creating another on the same key with other options would fail with IndexOptionsConflict
+    if any(list(index["key"]) == [("email", 1)] for index in db.users.index_information().values()):
+        return
+    try:
+        db.users.create_index("email", unique=True)
+    except DuplicateKeyError as e:
+        # Existing duplicate emails: still index the lookups, without the constraint
+        print(f"Could not create unique index on users.email ({e}); creating a non-unique one.")
+        db.users.create_index("email")
+
+class LazyMongo:
+    """
+    PyMongo created on first database access rather than at import, so boot
+    doesn't pay for importing the driver and starting its TLS monitors, and
+    the dataset routes work without a reachable MongoDB. The first access
+    also creates the indexes the auth routes rely on. NETOPTIC_MONGO_MOCK=1
+    swaps in an in-memory mongomock database for local testing.
+    """
+    def __init__(self, app, **kwargs):
+        self._app = app
+        self._kwargs = kwargs
+        self._db = None
+        self._lock = threading.Lock()
+
+    @property
+    def db(self):
+        if self._db is None:
+            with self._lock:
+                if self._db is None:
+                    self._db = self._connect()
+        return self._db
+
+    def _connect(self):
+        if os.getenv("NETOPTIC_MONGO_MOCK", "0") == "1":
+            import mongomock
+            db = mongomock.MongoClient().get_database("netoptic")
+        else:
+            from flask_pymongo import PyMongo
+            db = PyMongo(self._app, **self._kwargs).db
+        ensure_user_indexes(db)
+        return db
 
 # Fix for Render/MongoDB Atlas SSL Handshake Error (Updated Force Push)
-# Fix for Render/MongoDB Atlas SSL Handshake Error (Updated Force Push)
-import ssl
 import certifi
 app.config["MONGO_TLS_CA_FILE"] = certifi.where()
-mongo = PyMongo(app, tls=True, tlsCAFile=certifi.where())
+mongo = LazyMongo(app, tls=True, tlsCAFile=certifi.where(), **MONGO_POOL_OPTIONS)
 bcrypt = Bcrypt(app)
 jwt = JWTManager(app)
 
+# Password hashing runs on a small bounded pool; sign-ins past AUTH_HASH_QUEUE get a 503
+hash_pool = HashPool(workers=int(os.getenv("AUTH_HASH_WORKERS", "2")),
+                     max_pending=int(os.getenv("AUTH_HASH_QUEUE", "16")),
+                     timeout=float(os.getenv("AUTH_HASH_TIMEOUT", "10")))
+# User lookups behind JWT-protected routes, cached for AUTH_CACHE_TTL seconds (0 disables)
+user_cache = TTLCache(ttl=float(os.getenv("AUTH_CACHE_TTL", "30")))
+# Token-only sign-in without a database, for demos (NETOPTIC_MOCK_AUTH=0 uses MongoDB)
+MOCK_AUTH = os.getenv("NETOPTIC_MOCK_AUTH", "1") != "0"
+MOCK_USER_ID = "mock_user_id"
+
 # Allow all origins for the hackathon demo to prevent any CORS issues
 CORS(app, resources={r"/*": {"origins": "*"}})
 
+# Request latency/count instrumentation and the /metrics endpoint
+init_metrics(app)
+# Server-Timing phase breakdown on every response; sampling profiles for requests carrying PROFILE_TOKEN
+init_profiling(app)
+
 # Initialize Logic (Loads Data)
 # Assumes we run this from dashboard/backend, so data is up 2 levels
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-DATA_DIR = os.path.join(BASE_DIR, "output")
+DATA_DIR = os.getenv("NETOPTIC_DATA_DIR", os.path.join(BASE_DIR, "output"))
+
+# Reloaded in the background whenever Phase 2 rewrites output/ (NETOPTIC_RELOAD_INTERVAL=0 disables)
+reloader = DatasetReloader(DATA_DIR, interval=float(os.getenv("NETOPTIC_RELOAD_INTERVAL", "5")))
+reloader.start()
 
-logic = NetworkLogic(DATA_DIR)
+# Compile (or load from numba's on-disk cache) the simulation kernels now, not on the first request
+if os.getenv("NETOPTIC_WARMUP", "1") != "0":
+    warm_up_kernels()
+
+# Additional sites, one subdirectory each, served under /api/<site>/... and loaded on demand
+SITES_DIR = os.getenv("NETOPTIC_SITES_DIR", os.path.join(BASE_DIR, "sites"))
+SITES_MEMORY_BUDGET_MB = float(os.getenv("NETOPTIC_SITES_MEMORY_MB", "2048"))
+registry = DatasetRegistry(SITES_DIR, int(SITES_MEMORY_BUDGET_MB * 1024 * 1024))
+
+site_api = Blueprint("site_api", __name__, url_prefix="/api/<site>")
+
+@site_api.url_value_preprocessor
+def load_site(endpoint, values):
+    site = values.pop("site")
+    try:
+        with span("load"):
+            g.logic = registry.get(site)
+    except UnknownSiteError:
+        abort(404, description=f"Unknown site '{site}'")
+
+@app.before_request
+def pin_dataset():
+    # Runs after load_site; the whole request sees one dataset version even if a reload lands mid-request
+    if "logic" not in g:
+        g.logic = reloader.current
+
+def current_logic():
+    """Dataset for this request: the site's under /api/<site>/..., the default one otherwise."""
+    if "logic" not in g:
+        g.logic = reloader.current
+    return g.logic
 
 @app.route('/health', methods=['GET'])
 def health():
-    return jsonify({"status": "ok"})
+    return jsonify({"status": "ok", "dataset_version": reloader.version})
 
 @app.route('/', methods=['GET'])
 def root():
@@ -53,73 +169,205 @@ def root():
             "/api/topology",
             "/api/optimize",
             "/api/financials",
-            "/health"
+            "/api/whatif",
+            "/api/sites",
+            "/api/<site>/topology",
+            "/health",
+            "/metrics"
         ]
     })
 
 @app.route('/api/topology', methods=['GET'])
 def get_topology():
-    return jsonify(logic.get_topology())
+    return jsonify(current_logic().get_topology())
 
 @app.route('/api/optimize', methods=['POST'])
 def optimize():
     data = request.json
     buffer_us = data.get('buffer_size_us', 143)
     buffer_sec = float(buffer_us) / 1e6
-    
-    results = logic.find_optimal_capacity(buffer_sec)
+    # Optional error bars: {"bootstrap": 500, "confidence": 0.95}
+    try:
+        results = current_logic().find_optimal_capacity(
+            buffer_sec, data.get('bootstrap', 0), data.get('confidence', 0.95))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     return jsonify(results)
 
 @app.route('/api/financials', methods=['POST'])
 def financials():
     data = request.json
     buffer_us = data.get('buffer_size_us', 143)
-    cost_per_gbps = data.get('cost_per_gbps', 5000) # Default to $5000/Gbps (Enterprise/Telco scale)
+    cost_per_gbps = data.get('cost_per_gbps', DEFAULT_COST_PER_GBPS)
     
     buffer_sec = float(buffer_us) / 1e6
-    results = logic.calculate_financials(buffer_sec, cost_per_gbps)
+    results = current_logic().calculate_financials(buffer_sec, cost_per_gbps)
     return jsonify(results)
 
+@app.route('/api/whatif', methods=['POST'])
+def what_if():
+    data = request.json or {}
+    buffer_us = data.get('buffer_size_us', 143)
+    buffer_sec = float(buffer_us) / 1e6
+    
+    try:
+        results = current_logic().what_if(data.get('moves', []), buffer_sec)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(results)
+
+@app.route('/api/capacity/windows/<link_id>', methods=['GET'])
+def get_capacity_windows(link_id):
+    window_sec = request.args.get('window_sec', 1.0, type=float)
+    buffer_sec = request.args.get('buffer_size_us', 143, type=float) / 1e6
+    carry_state = request.args.get('carry', '0') in ('1', 'true')
+    
+    try:
+        data = current_logic().find_windowed_capacity(link_id, window_sec, buffer_sec, carry_state)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(data)
+
+@app.route('/api/hierarchy', methods=['GET'])
+def get_hierarchy():
+    # Per-tier buffers, e.g. ?link_buffer_us=143&switch_buffer_us=500&uplink_buffer_us=1000&tiers=switch,uplink
+    buffers_sec = {tier: request.args.get(f'{tier}_buffer_us', 143, type=float) / 1e6 for tier in TIERS}
+    tiers = request.args.get('tiers', ','.join(TIERS)).split(',')
+    
+    try:
+        data = current_logic().find_hierarchical_capacity(buffers_sec, tiers)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(data)
+
+@app.route('/api/dashboard', methods=['GET'])
+def get_dashboard():
+    """
+    Topology, per-link stats/traffic, optimization and financials in one
+    round trip, streamed as NDJSON ({"section": ..., "data": ...} per line)
+    so the client can render each part as soon as it arrives.
+    ?sections=optimization,financials limits it to those sections.
+    """
+    buffer_sec = request.args.get('buffer_size_us', 143, type=float) / 1e6
+    cost_per_gbps = request.args.get('cost_per_gbps', DEFAULT_COST_PER_GBPS, type=float)
+    wanted = [s for s in request.args.get('sections', ','.join(DASHBOARD_SECTIONS)).split(',') if s]
+    unknown = set(wanted) - set(DASHBOARD_SECTIONS)
+    if unknown:
+        return jsonify({"error": f"Unknown dashboard section(s): {', '.join(sorted(unknown))}"}), 400
+    sections = current_logic().dashboard_sections(buffer_sec, cost_per_gbps, request.args.get('link', type=int),
+                                                  wanted)
+    
+    def generate():
+        for section, data in sections:
+            with span("serialize"):
+                line = json.dumps({"section": section, "data": data})
+            yield line + "\n"
+        # Streamed responses get no Server-Timing header (it is sent before the body runs)
+        yield json.dumps({"section": "timing", "data": request_timings()}) + "\n"
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
 
 @app.route('/api/stats/<link_id>', methods=['GET'])
 def get_stats(link_id):
-    data = logic.get_link_stats(link_id)
+    data = current_logic().get_link_stats(link_id)
     return jsonify(data)
 
 @app.route('/api/traffic/<link_id>', methods=['GET'])
 def get_traffic(link_id):
-    data = logic.get_traffic_sample(link_id)
+    data = current_logic().get_traffic_sample(link_id)
     return jsonify(data)
 
 @app.route('/api/images/<path:filename>')
 def serve_image(filename):
     from flask import send_from_directory
-    return send_from_directory(DATA_DIR, filename)
+    return send_from_directory(current_logic().data_dir, filename)
 
 @app.route('/api/report/capacity', methods=['GET'])
 def get_capacity_report():
+    # Parsed once per dataset version, so this never touches the disk
+    return jsonify(current_logic().capacity_report)
+
+@app.route('/api/report/multiplexing', methods=['GET'])
+def get_multiplexing_report():
+    """Pairwise/group multiplexing gains written by multiplexing.py."""
     import pandas as pd
     try:
-        csv_path = os.path.join(DATA_DIR, "link_capacity_estimates.csv")
+        csv_path = os.path.join(current_logic().data_dir, "multiplexing_gains.csv")
         if os.path.exists(csv_path):
-            df = pd.read_csv(csv_path)
+            df = pd.read_csv(csv_path, dtype={"Cells": str})
+            df = df.astype(object).where(df.notna(), None) # NaN (pruned groups) -> null
             return jsonify(df.to_dict(orient='records'))
         return jsonify([])
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/sites', methods=['GET'])
+def list_sites():
+    resident = registry.resident()
+    return jsonify({
+        "sites": registry.sites(),
+        "resident": {site: round(size / 1e6, 1) for site, size in resident.items()},
+        "memory_budget_mb": SITES_MEMORY_BUDGET_MB
+    })
+
+# Every dataset route is also served per site, e.g. /api/<site>/topology
+for rule, view, methods in [
+    ('/topology', get_topology, ['GET']),
+    ('/optimize', optimize, ['POST']),
+    ('/financials', financials, ['POST']),
+    ('/whatif', what_if, ['POST']),
+    ('/capacity/windows/<link_id>', get_capacity_windows, ['GET']),
+    ('/hierarchy', get_hierarchy, ['GET']),
+    ('/dashboard', get_dashboard, ['GET']),
+    ('/stats/<link_id>', get_stats, ['GET']),
+    ('/traffic/<link_id>', get_traffic, ['GET']),
+    ('/images/<path:filename>', serve_image, ['GET']),
+    ('/report/capacity', get_capacity_report, ['GET']),
+    ('/report/multiplexing', get_multiplexing_report, ['GET']),
+]:
+    site_api.add_url_rule(rule, view.__name__, view, methods=methods)
+app.register_blueprint(site_api)
+
 # === AUTH ROUTES ===
 
+@app.errorhandler(AuthOverloaded)
+def auth_overloaded(e):
+    response = jsonify({"msg": str(e)})
+    response.status_code = 503
+    response.headers["Retry-After"] = "1"
+    return response
+
+def find_user(user_id):
+    """User document (without the password hash) for a token identity, or None."""
+    if MOCK_AUTH and user_id == MOCK_USER_ID:
+        return {"_id": MOCK_USER_ID, "email": None, "name": "Mock User"}
+    from bson import ObjectId
+    from bson.errors import InvalidId
+    try:
+        return mongo.db.users.find_one({"_id": ObjectId(user_id)}, {"password": 0})
+    except InvalidId:
+        return None
+
+@jwt.user_lookup_loader
+def load_user(_jwt_header, jwt_data):
+    # Runs on every JWT-protected request. Misses aren't cached: the account may exist a moment later
+    user_id = jwt_data["sub"]
+    user = user_cache.get(user_id)
+    if user is None:
+        user = find_user(user_id)
+        if user is not None:
+            user_cache.set(user_id, user)
+    return user
+
 @app.route('/api/auth/signup', methods=['POST'])
 def signup():
     # === MOCK AUTH START ===
     # For emergency bypass of DB issues
-    if True: # Always enabled for now as requested
+    if MOCK_AUTH:
         data = request.json
         email = data.get('email')
         name = data.get('name', 'User')
         # Create a dummy token
-        access_token = create_access_token(identity="mock_user_id")
+        access_token = create_access_token(identity=MOCK_USER_ID)
         return jsonify({
             "msg": "MOCK User created successfully",
             "token": access_token,
@@ -135,16 +383,21 @@ def signup():
     if not email or not password:
         return jsonify({"msg": "Missing email or password"}), 400
 
-    if mongo.db.users.find_one({"email": email}):
+    if mongo.db.users.find_one({"email": email}, {"_id": 1}):
         return jsonify({"msg": "Email already exists"}), 400
 
-    hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
+    hashed_password = hash_pool.run(bcrypt.generate_password_hash, password).decode('utf-8')
 
-    user_id = mongo.db.users.insert_one({
-        "email": email,
-        "password": hashed_password,
-        "name": name
-    }).inserted_id
+    from pymongo.errors import DuplicateKeyError
+    try:
+        user_id = mongo.db.users.insert_one({
+            "email": email,
+            "password": hashed_password,
+            "name": name
+        }).inserted_id
+    except DuplicateKeyError:
+        # Lost a race with a concurrent sign-up for the same email
+        return jsonify({"msg": "Email already exists"}), 400
 
     access_token = create_access_token(identity=str(user_id))
 
@@ -158,11 +411,11 @@ def signup():
 def login():
     # === MOCK AUTH START ===
     # For emergency bypass of DB issues
-    if True: # Always enabled for now as requested
+    if MOCK_AUTH:
         data = request.json
         email = data.get('email')
         # Create a dummy token
-        access_token = create_access_token(identity="mock_user_id")
+        access_token = create_access_token(identity=MOCK_USER_ID)
         return jsonify({
             "msg": "MOCK Login successful",
             "token": access_token,
@@ -174,11 +427,11 @@ def login():
     email = data.get('email')
     password = data.get('password')
 
-    user = mongo.db.users.find_one({"email": email})
+    user = mongo.db.users.find_one({"email": email}, {"password": 1, "name": 1})
     if not user:
         return jsonify({"msg": "Invalid credentials"}), 401
 
-    if bcrypt.check_password_hash(user['password'], password):
+    if hash_pool.run(bcrypt.check_password_hash, user['password'], password):
         access_token = create_access_token(identity=str(user['_id']))
         return jsonify({
             "msg": "Login successful",
@@ -188,6 +441,11 @@ def login():
     else:
         return jsonify({"msg": "Invalid credentials"}), 401
 
+@app.route('/api/auth/me', methods=['GET'])
+@jwt_required()
+def me():
+    return jsonify({"id": str(current_user["_id"]), "email": current_user.get("email"), "name": current_user.get("name", "User")})
+
 
 if __name__ == '__main__':
     app.run(port=5000, debug=True)
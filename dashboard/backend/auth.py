@@ -0,0 +1,95 @@
+"""
+Helpers that keep the auth routes from starving the analytics endpoints.
+
+bcrypt is deliberately slow (~0.25 s per hash at 12 rounds). Run inline, a
+burst of logins occupies every request thread. HashPool runs it on a few
+dedicated threads instead (bcrypt releases the GIL while hashing) and admits
+at most `max_pending` jobs; anything beyond that is turned away at once with
+AuthOverloaded, which the app answers with 503 + Retry-After, rather than
+queueing behind work it could never finish in time. This bounds the hashing
+work and the queue, not request threads: an admitted request's thread still
+waits (up to `timeout`) for its hash, so at most `max_pending` request
+threads are tied up by sign-ins at any time.
+
+TTLCache holds the user lookups behind JWT-protected routes for a few
+seconds, so a page that fires several authenticated requests costs one
+database round trip instead of one per request. Only found users are
+cached, so an account created right after a failed lookup works at once.
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+try:
+    from .metrics import record_auth_rejection
+except ImportError:
+    from metrics import record_auth_rejection
+
+
+class AuthOverloaded(Exception):
+    """Raised when the hash pool is full or a hash did not finish in time."""
+
+
+class HashPool:
+    def __init__(self, workers=2, max_pending=16, timeout=10.0):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="auth-hash")
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def run(self, fn, *args):
+        """Runs fn(*args) on the pool and returns its result; AuthOverloaded if it can't be admitted."""
+        if not self._slots.acquire(blocking=False):
+            record_auth_rejection("queue_full")
+            raise AuthOverloaded("Too many concurrent sign-ins")
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is held until the hash finishes, even if the caller gave up on it
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            record_auth_rejection("timeout")
+            raise AuthOverloaded("Password check timed out")
+
+
+class TTLCache:
+    """A small thread-safe LRU whose entries expire `ttl` seconds after they were stored."""
+    _MISSING = object()
+
+    def __init__(self, ttl=30.0, maxsize=10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._items.get(key, self._MISSING)
+            if item is self._MISSING:
+                return default
+            expires, value = item
+            if expires < time.monotonic():
+                del self._items[key]
+                return default
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def __contains__(self, key):
+        return self.get(key, self._MISSING) is not self._MISSING
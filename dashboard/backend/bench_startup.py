@@ -0,0 +1,93 @@
+"""
+Cold-start benchmark for the backend.
+
+Boots app.py in fresh interpreters and times the import (dataset load and
+kernel warm-up included) and the first dataset requests. Exits non-zero when
+a median exceeds its budget or regresses past a recorded baseline, so it can
+gate a deploy:
+
+    python bench_startup.py --data-dir ../../output --record     # store a baseline
+    python bench_startup.py --data-dir ../../output              # check against it
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(HERE, "startup_baseline.json")
+
+# Runs inside the fresh interpreter; prints one JSON line of timings
+PROBE = """
+import json, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+client = app.app.test_client()
+client.post('/api/optimize', json={'buffer_size_us': 143})
+t2 = time.perf_counter()
+client.get('/api/capacity/windows/1?window_sec=1')
+t3 = time.perf_counter()
+print(json.dumps({"boot_sec": t1 - t0, "first_optimize_sec": t2 - t1, "first_windows_sec": t3 - t2}))
+"""
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Backend cold-start benchmark")
+    parser.add_argument("--data-dir", type=str, default=None, help="Dataset to boot with (default: the app's own)")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters to time (median is reported)")
+    parser.add_argument("--max-boot-sec", type=float, default=10.0)
+    parser.add_argument("--max-first-request-sec", type=float, default=0.5)
+    parser.add_argument("--baseline", type=str, default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown vs. the baseline (0.25 = 25%%)")
+    parser.add_argument("--record", action="store_true", help="Write the measured medians as the new baseline")
+    return parser.parse_args()
+
+def measure_once(data_dir):
+    env = dict(os.environ, NETOPTIC_RELOAD_INTERVAL="0")
+    env.setdefault("MONGO_URI", "mongodb://localhost:27017/netoptic")
+    if data_dir:
+        env["NETOPTIC_DATA_DIR"] = os.path.abspath(data_dir)
+    proc = subprocess.run([sys.executable, "-c", PROBE], cwd=HERE, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        print(proc.stdout[-2000:], proc.stderr[-2000:])
+        sys.exit(f"Backend failed to boot (exit {proc.returncode}).")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def main():
+    args = get_args()
+    samples = [measure_once(args.data_dir) for _ in range(args.runs)]
+    medians = {k: statistics.median(s[k] for s in samples) for k in samples[0]}
+    for k, v in medians.items():
+        print(f"  {k:<20} {v:.3f}s")
+
+    if args.record:
+        with open(args.baseline, "w") as f:
+            json.dump({k: round(v, 4) for k, v in medians.items()}, f, indent=1)
+        print(f"Baseline written to {args.baseline}.")
+        return
+
+    failures = []
+    if medians["boot_sec"] > args.max_boot_sec:
+        failures.append(f"boot {medians['boot_sec']:.2f}s > budget {args.max_boot_sec}s")
+    for k in ("first_optimize_sec", "first_windows_sec"):
+        if medians[k] > args.max_first_request_sec:
+            failures.append(f"{k} {medians[k]:.3f}s > budget {args.max_first_request_sec}s")
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        for k, v in baseline.items():
+            # Small absolute slack so millisecond-scale timings don't flap
+            if k in medians and medians[k] > v * (1 + args.tolerance) + 0.05:
+                failures.append(f"{k} {medians[k]:.3f}s regressed from baseline {v:.3f}s")
+
+    if failures:
+        print("Cold start regression:")
+        for f in failures:
+            print(f"  - {f}")
+        sys.exit(1)
+    print("Cold start within budget.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Single-file binary snapshot of the pre-computed deployment data.
+
+Replaces traffic_summary.json, link_stats.json and optimization_cache.json.
+Layout:
+
+    header   <8sIIQQI>  magic, format version, flags, index offset, index length, index CRC32
+    payload  one blob per entry (traffic/<link>, stats/<link>, opt/<buffer_us>/<link>)
+    index    JSON: {"links": [...], "buffers_us": [...], "entries": {key: [offset, length, crc32, codec]}}
+
+The backend memory-maps the file and only parses the header and index at
+boot; each entry is checksummed and decoded the first time it is requested.
+"""
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+import numpy as np
+
+SNAPSHOT_NAME = "deployment_snapshot.bin"
+MAGIC = b"NOPTSNAP"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sIIQQI")
+
+# Entry codecs
+CODEC_JSON = "json"          # UTF-8 JSON document
+CODEC_SERIES = "f8x2"        # little-endian float64 (time, gbps) pairs
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _encode(codec, value):
+    if codec == CODEC_SERIES:
+        arr = np.array([[p["time"], p["gbps"]] for p in value], dtype="<f8").reshape(-1, 2)
+        return arr.tobytes()
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def _decode(codec, blob):
+    if codec == CODEC_SERIES:
+        arr = np.frombuffer(blob, dtype="<f8").reshape(-1, 2)
+        return [{"time": float(t), "gbps": float(v)} for t, v in arr]
+    return json.loads(blob.decode("utf-8"))
+
+
+def write_snapshot(path, traffic, stats, optimization):
+    """
+    Writes a snapshot atomically.
+    traffic:      {link_id: [{"time", "gbps"}, ...]}
+    stats:        {link_id: {...}}
+    optimization: {buffer_us: {link_id: {...}}}
+    """
+    entries = {}
+    blobs = []
+    offset = HEADER.size
+
+    def add(key, codec, value):
+        nonlocal offset
+        blob = _encode(codec, value)
+        entries[key] = [offset, len(blob), zlib.crc32(blob), codec]
+        blobs.append(blob)
+        offset += len(blob)
+
+    traffic = {str(k): v for k, v in traffic.items()}
+    stats = {str(k): v for k, v in stats.items()}
+    optimization = {int(b): {str(k): v for k, v in res.items()} for b, res in optimization.items()}
+
+    opt_links = {link_id for res in optimization.values() for link_id in res}
+    links = sorted(set(traffic) | set(stats) | opt_links, key=_link_sort_key)
+    for link_id in links:
+        if link_id in traffic:
+            add(f"traffic/{link_id}", CODEC_SERIES, traffic[link_id])
+        if link_id in stats:
+            add(f"stats/{link_id}", CODEC_JSON, stats[link_id])
+
+    buffers = sorted(optimization)
+    for buffer_us in buffers:
+        for link_id, res in optimization[buffer_us].items():
+            add(f"opt/{buffer_us}/{link_id}", CODEC_JSON, res)
+
+    index = json.dumps({
+        "created": time.time(),
+        "links": links,
+        "buffers_us": buffers,
+        "entries": entries,
+    }, separators=(",", ":")).encode("utf-8")
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, offset, len(index), zlib.crc32(index))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)
+        f.write(index)
+    os.replace(tmp_path, path)
+
+
+def _link_sort_key(link_id):
+    return (0, int(link_id), "") if link_id.isdigit() else (1, 0, link_id)
+
+
+class DeploymentSnapshot:
+    """Read-only, lazily decoded view of a snapshot file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._map) < HEADER.size:
+            raise SnapshotError(f"{path} is truncated")
+        magic, version, _flags, index_offset, index_length, index_crc = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise SnapshotError(f"{path} is not a deployment snapshot")
+        if version != FORMAT_VERSION:
+            raise SnapshotError(f"{path} has format version {version}, expected {FORMAT_VERSION}")
+
+        index = self._map[index_offset:index_offset + index_length]
+        if len(index) != index_length or zlib.crc32(index) != index_crc:
+            raise SnapshotError(f"{path} index is corrupt")
+        index = json.loads(index.decode("utf-8"))
+
+        self.links = index["links"]
+        self.buffers_us = index["buffers_us"]
+        self._entries = index["entries"]
+        self._decoded = {}
+
+    def _get(self, key, default):
+        if key in self._decoded:
+            return self._decoded[key]
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+
+        offset, length, crc, codec = entry
+        blob = self._map[offset:offset + length]
+        if zlib.crc32(blob) != crc:
+            raise SnapshotError(f"{self.path}: checksum mismatch for {key}")
+        value = _decode(codec, blob)
+        self._decoded[key] = value
+        return value
+
+    def has_stats(self, link_id):
+        return f"stats/{link_id}" in self._entries
+
+    def traffic(self, link_id):
+        return self._get(f"traffic/{link_id}", [])
+
+    def stats(self, link_id):
+        return self._get(f"stats/{link_id}", {})
+
+    def nearest_buffer(self, buffer_us):
+        """Closest pre-computed buffer setting (in µs), or None if there are none."""
+        if not self.buffers_us:
+            return None
+        return min(self.buffers_us, key=lambda b: abs(b - buffer_us))
+
+    def optimization(self, buffer_us):
+        """Per-link optimization results for one pre-computed buffer setting."""
+        results = {}
+        for link_id in self.links:
+            res = self._get(f"opt/{buffer_us}/{link_id}", None)
+            if res is not None:
+                results[link_id] = res
+        return results
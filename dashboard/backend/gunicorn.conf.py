@@ -0,0 +1,25 @@
+# Gunicorn config for the backend:
+#   gunicorn -c dashboard/backend/gunicorn.conf.py dashboard.backend.app:app
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+bind = os.getenv("BIND", "0.0.0.0:" + os.getenv("PORT", "5000"))
+workers = int(os.getenv("WEB_CONCURRENCY", min(4, multiprocessing.cpu_count())))
+
+# Workers write Prometheus samples here so /metrics can aggregate all of them.
+# Must be set before any worker imports prometheus_client (see metrics.py).
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "netoptic_metrics"))
+
+
+def on_starting(server):
+    # Stale files from a previous run would be summed into the new counters
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
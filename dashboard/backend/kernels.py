@@ -0,0 +1,324 @@
+"""
+Leaky-bucket simulation kernels shared by the backend and the Phase 2 scripts.
+
+Only numpy and numba are imported here, so topology.py, optimizer.py and
+multiplexing.py can use the kernels without pulling in Flask, Prometheus or
+the dataset loaders. Every kernel is cached on disk (numba cache=True), and
+numba re-imports a cached kernel's module by the name it was compiled under:
+import this file as dashboard.backend.kernels only (logic.py does so even
+when the backend runs from its own directory).
+"""
+import numpy as np
+from numba import jit, prange
+
+# Constants
+SLOT_DURATION = 0.0005  # 500 microseconds
+DEFAULT_BUFFER_TIME_SEC = 143e-6 # 143 microseconds
+MAX_DROP_RATE = 0.01    # 1% packet loss allowed
+BOOTSTRAP_BLOCK_SEC = 0.05 # Block length for bootstrap resampling (keeps burst structure intact)
+MAX_BOOTSTRAP_REPLICATES = 2000 # Most replicates an /api/optimize request may ask for
+
+# Static JIT Helper
+# Kernels on the request path carry explicit signatures so they compile (or load
+# from the on-disk cache) at import, not on the first request. Everything else is
+# cached on disk too and compiled for the types warm_up_kernels() uses.
+@jit("float64(float64, float64[:], float64)", nopython=True, cache=True)
+def run_leaky_bucket_jit(capacity_gbps, inputs, buffer_time_sec):
+    dt = 0.0005 # SLOT_DURATION
+    max_buffer_bits = capacity_gbps * 1e9 * buffer_time_sec
+    drain_rate = capacity_gbps * 1e9 * dt
+    
+    current_buffer = 0.0
+    total_input = 0.0
+    total_dropped = 0.0
+    
+    for inp_gbps in inputs:
+        inp_bits = inp_gbps * 1e9 * dt
+        total_input += inp_bits
+        current_buffer += inp_bits
+        current_buffer -= drain_rate
+        
+        if current_buffer < 0: current_buffer = 0
+        if current_buffer > max_buffer_bits:
+            drop = current_buffer - max_buffer_bits
+            total_dropped += drop
+            current_buffer = max_buffer_bits
+            
+    if total_input > 0:
+        return total_dropped / total_input
+    return 0.0
+
+@jit("Tuple((float64[:], int64[:]))(float64[:])", nopython=True, cache=True)
+def encode_idle_runs_jit(inputs):
+    """
+    Run-length encodes the idle (exactly 0) slots of a series: values[k] is
+    the k-th non-idle slot and gaps[k] the number of idle slots before it.
+    Trailing idle slots are dropped; they cannot cause loss.
+    """
+    n_active = 0
+    for x in inputs:
+        if x != 0.0: n_active += 1
+    values = np.empty(n_active)
+    gaps = np.empty(n_active, dtype=np.int64)
+    k = 0
+    gap = 0
+    for x in inputs:
+        if x == 0.0:
+            gap += 1
+        else:
+            values[k] = x
+            gaps[k] = gap
+            k += 1
+            gap = 0
+    return values, gaps
+
+def idle_runs(inputs):
+    """(values, gaps) of a series for run_leaky_bucket_rle_jit; passes an encoded pair through."""
+    if isinstance(inputs, tuple): return inputs
+    return encode_idle_runs_jit(np.require(inputs, np.float64, ["C", "W"]))
+
+@jit("float64(float64, float64[:], int64[:], float64)", nopython=True, cache=True)
+def run_leaky_bucket_rle_jit(capacity_gbps, values, gaps, buffer_time_sec):
+    """
+    run_leaky_bucket_jit on an idle-run encoding. An idle slot only drains the
+    buffer, so each idle run is stepped slot by slot just until the buffer is
+    empty (usually one slot, as the buffer holds less than a slot's drain)
+    and the rest of the run is skipped. The arithmetic is the dense kernel's,
+    so drop rates are bit-identical while cost scales with active slots.
+    """
+    dt = 0.0005 # SLOT_DURATION
+    max_buffer_bits = capacity_gbps * 1e9 * buffer_time_sec
+    drain_rate = capacity_gbps * 1e9 * dt
+
+    current_buffer = 0.0
+    total_input = 0.0
+    total_dropped = 0.0
+
+    for k in range(len(values)):
+        idle = gaps[k]
+        while idle > 0 and current_buffer > 0:
+            current_buffer -= drain_rate
+            if current_buffer < 0: current_buffer = 0
+            idle -= 1
+
+        inp_bits = values[k] * 1e9 * dt
+        total_input += inp_bits
+        current_buffer += inp_bits
+        current_buffer -= drain_rate
+
+        if current_buffer < 0: current_buffer = 0
+        if current_buffer > max_buffer_bits:
+            drop = current_buffer - max_buffer_bits
+            total_dropped += drop
+            current_buffer = max_buffer_bits
+
+    if total_input > 0:
+        return total_dropped / total_input
+    return 0.0
+
+@jit("float64(float64[:], float64, float64, int64, float64)", nopython=True, cache=True)
+def min_capacity_jit(inputs, buffer_time_sec, high, iterations, max_drop_rate):
+    """Bisection on [0, high] for the smallest capacity within max_drop_rate."""
+    values, gaps = encode_idle_runs_jit(inputs)
+    low = 0.0
+    optimal = high
+    for _ in range(iterations):
+        mid = (low + high) / 2
+        if run_leaky_bucket_rle_jit(mid, values, gaps, buffer_time_sec) <= max_drop_rate:
+            optimal = mid
+            high = mid
+        else:
+            low = mid
+    return optimal
+
+@jit(nopython=True, parallel=True, cache=True)
+def evaluate_moves_jit(aggregates, cell_series, move_cells, move_src, move_dst,
+                       buffer_time_sec, iterations, max_drop_rate):
+    """
+    For each candidate move k (cell move_cells[k] from link move_src[k] to
+    move_dst[k]), rebuilds both link aggregates incrementally and returns the
+    new (capacity, peak) of source and destination. Moves run in parallel.
+    """
+    n = len(move_cells)
+    cap_src = np.zeros(n)
+    cap_dst = np.zeros(n)
+    peak_src = np.zeros(n)
+    peak_dst = np.zeros(n)
+    for k in prange(n):
+        cell = cell_series[move_cells[k]]
+        src = aggregates[move_src[k]] - cell
+        dst = aggregates[move_dst[k]] + cell
+        for i in range(len(src)):
+            if src[i] < 0: src[i] = 0.0 # Subtraction residue
+        peak_src[k] = src.max() if len(src) > 0 else 0.0
+        peak_dst[k] = dst.max() if len(dst) > 0 else 0.0
+        if peak_src[k] > 0:
+            cap_src[k] = min_capacity_jit(src, buffer_time_sec, peak_src[k] * 1.5, iterations, max_drop_rate)
+        if peak_dst[k] > 0:
+            cap_dst[k] = min_capacity_jit(dst, buffer_time_sec, peak_dst[k] * 1.5, iterations, max_drop_rate)
+    return cap_src, cap_dst, peak_src, peak_dst
+
+@jit(nopython=True, parallel=True, cache=True)
+def group_capacities_jit(cell_series, groups, buffer_time_sec, iterations, max_drop_rate):
+    """
+    Buffered capacity and peak of the summed traffic of each group of cells.
+    groups is (n_groups, k) row indices into cell_series, padded with -1.
+    Groups run in parallel; each sums its rows into a private buffer.
+    """
+    n = groups.shape[0]
+    caps = np.zeros(n)
+    peaks = np.zeros(n)
+    for g in prange(n):
+        total = np.zeros(cell_series.shape[1])
+        for m in range(groups.shape[1]):
+            if groups[g, m] >= 0:
+                total += cell_series[groups[g, m]]
+        peak = total.max() if len(total) > 0 else 0.0
+        peaks[g] = peak
+        if peak > 0:
+            caps[g] = min_capacity_jit(total, buffer_time_sec, peak * 1.5, iterations, max_drop_rate)
+    return caps, peaks
+
+@jit(nopython=True, cache=True)
+def run_leaky_bucket_window_jit(capacity_gbps, inputs, start, end, warm_start, buffer_time_sec):
+    """
+    Drop rate over inputs[start:end]. Slots from warm_start to start are
+    simulated first (not counted) so the window inherits the queue built up
+    before it instead of starting empty.
+    """
+    dt = 0.0005 # SLOT_DURATION
+    max_buffer_bits = capacity_gbps * 1e9 * buffer_time_sec
+    drain_rate = capacity_gbps * 1e9 * dt
+
+    current_buffer = 0.0
+    total_input = 0.0
+    total_dropped = 0.0
+
+    for i in range(warm_start, end):
+        inp_bits = inputs[i] * 1e9 * dt
+        current_buffer += inp_bits
+        current_buffer -= drain_rate
+
+        drop = 0.0
+        if current_buffer < 0: current_buffer = 0
+        if current_buffer > max_buffer_bits:
+            drop = current_buffer - max_buffer_bits
+            current_buffer = max_buffer_bits
+        if i >= start:
+            total_input += inp_bits
+            total_dropped += drop
+
+    if total_input > 0:
+        return total_dropped / total_input
+    return 0.0
+
+@jit(nopython=True, parallel=True, cache=True)
+def window_capacities_jit(inputs, bounds, buffer_time_sec, carry_state, high_factor, iterations, max_drop_rate):
+    """
+    Peak and buffered capacity of every window [bounds[w], bounds[w+1]).
+    Windows are independent and run in parallel; with carry_state each one is
+    warmed up on the preceding window's traffic.
+    """
+    n = len(bounds) - 1
+    caps = np.zeros(n)
+    peaks = np.zeros(n)
+    for w in prange(n):
+        start = bounds[w]
+        end = bounds[w + 1]
+        if end <= start: continue
+        warm_start = bounds[w - 1] if carry_state and w > 0 else start
+        peak = inputs[start:end].max()
+        peaks[w] = peak
+        if peak <= 0: continue
+
+        low = 0.0
+        high = peak * high_factor
+        optimal = high
+        for _ in range(iterations):
+            mid = (low + high) / 2
+            if run_leaky_bucket_window_jit(mid, inputs, start, end, warm_start, buffer_time_sec) <= max_drop_rate:
+                optimal = mid
+                high = mid
+            else:
+                low = mid
+        caps[w] = optimal
+    return caps, peaks
+
+def window_bounds(timestamps, window_sec):
+    """Slot index where each window of `window_sec` starts, plus the end index."""
+    if len(timestamps) == 0:
+        return np.zeros(1, dtype=np.int64)
+    t0 = timestamps[0]
+    n_windows = int(np.floor((timestamps[-1] - t0) / window_sec)) + 1
+    edges = t0 + window_sec * np.arange(n_windows + 1)
+    return np.searchsorted(timestamps, edges, side="left").astype(np.int64)
+
+@jit(nopython=True, parallel=True, cache=True)
+def bootstrap_capacities_jit(inputs, block_starts, block_len, buffer_time_sec, high_factor, iterations, max_drop_rate):
+    """
+    Buffered capacity of each block-bootstrap replicate. Replicate r is the
+    concatenation of blocks inputs[s:s+block_len] (wrapping around) for s in
+    block_starts[r], truncated to len(inputs). Replicates run in parallel.
+    """
+    n = len(inputs)
+    replicates = block_starts.shape[0]
+    caps = np.zeros(replicates)
+    for r in prange(replicates):
+        series = np.empty(n)
+        pos = 0
+        for b in range(block_starts.shape[1]):
+            s = block_starts[r, b]
+            for i in range(block_len):
+                if pos >= n: break
+                series[pos] = inputs[(s + i) % n]
+                pos += 1
+        peak = series.max() if n > 0 else 0.0
+        if peak > 0:
+            caps[r] = min_capacity_jit(series, buffer_time_sec, peak * high_factor, iterations, max_drop_rate)
+    return caps
+
+def bootstrap_params(replicates, confidence, max_replicates=None):
+    """(replicates, confidence) checked for bootstrap_capacity_interval; ValueError if out of range."""
+    if isinstance(replicates, bool) or not isinstance(replicates, (int, np.integer)) or replicates < 0:
+        raise ValueError("bootstrap must be a non-negative integer")
+    if max_replicates is not None and replicates > max_replicates:
+        raise ValueError(f"bootstrap must be at most {max_replicates}")
+    if isinstance(confidence, bool) or not isinstance(confidence, (int, float, np.floating)) or not 0 < confidence < 1:
+        raise ValueError("confidence must be a number between 0 and 1 (exclusive)")
+    return int(replicates), float(confidence)
+
+def bootstrap_capacity_interval(inputs, buffer_time_sec, replicates=500, confidence=0.95,
+                                block_sec=BOOTSTRAP_BLOCK_SEC, seed=0, high_factor=1.5, iterations=15):
+    """
+    Percentile confidence interval for the buffered capacity of `inputs`
+    under a circular moving-block bootstrap. Returns (low, high).
+    """
+    replicates, confidence = bootstrap_params(replicates, confidence)
+    inputs = np.ascontiguousarray(inputs, dtype=np.float64)
+    n = len(inputs)
+    if n == 0 or replicates <= 0:
+        return 0.0, 0.0
+    block_len = max(1, min(n, int(round(block_sec / SLOT_DURATION))))
+    n_blocks = -(-n // block_len)
+
+    rng = np.random.default_rng(seed)
+    block_starts = rng.integers(0, n, size=(replicates, n_blocks), dtype=np.int64)
+    caps = bootstrap_capacities_jit(inputs, block_starts, block_len, buffer_time_sec,
+                                    high_factor, iterations, MAX_DROP_RATE)
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(caps, [alpha, 1 - alpha])
+    return float(low), float(high)
+
+def warm_up_kernels():
+    """
+    Compiles (or loads from the on-disk cache) every kernel the API can reach,
+    with the argument types the API uses, so no request pays for compilation.
+    """
+    inputs = np.array([1.0, 0.0, 0.0, 2.0, 0.5, 0.0, 3.0, 1.0])
+    values, gaps = encode_idle_runs_jit(inputs)
+    run_leaky_bucket_jit(1.0, inputs, DEFAULT_BUFFER_TIME_SEC)
+    run_leaky_bucket_rle_jit(1.0, values, gaps, DEFAULT_BUFFER_TIME_SEC)
+    min_capacity_jit(inputs, DEFAULT_BUFFER_TIME_SEC, 4.5, 15, MAX_DROP_RATE)
+    bounds = window_bounds(np.arange(len(inputs)) * SLOT_DURATION, 2 * SLOT_DURATION)
+    window_capacities_jit(inputs, bounds, DEFAULT_BUFFER_TIME_SEC, False, 1.5, 15, MAX_DROP_RATE)
+    bootstrap_capacity_interval(inputs, DEFAULT_BUFFER_TIME_SEC, replicates=2)
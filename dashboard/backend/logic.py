@@ -1,30 +1,75 @@
 import pandas as pd
 import numpy as np
+import os
+import sys
+import json
 from pathlib import Path
-import networkx as nx
-from numba import jit
+import time
+try:
+    from .metrics import record_cache, record_data_load, record_simulation
+    from .profiling import span
+    from .shared_dataset import attach_or_build
+    from .deployment_snapshot import SNAPSHOT_NAME, DeploymentSnapshot
+    from .kernels import (
+        DEFAULT_BUFFER_TIME_SEC, MAX_BOOTSTRAP_REPLICATES, MAX_DROP_RATE, bootstrap_capacity_interval,
+        bootstrap_params, idle_runs, run_leaky_bucket_jit, run_leaky_bucket_rle_jit, warm_up_kernels,
+        window_bounds, window_capacities_jit
+    )
+except ImportError:
+    from metrics import record_cache, record_data_load, record_simulation
+    from profiling import span
+    from shared_dataset import attach_or_build
+    from deployment_snapshot import SNAPSHOT_NAME, DeploymentSnapshot
+    # Backend run from this directory: the kernels still load as dashboard.backend.kernels
+    # (see kernels.py), so the repository root goes on the path
+    sys.path.append(str(Path(__file__).resolve().parents[2]))
+    from dashboard.backend.kernels import (
+        DEFAULT_BUFFER_TIME_SEC, MAX_BOOTSTRAP_REPLICATES, MAX_DROP_RATE, bootstrap_capacity_interval,
+        bootstrap_params, idle_runs, run_leaky_bucket_jit, run_leaky_bucket_rle_jit, warm_up_kernels,
+        window_bounds, window_capacities_jit
+    )
 
 # Constants
-SLOT_DURATION = 0.0005  # 500 microseconds
-DEFAULT_BUFFER_TIME_SEC = 143e-6 # 143 microseconds
-MAX_DROP_RATE = 0.01    # 1% packet loss allowed
+DEFAULT_COST_PER_GBPS = 5000.0 # $/Gbps (Enterprise/Telco scale) when a request gives none
+
+# /api/dashboard sections, in streaming order
+DASHBOARD_SECTIONS = ("topology", "links", "optimization", "financials")
+
+# Transport tiers above the cells, bottom-up (see hierarchy.json in the README)
+HIERARCHY_FILE = "hierarchy.json"
+TIERS = ("link", "switch", "uplink")
 
 class NetworkLogic:
-    def __init__(self, data_dir):
+    def __init__(self, data_dir, use_snapshot=True, allow_deployment=True, site="default"):
         self.data_dir = Path(data_dir)
-        self.cells = {}
+        self.site = site # Label of this dataset's load metrics: "default" or the registry site name
+        # Share one memory-mapped copy of the dataset between workers (see shared_dataset.py)
+        self.use_snapshot = use_snapshot and os.getenv("NETOPTIC_DATASET_SNAPSHOT", "1") != "0"
+        self.cells = []
         self.loss_df = None
         self.thr_df = None
         self.links = {}
+        self.capacity_report = [] # Rows of link_capacity_estimates.csv, served by /api/report/capacity
         
-        # Deployment Mode Cache
+        # Deployment Mode Cache (pre-computed binary snapshot, see deployment_snapshot.py)
+        self.allow_deployment = allow_deployment
         self.deployment_mode = False
-        self.traffic_summary_cache = {}
-        self.link_stats_cache = {}
-        self.optimization_cache = {}
+        self.deployment = None
+
+        # Per-link aggregates and last optimum per (buffer_us, link), reused by what-if searches
+        self._link_aggregates = {}
+        self._optimum_cache = {}
+
+        # Upper tiers: switch -> [link ids], uplink -> [switches]; aggregates per (tier, node)
+        self.hierarchy = {"switch": {}, "uplink": {}}
+        self.hierarchy_configured = False # False: the default single switch/uplink, not drawn in the topology
+        self._tier_aggregates = {}
         
         self.load_topology_from_csv()
+        self.load_hierarchy()
+        start = time.perf_counter()
         self.load_data()
+        record_data_load(time.perf_counter() - start, self.deployment_mode, self.site)
 
     def load_topology_from_csv(self):
         """Loads link mappings from the CSV report."""
@@ -35,6 +80,7 @@ class NetworkLogic:
 
         try:
             df = pd.read_csv(csv_path)
+            self.capacity_report = df.to_dict(orient='records')
             # Schema: Link_ID, Cells (space separated), ...
             for _, row in df.iterrows():
                 link_id = int(row['Link_ID'])
@@ -44,32 +90,68 @@ class NetworkLogic:
         except Exception as e:
             print(f"Error loading topology CSV: {e}")
 
+    def load_hierarchy(self):
+        """
+        Loads the switch and uplink tiers from hierarchy.json:
+            {"switches": {"agg1": [1, 2]}, "uplinks": {"up1": ["agg1"]}}
+        Without the file, every link hangs off one "Switch" with one "Uplink".
+        """
+        path = self.data_dir / HIERARCHY_FILE
+        if not path.exists():
+            self.hierarchy = {"switch": {"Switch": sorted(self.links)}, "uplink": {"Uplink": ["Switch"]}}
+            return
+
+        try:
+            with open(path, "r") as f:
+                config = json.load(f)
+            switches = {str(name): [int(l) for l in links if int(l) in self.links]
+                        for name, links in config.get("switches", {}).items()}
+            uplinks = {str(name): [str(s) for s in members if str(s) in switches]
+                       for name, members in config.get("uplinks", {}).items()}
+            self.hierarchy = {"switch": switches, "uplink": uplinks}
+            self.hierarchy_configured = True
+            print(f"Loaded hierarchy: {len(switches)} switches, {len(uplinks)} uplinks.")
+        except Exception as e:
+            print(f"Error loading {HIERARCHY_FILE}: {e}")
+
     def load_data(self):
-        # Check for Optimized JSONs first (Deployment Mode)
-        traffic_path = self.data_dir / "traffic_summary.json"
-        stats_path = self.data_dir / "link_stats.json"
-        opt_path = self.data_dir / "optimization_cache.json"
-        
-        if traffic_path.exists() and stats_path.exists() and opt_path.exists():
-            print("DEPLOYMENT MODE: Loading pre-computed JSONs...")
+        # Check for the pre-computed snapshot first (Deployment Mode)
+        snapshot_path = self.data_dir / SNAPSHOT_NAME
+        if self.allow_deployment and snapshot_path.exists():
+            print("DEPLOYMENT MODE: Mapping pre-computed snapshot...")
             try:
-                import json
-                with open(traffic_path, 'r') as f:
-                    self.traffic_summary_cache = json.load(f)
-                with open(stats_path, 'r') as f:
-                    self.link_stats_cache = json.load(f)
-                with open(opt_path, 'r') as f:
-                    self.optimization_cache = json.load(f)
-                
+                self.deployment = DeploymentSnapshot(snapshot_path)
                 self.deployment_mode = True
-                print("Backend Ready: Loaded optimized JSONs.")
-                return 
+                print(f"Backend Ready: {len(self.deployment.links)} links, "
+                      f"{len(self.deployment.buffers_us)} buffer settings pre-computed.")
+                return
             except Exception as e:
-                print(f"Error loading JSONs, falling back to CSVs: {e}")
+                print(f"Error loading snapshot, falling back to CSVs: {e}")
+        elif self.allow_deployment and (self.data_dir / "optimization_cache.json").exists():
+            print("Found legacy JSON caches; convert them with "
+                  "'python precompute_deployment_data.py --from-json'.")
 
         """Loads all aligned CSVs and aligns them."""
         print("Scaning data directory...")
         files = list(self.data_dir.glob("cell_*_aligned.csv"))
+
+        if self.use_snapshot:
+            try:
+                self.loss_df, self.thr_df, attached = attach_or_build(
+                    self.data_dir, files, lambda: self.parse_cells(files))
+                self.cells = list(self.thr_df.columns)
+                source = "shared snapshot" if attached else "CSVs (snapshot written)"
+                print(f"Backend Ready: Loaded {len(self.cells)} cells from {source}.")
+                return
+            except OSError as e:
+                print(f"Dataset snapshot unavailable, loading privately: {e}")
+
+        self.loss_df, self.thr_df = self.parse_cells(files)
+        self.cells = list(self.thr_df.columns)
+        print(f"Backend Ready: Loaded {len(self.cells)} cells.")
+
+    def parse_cells(self, files):
+        """Parses the aligned CSVs and resamples them onto a common timeline."""
         total = len(files)
         print(f"Found {total} cell files. Loading into memory...")
         
@@ -85,9 +167,28 @@ class NetworkLogic:
                 print(f"\nSkipping {p}: {e}")
         
         print("\nAligning and rescheduling timestamps...")
-        self.cells = cells
-        self.loss_df, self.thr_df = self.resample_data(cells)
-        print(f"Backend Ready: Loaded {len(cells)} cells.")
+        return self.resample_data(cells)
+
+    def has_data(self):
+        """True if links and traffic were loaded. Load errors are only printed and leave the dataset empty."""
+        if not self.links:
+            return False
+        if self.deployment_mode:
+            return bool(self.deployment.links)
+        return bool(self.cells)
+
+    def memory_footprint(self):
+        """Approximate bytes held by this dataset, mapped or private."""
+        total = 0
+        for df in (self.thr_df, self.loss_df):
+            if df is not None:
+                total += int(df.memory_usage(index=True).sum())
+        if self.deployment is not None:
+            total += os.path.getsize(self.deployment.path)
+        # Copies of the values: request threads may be adding aggregates meanwhile
+        total += sum(agg.nbytes for agg in list(self._link_aggregates.values()))
+        total += sum(agg.nbytes for agg in list(self._tier_aggregates.values()))
+        return total
 
     def resample_data(self, cells):
         # Union of all timestamps
@@ -113,18 +214,36 @@ class NetworkLogic:
         return loss_df.fillna(0), throughput_df.fillna(0)
 
     def get_topology(self):
-        """Returns nodes and links for visualization."""
+        """
+        Returns nodes and links for visualization. Uplinks and aggregation
+        switches are drawn only when hierarchy.json defines them; otherwise
+        every link hangs off a single "Switch" node.
+        """
         nodes = []
         edges = []
         
-        # Switch Node
-        nodes.append({"id": "Switch", "group": "core", "val": 20})
+        parent = {}
+        if self.hierarchy_configured:
+            # Uplink and aggregation switch nodes
+            for uplink_id, switch_ids in self.hierarchy["uplink"].items():
+                nodes.append({"id": uplink_id, "group": "uplink", "val": 25})
+                for switch_id in switch_ids:
+                    edges.append({"source": switch_id, "target": uplink_id})
+            for switch_id, link_ids in self.hierarchy["switch"].items():
+                nodes.append({"id": switch_id, "group": "core", "val": 20})
+                for link_id in link_ids:
+                    parent[link_id] = switch_id
+        else:
+            # Switch Node
+            nodes.append({"id": "Switch", "group": "core", "val": 20})
+            parent = dict.fromkeys(self.links, "Switch")
         
         for link_id, cell_ids in self.links.items():
             # Link Aggregation Node
             link_node_id = f"Link {link_id}"
             nodes.append({"id": link_node_id, "group": "link", "val": 15})
-            edges.append({"source": link_node_id, "target": "Switch"})
+            if link_id in parent:
+                edges.append({"source": link_node_id, "target": parent[link_id]})
             
             for cid in cell_ids:
                 # Cell Node
@@ -145,7 +264,7 @@ class NetworkLogic:
                 results[link_id] = {"capacity": 0, "drop_rate": 0}
                 continue
 
-            group_throughput = self.thr_df[valid_cells].sum(axis=1)
+            group_throughput = self.link_aggregate(link_id)
             
             # Run sim
             drop_rate = self._run_leaky_bucket(capacity_gbps, group_throughput, buffer_time_sec_param)
@@ -157,46 +276,285 @@ class NetworkLogic:
             
         return results
     
-    def find_optimal_capacity(self, buffer_time_sec_param):
+    def find_optimal_capacity(self, buffer_time_sec_param, bootstrap=0, confidence=0.95):
+        """
+        Binary search for optimal capacity for each link given buffer size.
+        With bootstrap > 0, also adds a block-bootstrap percentile interval
+        (ci_low / ci_high) from that many resampled traces. ValueError for
+        out-of-range parameters, or for bootstrap > 0 in deployment mode,
+        which has no per-link traces to resample.
+        """
+        bootstrap, confidence = bootstrap_params(bootstrap, confidence, MAX_BOOTSTRAP_REPLICATES)
         if self.deployment_mode:
-            # Simple fuzzy match for demo
-            if abs(buffer_time_sec_param - 0.000143) < 0.00001:
-                return self.optimization_cache.get("143", {})
-            return self.optimization_cache.get("143", {}) # Fallback to default for demo
+            if bootstrap > 0:
+                raise ValueError("Bootstrap intervals need the per-cell data, which deployment mode does not load.")
+            # Serve the nearest pre-computed buffer setting
+            buffer_us = buffer_time_sec_param * 1e6
+            nearest = self.deployment.nearest_buffer(buffer_us)
+            if nearest is None:
+                record_cache("optimization", False)
+                return {}
+            record_cache("optimization", abs(nearest - buffer_us) < 0.5)
+            with span("load"):
+                return self.deployment.optimization(nearest)
+        record_cache("optimization", False)
 
-        """Binary search for optimal capacity for each link given buffer size."""
         results = {}
-        for link_id, cell_ids in self.links.items():
-            valid_cells = [c for c in cell_ids if c in self.thr_df.columns]
-            if not valid_cells: continue
-            
-            group_throughput = self.thr_df[valid_cells].sum(axis=1)
-            peak = group_throughput.max()
-            
-            # Binary Search
-            low = 0
-            high = peak * 1.5
+        for link_id in self.links:
+            res = self.optimize_link(link_id, buffer_time_sec_param)
+            if res is None: continue
+            if bootstrap > 0:
+                with span("simulate"):
+                    low, high = bootstrap_capacity_interval(
+                        self.link_aggregate(link_id), buffer_time_sec_param, bootstrap, confidence)
+                res.update({"ci_low": round(low, 2), "ci_high": round(high, 2), "confidence": confidence})
+            results[link_id] = res
+        return results
+
+    def link_aggregate(self, link_id):
+        """Aggregated throughput of a link as an ndarray, cached per link. None if it has no data."""
+        link_id = int(link_id)
+        if link_id in self._link_aggregates:
+            return self._link_aggregates[link_id]
+        valid_cells = [c for c in self.links.get(link_id, []) if c in self.thr_df.columns]
+        if not valid_cells: return None
+        # A writable copy: pandas copy-on-write hands out read-only arrays, which the kernels' signatures reject
+        with span("aggregate"):
+            agg = self.thr_df[valid_cells].sum(axis=1).to_numpy(dtype=np.float64, copy=True)
+        self._link_aggregates[link_id] = agg
+        return agg
+
+    def optimize_link(self, link_id, buffer_time_sec_param):
+        """Binary search for the optimal capacity of one link. Returns None if it has no data."""
+        group_throughput = self.link_aggregate(link_id)
+        if group_throughput is None: return None
+        peak = group_throughput.max()
+        
+        # Binary Search
+        optimal = self._search_capacity(group_throughput, buffer_time_sec_param, 0, peak * 1.5)
+        self._optimum_cache[(round(buffer_time_sec_param * 1e6, 3), int(link_id))] = optimal
+        return self._capacity_result(optimal, peak)
+
+    def _capacity_result(self, optimal, peak):
+        return {
+            "optimal_capacity": round(optimal, 2),
+            "peak_load": round(peak, 2),
+            "savings_pct": round((1 - optimal/peak)*100, 1) if peak > 0 else 0
+        }
+
+    def _search_capacity(self, inputs, buffer_time_sec_param, low, high, iterations=15):
+        """Bisection on [low, high]; returns the smallest capacity found within MAX_DROP_RATE."""
+        with span("simulate"):
+            inputs = idle_runs(inputs)
             optimal = high
-            
-            for _ in range(15): # 15 iterations is enough precision
+            for _ in range(iterations): # 15 iterations is enough precision
                 mid = (low + high) / 2
-                drop = self._run_leaky_bucket(mid, group_throughput, buffer_time_sec_param)
+                drop = self._run_leaky_bucket(mid, inputs, buffer_time_sec_param)
                 if drop <= MAX_DROP_RATE:
                     optimal = mid
                     high = mid
                 else:
                     low = mid
-                    
-            results[link_id] = {
-                "optimal_capacity": round(optimal, 2),
-                "peak_load": round(peak, 2),
-                "savings_pct": round((1 - optimal/peak)*100, 1) if peak > 0 else 0
+        return optimal
+
+    def _warm_search_capacity(self, inputs, buffer_time_sec_param, guess, peak):
+        """
+        Capacity search seeded with a previous optimum: bracket around `guess`,
+        widening until it straddles the target, then bisect down to the same
+        resolution as a cold 15-step search over [0, 1.5 * peak].
+        """
+        ceiling = peak * 1.5
+        if ceiling <= 0: return 0.0
+        with span("simulate"):
+            inputs = idle_runs(inputs)
+        tol = ceiling / 2**15
+        step = max(guess * 0.02, tol)
+
+        def feasible(cap):
+            return self._run_leaky_bucket(cap, inputs, buffer_time_sec_param) <= MAX_DROP_RATE
+
+        low, high = max(guess - step, 0.0), min(guess + step, ceiling)
+        while high < ceiling and not feasible(high):
+            low, step = high, step * 2
+            high = min(high + step, ceiling)
+        while low > 0 and feasible(low):
+            high, step = low, step * 2
+            low = max(low - step, 0.0)
+
+        iterations = max(0, int(np.ceil(np.log2((high - low) / tol)))) if high > low else 0
+        return self._search_capacity(inputs, buffer_time_sec_param, low, high, iterations)
+
+    def what_if(self, moves, buffer_time_sec_param):
+        """
+        Evaluates moving cells between links without changing the loaded topology.
+        moves: [{"cell": "7", "from": 1, "to": 3}, ...]
+        Only the links touched by a move are re-aggregated (subtracting/adding that
+        cell's column) and re-optimized, warm-started from their previous optimum.
+        """
+        if self.deployment_mode or self.thr_df is None:
+            raise ValueError("What-if analysis needs the per-cell data, which deployment mode does not load.")
+        if not moves:
+            raise ValueError("No moves given.")
+
+        members = {}
+        aggregates = {}
+        for move in moves:
+            cell = str(move.get("cell"))
+            try:
+                src, dst = int(move.get("from")), int(move.get("to"))
+            except (TypeError, ValueError):
+                raise ValueError(f"Move of cell {cell} needs integer 'from' and 'to' link ids.")
+            for link_id in (src, dst):
+                if link_id not in self.links:
+                    raise ValueError(f"Unknown link {link_id}.")
+                if link_id not in members:
+                    members[link_id] = list(self.links[link_id])
+                    base = self.link_aggregate(link_id)
+                    aggregates[link_id] = base.copy() if base is not None else np.zeros(len(self.thr_df))
+            if cell not in members[src]:
+                raise ValueError(f"Cell {cell} is not on link {src}.")
+            if cell not in self.thr_df.columns:
+                raise ValueError(f"Cell {cell} has no throughput data.")
+
+            column = self.thr_df[cell].values
+            members[src].remove(cell)
+            members[dst].append(cell)
+            aggregates[src] -= column
+            aggregates[dst] += column
+
+        links = {}
+        for link_id, agg in aggregates.items():
+            np.maximum(agg, 0, out=agg) # Subtraction can leave -1e-15 residue
+            peak = float(agg.max()) if len(agg) else 0.0
+
+            before = None
+            guess = None
+            if self.link_aggregate(link_id) is not None:
+                before = self.optimize_link_cached(link_id, buffer_time_sec_param)
+                guess = self._optimum_cache[(round(buffer_time_sec_param * 1e6, 3), link_id)]
+
+            if peak <= 0:
+                optimal = 0.0
+            elif guess is not None:
+                optimal = self._warm_search_capacity(agg, buffer_time_sec_param, guess, peak)
+            else:
+                optimal = self._search_capacity(agg, buffer_time_sec_param, 0, peak * 1.5)
+
+            links[link_id] = {
+                "cells": members[link_id],
+                "before": before,
+                "after": self._capacity_result(optimal, peak)
+            }
+
+        before_total = sum(l["before"]["optimal_capacity"] for l in links.values() if l["before"])
+        after_total = sum(l["after"]["optimal_capacity"] for l in links.values())
+        return {
+            "links": links,
+            "capacity_delta_gbps": round(after_total - before_total, 2)
+        }
+
+    def optimize_link_cached(self, link_id, buffer_time_sec_param):
+        """optimize_link, reusing the last optimum computed for this link and buffer."""
+        key = (round(buffer_time_sec_param * 1e6, 3), int(link_id))
+        if key in self._optimum_cache:
+            return self._capacity_result(self._optimum_cache[key], self.link_aggregate(link_id).max())
+        return self.optimize_link(link_id, buffer_time_sec_param)
+
+    def tier_aggregate(self, tier, node_id):
+        """
+        Offered load of one node of a tier, built from its children's cached
+        aggregates (links from cells, switches from links, uplinks from
+        switches), so no tier above the links ever re-sums cell data.
+        """
+        if tier == "link":
+            return self.link_aggregate(node_id)
+        key = (tier, node_id)
+        if key in self._tier_aggregates:
+            return self._tier_aggregates[key]
+
+        child_tier = TIERS[TIERS.index(tier) - 1]
+        agg = None
+        with span("aggregate"):
+            for child in self.hierarchy[tier].get(node_id, []):
+                child_agg = self.tier_aggregate(child_tier, child)
+                if child_agg is None: continue
+                agg = child_agg.copy() if agg is None else agg + child_agg
+        if agg is not None:
+            self._tier_aggregates[key] = agg
+        return agg
+
+    def find_hierarchical_capacity(self, buffers_sec, tiers=TIERS):
+        """
+        Required capacity of every node of each requested tier, each tier with
+        its own buffer: buffers_sec = {"link": 143e-6, "switch": ..., "uplink": ...}.
+        Upper tiers are sized for their children's offered load, which is
+        conservative (it ignores the <= MAX_DROP_RATE shed below them).
+        """
+        if self.deployment_mode or self.thr_df is None:
+            raise ValueError("Hierarchical capacity needs the per-cell data, which deployment mode does not load.")
+        unknown = [t for t in tiers if t not in TIERS]
+        if unknown:
+            raise ValueError(f"Unknown tier(s) {unknown}, expected some of {list(TIERS)}.")
+
+        results = {}
+        for tier in tiers:
+            buffer_sec = buffers_sec.get(tier, DEFAULT_BUFFER_TIME_SEC)
+            children = {l: list(cells) for l, cells in self.links.items()} if tier == "link" else self.hierarchy[tier]
+            nodes = {}
+            for node_id, child_ids in children.items():
+                if tier == "link":
+                    res = self.optimize_link_cached(node_id, buffer_sec)
+                else:
+                    agg = self.tier_aggregate(tier, node_id)
+                    res = None
+                    if agg is not None:
+                        peak = agg.max()
+                        res = self._capacity_result(self._search_capacity(agg, buffer_sec, 0, peak * 1.5), peak)
+                if res is None: continue
+                res["children"] = child_ids
+                nodes[str(node_id)] = res
+            results[tier] = {
+                "buffer_us": round(buffer_sec * 1e6, 3),
+                "total_capacity": round(sum(n["optimal_capacity"] for n in nodes.values()), 2),
+                "nodes": nodes
             }
         return results
 
-    def calculate_financials(self, buffer_time_sec_param, cost_per_gbps=50.0):
-        """Calculates financial savings based on capacity reduction."""
-        optimization_results = self.find_optimal_capacity(buffer_time_sec_param)
+    def find_windowed_capacity(self, link_id, window_sec, buffer_time_sec_param, carry_state=False):
+        """
+        Required capacity over time: splits the link's aggregated series into
+        `window_sec` windows and returns the no-buffer (peak) and buffered
+        capacity of each. Windows are searched in parallel.
+        """
+        if self.deployment_mode or self.thr_df is None:
+            raise ValueError("Windowed capacity needs the per-cell data, which deployment mode does not load.")
+        if window_sec <= 0:
+            raise ValueError("window_sec must be positive.")
+        group_throughput = self.link_aggregate(link_id)
+        if group_throughput is None: return []
+
+        timestamps = np.asarray(self.thr_df.index.values, dtype=np.float64)
+        bounds = window_bounds(timestamps, window_sec)
+        with span("simulate"):
+            caps, peaks = window_capacities_jit(
+                np.ascontiguousarray(group_throughput, dtype=np.float64), bounds,
+                buffer_time_sec_param, carry_state, 1.5, 15, MAX_DROP_RATE)
+
+        windows = []
+        for w in range(len(bounds) - 1):
+            if bounds[w + 1] <= bounds[w]: continue
+            windows.append({
+                "start": float(timestamps[bounds[w]]),
+                "end": float(timestamps[bounds[w + 1] - 1]),
+                "peak_gbps": round(float(peaks[w]), 2),
+                "capacity_gbps": round(float(caps[w]), 2)
+            })
+        return windows
+
+    def calculate_financials(self, buffer_time_sec_param, cost_per_gbps=DEFAULT_COST_PER_GBPS, optimization_results=None):
+        """Calculates financial savings based on capacity reduction (reusing optimization_results if given)."""
+        if optimization_results is None:
+            optimization_results = self.find_optimal_capacity(buffer_time_sec_param)
         
         total_peak_capacity = 0
         total_optimal_capacity = 0
@@ -219,24 +577,31 @@ class NetworkLogic:
             "optimization_details": optimization_results
         }
 
-    def _run_leaky_bucket(self, capacity_gbps, input_series, buffer_time_sec):
-        return run_leaky_bucket_jit(capacity_gbps, input_series.values, buffer_time_sec)
+    def _run_leaky_bucket(self, capacity_gbps, inputs, buffer_time_sec):
+        """inputs: a dense series, or its (values, gaps) from idle_runs for repeated runs."""
+        start = time.perf_counter()
+        with span("simulate"):
+            if isinstance(inputs, tuple):
+                drop_rate = run_leaky_bucket_rle_jit(capacity_gbps, inputs[0], inputs[1], buffer_time_sec)
+            else:
+                drop_rate = run_leaky_bucket_jit(float(capacity_gbps), np.require(inputs, np.float64, ["C", "W"]),
+                                                 float(buffer_time_sec))
+        record_simulation(time.perf_counter() - start)
+        return drop_rate
 
 
     
     def get_link_stats(self, link_id):
         if self.deployment_mode:
-            return self.link_stats_cache.get(str(link_id), {})
+            record_cache("link_stats", self.deployment.has_stats(link_id))
+            with span("load"):
+                return self.deployment.stats(link_id)
+        record_cache("link_stats", False)
 
         """Calculates detailed statistics (Peak, P99, P95, Avg) for a link."""
-        cell_ids = self.links.get(int(link_id))
-        if not cell_ids: return {}
-        
-        valid_cells = [c for c in cell_ids if c in self.thr_df.columns]
-        if not valid_cells: return {}
-        
-        agg_thr = self.thr_df[valid_cells].sum(axis=1)
-        values = agg_thr.values
+        if not self.links.get(int(link_id)): return {}
+        values = self.link_aggregate(link_id)
+        if values is None: return {}
         
         return {
             "link_id": link_id,
@@ -248,19 +613,16 @@ class NetworkLogic:
 
     def get_traffic_sample(self, link_id):
         if self.deployment_mode:
-            data = self.traffic_summary_cache.get(str(link_id), [])
-            return data
+            with span("load"):
+                return self.deployment.traffic(link_id)
 
-        cell_ids = self.links.get(int(link_id))
-        if not cell_ids: return []
-        
-        valid_cells = [c for c in cell_ids if c in self.thr_df.columns]
-        agg_thr = self.thr_df[valid_cells].sum(axis=1)
+        if not self.links.get(int(link_id)): return []
+        values = self.link_aggregate(link_id)
+        if values is None: return []
         
         # Downsample for UI (Target ~2000 points)
         resp = []
-        timestamps = agg_thr.index
-        values = agg_thr.values
+        timestamps = self.thr_df.index
         
         target_points = 2000
         step = max(1, len(timestamps) // target_points)
@@ -272,29 +634,40 @@ class NetworkLogic:
             })
         return resp
 
-# Static JIT Helper
-@jit(nopython=True)
-def run_leaky_bucket_jit(capacity_gbps, inputs, buffer_time_sec):
-    dt = 0.0005 # SLOT_DURATION
-    max_buffer_bits = capacity_gbps * 1e9 * buffer_time_sec
-    drain_rate = capacity_gbps * 1e9 * dt
-    
-    current_buffer = 0.0
-    total_input = 0.0
-    total_dropped = 0.0
-    
-    for inp_gbps in inputs:
-        inp_bits = inp_gbps * 1e9 * dt
-        total_input += inp_bits
-        current_buffer += inp_bits
-        current_buffer -= drain_rate
-        
-        if current_buffer < 0: current_buffer = 0
-        if current_buffer > max_buffer_bits:
-            drop = current_buffer - max_buffer_bits
-            total_dropped += drop
-            current_buffer = max_buffer_bits
-            
-    if total_input > 0:
-        return total_dropped / total_input
-    return 0.0
+    def dashboard_sections(self, buffer_time_sec_param, cost_per_gbps=DEFAULT_COST_PER_GBPS, first_link=None,
+                           sections=DASHBOARD_SECTIONS):
+        """
+        Everything the dashboard shows, as (section, payload) pairs in the
+        order it is needed: topology, then each link's stats and traffic
+        (first_link first), then the optimization and the financials derived
+        from it. `sections` picks a subset of DASHBOARD_SECTIONS, so a client
+        can load the parameter-independent part once and only refetch the
+        rest. Each link is aggregated once and the optimization is shared
+        with the financials, so nothing is computed twice.
+        """
+        unknown = set(sections) - set(DASHBOARD_SECTIONS)
+        if unknown:
+            raise ValueError(f"Unknown dashboard section(s): {', '.join(sorted(unknown))}")
+
+        if "topology" in sections:
+            yield "topology", self.get_topology()
+
+        if "links" in sections:
+            link_ids = sorted(self.links)
+            if first_link is not None and int(first_link) in self.links:
+                link_ids.remove(int(first_link))
+                link_ids.insert(0, int(first_link))
+            for link_id in link_ids:
+                yield "link", {
+                    "link_id": link_id,
+                    "cells": self.links[link_id],
+                    "stats": self.get_link_stats(link_id),
+                    "traffic": self.get_traffic_sample(link_id)
+                }
+
+        if "optimization" in sections or "financials" in sections:
+            optimization = self.find_optimal_capacity(buffer_time_sec_param)
+            if "optimization" in sections:
+                yield "optimization", optimization
+            if "financials" in sections:
+                yield "financials", self.calculate_financials(buffer_time_sec_param, cost_per_gbps, optimization)
@@ -0,0 +1,152 @@
+"""
+Prometheus instrumentation for the backend.
+
+All metrics live in-process and cost a lock plus a few float updates per
+observation. Under gunicorn, set PROMETHEUS_MULTIPROC_DIR (gunicorn.conf.py
+does this) so every worker writes its samples to a shared directory and
+/metrics aggregates all workers at scrape time.
+"""
+import os
+import time
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+MEMORY_REFRESH_SEC = 1.0  # Don't read /proc more than once a second per worker
+
+REQUEST_COUNT = Counter(
+    "netoptic_http_requests_total",
+    "HTTP requests served, by route template and status code.",
+    ["method", "route", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "netoptic_http_request_duration_seconds",
+    "HTTP request latency, by route template.",
+    ["method", "route"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+SIMULATION_COUNT = Counter(
+    "netoptic_simulations_total",
+    "Leaky-bucket simulations run (run_leaky_bucket_jit calls).",
+)
+SIMULATION_LATENCY = Histogram(
+    "netoptic_simulation_duration_seconds",
+    "Duration of a single leaky-bucket simulation.",
+    buckets=(1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 0.01, 0.05, 0.1, 0.5, 1.0),
+)
+CACHE_REQUESTS = Counter(
+    "netoptic_cache_requests_total",
+    "Cache lookups by cache name and result (hit or miss).",
+    ["cache", "result"],
+)
+DATA_LOAD_SECONDS = Gauge(
+    "netoptic_data_load_seconds",
+    "Time spent on the last load of each dataset (the default one or a registry site).",
+    ["site"],
+    multiprocess_mode="livemax",
+)
+DEPLOYMENT_MODE = Gauge(
+    "netoptic_deployment_mode",
+    "1 if the dataset is served from pre-computed deployment data, 0 if it was loaded from raw CSVs.",
+    ["site"],
+    multiprocess_mode="livemax",
+)
+DATASET_RELOADS = Counter(
+    "netoptic_dataset_reloads_total",
+    "Hot reloads of the dataset after its files changed, by result.",
+    ["result"],
+)
+AUTH_REJECTIONS = Counter(
+    "netoptic_auth_rejections_total",
+    "Sign-ins turned away with 503 by the password hash pool, by reason.",
+    ["reason"],
+)
+RESIDENT_MEMORY = Gauge(
+    "netoptic_resident_memory_bytes",
+    "Resident set size of the worker process.",
+    multiprocess_mode="liveall",
+)
+
+_last_memory_update = 0.0
+
+
+def record_simulation(seconds):
+    SIMULATION_COUNT.inc()
+    SIMULATION_LATENCY.observe(seconds)
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def record_data_load(seconds, deployment_mode, site="default"):
+    DATA_LOAD_SECONDS.labels(site=site).set(seconds)
+    DEPLOYMENT_MODE.labels(site=site).set(1 if deployment_mode else 0)
+
+
+def record_reload(success):
+    DATASET_RELOADS.labels(result="success" if success else "failure").inc()
+
+
+def record_auth_rejection(reason):
+    AUTH_REJECTIONS.labels(reason=reason).inc()
+
+
+def _resident_memory_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # Non-Linux fallback: peak RSS, reported in KB on Linux and bytes on macOS
+        import resource
+        import sys
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _update_memory(force=False):
+    global _last_memory_update
+    now = time.monotonic()
+    if force or now - _last_memory_update >= MEMORY_REFRESH_SEC:
+        _last_memory_update = now
+        RESIDENT_MEMORY.set(_resident_memory_bytes())
+
+
+def _route_label():
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+def init_metrics(app):
+    """Registers request instrumentation and the /metrics endpoint on `app`."""
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop("_metrics_start", None)
+        if start is not None:
+            route = _route_label()
+            REQUEST_LATENCY.labels(request.method, route).observe(time.perf_counter() - start)
+            REQUEST_COUNT.labels(request.method, route, str(response.status_code)).inc()
+        _update_memory()
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        _update_memory(force=True)
+        if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+        return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
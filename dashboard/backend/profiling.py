@@ -0,0 +1,186 @@
+"""
+Where a request's time goes.
+
+Always on: logic.py wraps its phases in span("load" | "aggregate" |
+"simulate" | "serialize"), and every response carries the per-phase totals
+in a Server-Timing header (milliseconds; browsers show it in the network
+panel). Nested spans of the same phase are only counted once. Streamed
+responses are the exception: their headers go out before the body is
+generated, so they get no Server-Timing header; the streaming view reports
+request_timings() at the end of its body instead (/api/dashboard sends it
+as a final "timing" record).
+
+Opt-in: a request with `X-Profile-Token: <PROFILE_TOKEN>` also runs under a
+sampling profiler. A sampler thread snapshots the request thread's stack
+every PROFILE_INTERVAL_MS and the counts are written as folded stacks
+(`frame;frame;frame count` per line, the input format of flamegraph.pl,
+speedscope and inferno) to PROFILE_DIR. The response names the profile in
+X-Profile-Id, and GET /api/profiles/<id> with the same header returns it.
+Without PROFILE_TOKEN set, profiling is disabled entirely.
+
+Numba kernels don't create Python frames, so their time shows up on the
+Python function that called them.
+"""
+import hmac
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from flask import Response, abort, g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+SPANS = ("load", "aggregate", "simulate", "serialize")
+PROFILE_HEADER = "X-Profile-Token"
+PROFILE_KEEP = 50          # Folded profiles kept on disk; older ones are deleted
+PROFILE_MAX_SEC = 60.0     # A sampler stops by itself after this long
+
+
+@contextmanager
+def span(name):
+    """Adds the time spent in the block to this request's `name` phase. No-op outside a request."""
+    if not has_request_context() or "_spans" not in g:
+        yield
+        return
+    depth = g._span_depth
+    if depth.get(name):
+        # Already inside this phase (e.g. a simulation inside a capacity search)
+        yield
+        return
+    depth[name] = 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        depth[name] = 0
+        g._spans[name] = g._spans.get(name, 0.0) + time.perf_counter() - start
+
+
+def timings_ms(spans, total):
+    """{phase: milliseconds} for every SPANS phase, any other span, and the total."""
+    timings = {name: spans.get(name, 0.0) * 1000 for name in SPANS}
+    timings.update({name: sec * 1000 for name, sec in spans.items() if name not in SPANS})
+    timings["total"] = total * 1000
+    return timings
+
+
+def server_timing(spans, total):
+    return ", ".join(f"{name};dur={ms:.2f}" for name, ms in timings_ms(spans, total).items())
+
+
+def request_timings():
+    """This request's per-phase milliseconds so far, rounded; {} outside a timed request."""
+    if not has_request_context() or g.get("_request_start") is None:
+        return {}
+    timings = timings_ms(g._spans, time.perf_counter() - g._request_start)
+    return {name: round(ms, 2) for name, ms in timings.items()}
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """jsonify() with its encoding counted as the serialize phase."""
+
+    def dumps(self, obj, **kwargs):
+        with span("serialize"):
+            return super().dumps(obj, **kwargs)
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a background thread and counts the folded stacks."""
+
+    def __init__(self, thread_id, interval_sec=0.001, max_sec=PROFILE_MAX_SEC):
+        self.thread_id = thread_id
+        self.interval_sec = interval_sec
+        self.max_sec = max_sec
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self
+
+    def _run(self):
+        deadline = time.monotonic() + self.max_sec
+        while not self._stop.wait(self.interval_sec) and time.monotonic() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def folded(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+def _authorized(token):
+    supplied = request.headers.get(PROFILE_HEADER)
+    return bool(token) and supplied is not None and hmac.compare_digest(supplied.encode(), token.encode())
+
+
+def _save_profile(profile_dir, profile_id, folded):
+    os.makedirs(profile_dir, exist_ok=True)
+    path = os.path.join(profile_dir, f"{profile_id}.folded")
+    with open(path, "w") as f:
+        f.write(folded)
+    profiles = sorted((os.path.join(profile_dir, n) for n in os.listdir(profile_dir) if n.endswith(".folded")),
+                      key=os.path.getmtime)
+    for old in profiles[:-PROFILE_KEEP]:
+        try:
+            os.remove(old)
+        except OSError:
+            pass
+    return path
+
+
+def init_profiling(app, token=None, profile_dir=None, interval_ms=1.0):
+    """Registers the Server-Timing header, the opt-in sampler and GET /api/profiles/<id> on `app`."""
+    token = token if token is not None else os.getenv("PROFILE_TOKEN", "")
+    profile_dir = profile_dir or os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "netoptic_profiles"))
+    interval_ms = float(os.getenv("PROFILE_INTERVAL_MS", interval_ms))
+    app.json = TimedJSONProvider(app)
+
+    # A URL value preprocessor rather than before_request: app-level ones run before the
+    # blueprint's (site loading), so that load is inside the timed request too
+    @app.url_value_preprocessor
+    def _start_spans(endpoint, values):
+        g._spans, g._span_depth = {}, {}
+        g._request_start = time.perf_counter()
+        if _authorized(token):
+            g._profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+            g._sampler = StackSampler(threading.get_ident(), interval_ms / 1000).start()
+
+    @app.after_request
+    def _finish_spans(response):
+        start = g.get("_request_start")
+        # A streamed body runs after this, so its header would always read 0 ms
+        if start is not None and not response.is_streamed:
+            response.headers["Server-Timing"] = server_timing(g._spans, time.perf_counter() - start)
+            response.headers["Timing-Allow-Origin"] = "*"
+        sampler = g.pop("_sampler", None)
+        if sampler is not None:
+            profile_id = g._profile_id
+            response.headers["X-Profile-Id"] = profile_id
+            # Stopped once the body is sent, so streamed responses are profiled to the end
+            response.call_on_close(lambda: _save_profile(profile_dir, profile_id, sampler.stop().folded()))
+        return response
+
+    @app.route('/api/profiles/<profile_id>', methods=['GET'])
+    def get_profile(profile_id):
+        if not _authorized(token):
+            abort(403)
+        path = os.path.join(profile_dir, f"{os.path.basename(profile_id)}.folded")
+        if not os.path.exists(path):
+            abort(404)
+        with open(path, "r") as f:
+            return Response(f.read(), mimetype="text/plain")
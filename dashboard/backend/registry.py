@@ -0,0 +1,101 @@
+"""
+On-demand registry of per-site datasets.
+
+Every subdirectory of the sites root is one site with its own `output/`-style
+contents (link_capacity_estimates.csv, cell CSVs and/or a deployment
+snapshot). Each site gets a private NetworkLogic; the registry keeps them in
+LRU order and evicts the least recently used ones once their combined
+footprint exceeds the memory budget. Footprints include the per-link and
+per-tier aggregate caches, which grow as a site is used, so they are
+re-measured whenever the budget is checked (each time a site loads) rather
+than taken once at load.
+"""
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+try:
+    from .logic import NetworkLogic
+except ImportError:
+    from logic import NetworkLogic
+
+SITE_NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+# First path segments under /api/ that already belong to single-dataset routes
+RESERVED_SITE_NAMES = {"auth", "capacity", "images", "profiles", "report", "sites", "stats", "traffic"}
+
+
+class UnknownSiteError(KeyError):
+    pass
+
+
+class DatasetRegistry:
+    def __init__(self, root_dir, memory_budget_bytes, loader=NetworkLogic):
+        self.root_dir = Path(root_dir)
+        self.memory_budget_bytes = memory_budget_bytes
+        self.loader = loader
+        self._datasets = OrderedDict()  # site -> logic, oldest first
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    def site_dir(self, site):
+        if not SITE_NAME_RE.match(site) or site in RESERVED_SITE_NAMES:
+            raise UnknownSiteError(site)
+        path = self.root_dir / site
+        if not path.is_dir():
+            raise UnknownSiteError(site)
+        return path
+
+    def sites(self):
+        if not self.root_dir.is_dir():
+            return []
+        return sorted(p.name for p in self.root_dir.iterdir()
+                      if p.is_dir() and SITE_NAME_RE.match(p.name) and p.name not in RESERVED_SITE_NAMES)
+
+    def resident(self):
+        """{site: footprint bytes} for the loaded datasets, least recently used first."""
+        with self._lock:
+            return {site: logic.memory_footprint() for site, logic in self._datasets.items()}
+
+    def get(self, site):
+        """Returns the NetworkLogic for `site`, loading it if needed."""
+        with self._lock:
+            if site in self._datasets:
+                self._datasets.move_to_end(site)
+                return self._datasets[site]
+            load_lock = self._load_locks.setdefault(site, threading.Lock())
+
+        # Load outside the registry lock so other sites keep being served;
+        # the per-site lock stops concurrent requests from loading it twice.
+        with load_lock:
+            with self._lock:
+                if site in self._datasets:
+                    self._datasets.move_to_end(site)
+                    return self._datasets[site]
+
+            logic = self.loader(self.site_dir(site), site=site)
+
+            with self._lock:
+                self._datasets[site] = logic
+                self._evict(keep=site)
+                self._load_locks.pop(site, None)
+        return logic
+
+    def evict(self, site):
+        with self._lock:
+            self._datasets.pop(site, None)
+
+    def _evict(self, keep):
+        # Never evict the dataset that was just requested, even if it alone exceeds the budget
+        sizes = {site: logic.memory_footprint() for site, logic in self._datasets.items()}
+        total = sum(sizes.values())
+        for site in list(self._datasets):
+            if total <= self.memory_budget_bytes:
+                break
+            if site == keep:
+                continue
+            del self._datasets[site]
+            size = sizes[site]
+            total -= size
+            print(f"Evicted dataset '{site}' ({size / 1e6:.1f} MB) to stay within the memory budget.")
@@ -0,0 +1,107 @@
+"""
+Hot reload of the default dataset.
+
+A watcher thread polls the modification times of the dataset's inputs
+(topology CSV, cell CSVs, hierarchy and deployment snapshot). When they
+change and then stay unchanged for one more poll, so a Phase 2 rerun that is
+still writing files is not picked up half-way, a new NetworkLogic is built in
+the background. It is then swapped in with a single reference assignment,
+but only if it actually loaded links and traffic; NetworkLogic prints load
+errors and leaves an empty dataset instead of raising, so a broken or
+half-written directory would otherwise replace the live data with nothing.
+Requests pin the dataset they started with, so in-flight requests finish on
+the old version. Derived caches (aggregates, optima, the parsed capacity
+report) live on the NetworkLogic and are versioned with it.
+"""
+import threading
+import time
+from pathlib import Path
+
+try:
+    from .logic import HIERARCHY_FILE, NetworkLogic
+    from .deployment_snapshot import SNAPSHOT_NAME
+    from .metrics import record_reload
+    from .shared_dataset import source_fingerprint
+except ImportError:
+    from logic import HIERARCHY_FILE, NetworkLogic
+    from deployment_snapshot import SNAPSHOT_NAME
+    from metrics import record_reload
+    from shared_dataset import source_fingerprint
+
+WATCHED_FILES = ("link_capacity_estimates.csv", HIERARCHY_FILE, SNAPSHOT_NAME)
+
+
+class DatasetReloader:
+    def __init__(self, data_dir, loader=NetworkLogic, interval=5.0):
+        self.data_dir = Path(data_dir)
+        self.loader = loader
+        self.interval = interval
+        self.version = 1
+        self.current = loader(self.data_dir)
+        self._loaded_fingerprint = self.fingerprint()
+        self._pending_fingerprint = None
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def fingerprint(self):
+        """(name, size, mtime) of every watched input; None while files are being replaced."""
+        files = [self.data_dir / name for name in WATCHED_FILES]
+        files += list(self.data_dir.glob("cell_*_aligned.csv"))
+        try:
+            return source_fingerprint([p for p in files if p.exists()])
+        except FileNotFoundError:
+            return None
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._watch, name="dataset-reloader", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:  # Keep watching; the old dataset stays live
+                print(f"Dataset reload check failed: {e}")
+
+    def check(self):
+        """Reloads if the inputs changed and have been stable since the previous check. Returns True on swap."""
+        fingerprint = self.fingerprint()
+        if fingerprint is None or fingerprint == self._loaded_fingerprint:
+            self._pending_fingerprint = None
+            return False
+        if fingerprint != self._pending_fingerprint:
+            # Changed since the last poll: wait for the writer to finish
+            self._pending_fingerprint = fingerprint
+            return False
+        return self.reload(fingerprint)
+
+    def reload(self, fingerprint=None):
+        """Builds a fresh dataset and swaps it in. Returns True on success."""
+        with self._reload_lock:
+            fingerprint = fingerprint or self.fingerprint()
+            print(f"Dataset inputs in {self.data_dir} changed, loading version {self.version + 1}...")
+            start = time.perf_counter()
+            try:
+                fresh = self.loader(self.data_dir)
+                if not fresh.has_data():
+                    raise ValueError(f"no links or cells could be loaded from {self.data_dir}")
+            except Exception as e:
+                print(f"Dataset reload failed, still serving version {self.version}: {e}")
+                record_reload(False)
+                # Don't retry the same broken inputs on every poll
+                self._loaded_fingerprint = fingerprint
+                return False
+
+            self.current = fresh  # Atomic swap; requests already holding the old one are unaffected
+            self.version += 1
+            self._loaded_fingerprint = fingerprint
+            self._pending_fingerprint = None
+            record_reload(True)
+            print(f"Dataset version {self.version} live ({time.perf_counter() - start:.1f}s).")
+            return True
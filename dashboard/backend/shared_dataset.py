@@ -0,0 +1,138 @@
+"""
+Memory-mapped snapshot of the resampled dataset (thr_df / loss_df).
+
+The first process to load a data directory parses the aligned CSVs once and
+writes the resampled matrices to `<data_dir>/.dataset_snapshot/` as raw .npy
+files. Every gunicorn worker then maps those files read-only, so the page
+cache holds a single copy no matter how many workers are running.
+"""
+import json
+import os
+import numpy as np
+import pandas as pd
+from contextlib import contextmanager
+from pathlib import Path
+
+SNAPSHOT_DIR = ".dataset_snapshot"
+MANIFEST_NAME = "manifest.json"
+FORMAT_VERSION = 1
+
+
+def source_fingerprint(files):
+    """(name, size, mtime) of every source CSV, used to detect a stale snapshot."""
+    fingerprint = []
+    for p in sorted(files, key=lambda p: p.name):
+        st = p.stat()
+        fingerprint.append([p.name, st.st_size, st.st_mtime_ns])
+    return fingerprint
+
+
+@contextmanager
+def _build_lock(data_dir):
+    # Serializes snapshot builds so N workers booting together parse the CSVs once
+    lock_path = Path(data_dir) / (SNAPSHOT_DIR + ".lock")
+    with open(lock_path, "a") as lock_file:
+        try:
+            import fcntl
+        except ImportError:  # Windows: no flock, builds just race (writes are atomic)
+            yield
+            return
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def load_snapshot(data_dir, files):
+    """
+    Maps an existing snapshot read-only.
+    Returns (loss_df, thr_df), or None if it is missing, stale or unreadable.
+    """
+    snap_dir = Path(data_dir) / SNAPSHOT_DIR
+    manifest_path = snap_dir / MANIFEST_NAME
+    if not manifest_path.exists():
+        return None
+
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != FORMAT_VERSION:
+            return None
+        if manifest.get("sources") != source_fingerprint(files):
+            return None
+
+        index = np.load(snap_dir / "index.npy", mmap_mode="r")
+        thr = np.load(snap_dir / "thr.npy", mmap_mode="r")
+        loss = np.load(snap_dir / "loss.npy", mmap_mode="r")
+    except Exception as e:
+        print(f"Ignoring unreadable dataset snapshot: {e}")
+        return None
+
+    # Matrices are stored cell-major, so each column is one contiguous run of pages
+    columns = manifest["columns"]
+    index = pd.Index(index, copy=False)
+    thr_df = pd.DataFrame(thr.T, index=index, columns=columns, copy=False)
+    loss_df = pd.DataFrame(loss.T, index=index, columns=columns, copy=False)
+    return loss_df, thr_df
+
+
+def write_snapshot(data_dir, files, loss_df, thr_df):
+    """Writes the matrices and a manifest; each file is replaced atomically."""
+    snap_dir = Path(data_dir) / SNAPSHOT_DIR
+    snap_dir.mkdir(exist_ok=True)
+
+    # Drop the manifest first so a reader never pairs it with half-written arrays
+    manifest_path = snap_dir / MANIFEST_NAME
+    if manifest_path.exists():
+        manifest_path.unlink()
+
+    arrays = {
+        "index": np.asarray(thr_df.index.values, dtype=np.float64),
+        "thr": np.ascontiguousarray(thr_df.values.T, dtype=np.float64),
+        "loss": np.ascontiguousarray(loss_df[thr_df.columns].values.T, dtype=np.float64),
+    }
+    for name, arr in arrays.items():
+        tmp_path = snap_dir / f"{name}.tmp.npy"
+        np.save(tmp_path, arr)
+        os.replace(tmp_path, snap_dir / f"{name}.npy")
+
+    manifest = {
+        "version": FORMAT_VERSION,
+        "columns": [str(c) for c in thr_df.columns],
+        "sources": source_fingerprint(files),
+    }
+    tmp_path = snap_dir / (MANIFEST_NAME + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+
+def attach_or_build(data_dir, files, build):
+    """
+    Returns (loss_df, thr_df, attached) backed by the shared snapshot.
+    `build()` is called (by exactly one process) when no fresh snapshot exists
+    and must return (loss_df, thr_df) from the source CSVs.
+    """
+    snapshot = load_snapshot(data_dir, files)
+    if snapshot is not None:
+        return snapshot[0], snapshot[1], True
+
+    with _build_lock(data_dir):
+        # Another worker may have finished the build while we waited
+        snapshot = load_snapshot(data_dir, files)
+        if snapshot is not None:
+            return snapshot[0], snapshot[1], True
+
+        loss_df, thr_df = build()
+        try:
+            write_snapshot(data_dir, files, loss_df, thr_df)
+        except OSError as e:
+            print(f"Could not write dataset snapshot, keeping private copy: {e}")
+            return loss_df, thr_df, False
+
+    # Re-open through the mapping so the builder drops its private copy too
+    snapshot = load_snapshot(data_dir, files)
+    if snapshot is None:
+        return loss_df, thr_df, False
+    return snapshot[0], snapshot[1], False
@@ -0,0 +1,108 @@
+"""
+Auth routes against an in-memory MongoDB (mongomock), no server or database needed:
+
+    pip install mongomock
+    python test_auth_local.py
+"""
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017/netoptic")
+os.environ["NETOPTIC_MONGO_MOCK"] = "1"
+os.environ["NETOPTIC_MOCK_AUTH"] = "0"
+os.environ.setdefault("NETOPTIC_RELOAD_INTERVAL", "0")
+os.environ.setdefault("NETOPTIC_WARMUP", "0")
+
+import app as backend
+
+client = backend.app.test_client()
+
+def test_signup_login_me():
+    creds = {"email": "local@example.com", "password": "password123", "name": "Local User"}
+    r = client.post("/api/auth/signup", json=creds)
+    print(f"signup: {r.status_code} {r.json['msg']}")
+    assert r.status_code == 201, "signup failed"
+
+    r = client.post("/api/auth/signup", json=creds)
+    print(f"duplicate signup: {r.status_code} {r.json['msg']}")
+    assert r.status_code == 400, "duplicate email accepted"
+
+    r = client.post("/api/auth/login", json={"email": creds["email"], "password": "wrong"})
+    print(f"wrong password: {r.status_code}")
+    assert r.status_code == 401, "wrong password accepted"
+
+    r = client.post("/api/auth/login", json=creds)
+    print(f"login: {r.status_code} {r.json['msg']}")
+    assert r.status_code == 200, "login failed"
+    headers = {"Authorization": f"Bearer {r.json['token']}"}
+
+    lookups = []
+    find_user = backend.find_user
+    backend.find_user = lambda user_id: lookups.append(user_id) or find_user(user_id)
+    try:
+        for _ in range(3):
+            r = client.get("/api/auth/me", headers=headers)
+    finally:
+        backend.find_user = find_user
+    print(f"me: {r.status_code} {r.json} ({len(lookups)} lookup(s) for 3 requests)")
+    assert r.status_code == 200 and r.json["email"] == creds["email"], "/api/auth/me failed"
+    assert len(lookups) <= 1, "user lookups were not cached"
+
+    from bson import ObjectId
+    unknown_id = str(ObjectId())
+    missing = backend.load_user(None, {"sub": unknown_id})
+    print(f"unknown user: {missing} (cached: {unknown_id in backend.user_cache})")
+    assert missing is None and unknown_id not in backend.user_cache, "missing user was cached"
+    print("SUCCESS: Local auth flow works.")
+
+def test_user_indexes():
+    # A fresh collection gets a unique index; an email index made by hand is kept as it is,
+    # and duplicate emails fall back to a non-unique index, without raising in either case
+    import mongomock
+    index_keys = lambda db: {name: (index["key"], index.get("unique", False))
+                             for name, index in db.users.index_information().items()}
+
+    fresh = mongomock.MongoClient().get_database("fresh")
+    backend.ensure_user_indexes(fresh)
+    backend.ensure_user_indexes(fresh)
+    print(f"fresh: {index_keys(fresh)}")
+    assert ([("email", 1)], True) in index_keys(fresh).values(), "no unique email index"
+
+    manual = mongomock.MongoClient().get_database("manual")
+    manual.users.create_index("email")
+    backend.ensure_user_indexes(manual)
+    print(f"existing email_1: {index_keys(manual)}")
+    assert index_keys(manual)["email_1"] == ([("email", 1)], False), "existing index changed"
+
+    duplicates = mongomock.MongoClient().get_database("duplicates")
+    duplicates.users.insert_many([{"email": "twice@example.com"}, {"email": "twice@example.com"}])
+    backend.ensure_user_indexes(duplicates)
+    print(f"duplicate emails: {index_keys(duplicates)}")
+    assert ([("email", 1)], False) in index_keys(duplicates).values(), "no email index"
+    print("SUCCESS: Email indexes are created or kept.")
+
+def test_admission_control():
+    # A one-slot pool whose only slot is held: the next sign-in must be refused, not queued
+    pool = backend.hash_pool
+    backend.hash_pool = backend.HashPool(workers=1, max_pending=1, timeout=5)
+    started, release = threading.Event(), threading.Event()
+    blocker = threading.Thread(target=backend.hash_pool.run, args=(lambda: started.set() or release.wait(),))
+    blocker.start()
+    try:
+        assert started.wait(5), "blocking hash never started"
+        r = client.post("/api/auth/login", json={"email": "local@example.com", "password": "password123"})
+        print(f"login with a full hash pool: {r.status_code} (Retry-After: {r.headers.get('Retry-After')})")
+        assert r.status_code == 503 and r.headers.get("Retry-After"), "overload was not answered with 503"
+        print("SUCCESS: Overload answered with 503.")
+    finally:
+        release.set()
+        blocker.join()
+        backend.hash_pool = pool
+
+if __name__ == "__main__":
+    test_signup_login_me()
+    test_user_indexes()
+    test_admission_control()
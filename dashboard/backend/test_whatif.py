@@ -0,0 +1,42 @@
+import urllib.request
+import json
+import urllib.error
+
+API_URL = "http://127.0.0.1:5000/api"
+
+def test_whatif():
+    # Move the first cell of Link 1 to Link 3 and compare capacities
+    try:
+        with urllib.request.urlopen(f"{API_URL}/topology") as response:
+            topology = json.loads(response.read().decode())
+    except Exception as e:
+        print(f"ERROR: {e}")
+        return
+    cells = [l["source"].replace("Cell ", "") for l in topology["links"] if l["target"] == "Link 1"]
+    if not cells:
+        print("FAILURE: Link 1 has no cells.")
+        return
+
+    url = f"{API_URL}/whatif"
+    payload = json.dumps({
+        "buffer_size_us": 143,
+        "moves": [{"cell": cells[0], "from": 1, "to": 3}]
+    }).encode()
+    req = urllib.request.Request(url, data=payload, headers={'Content-Type': 'application/json'})
+    print(f"POST {url} (cell {cells[0]}: link 1 -> 3)")
+    try:
+        with urllib.request.urlopen(req) as response:
+            data = json.loads(response.read().decode())
+            for link_id, res in data["links"].items():
+                print(f"  Link {link_id}: {res['before']['optimal_capacity']} -> {res['after']['optimal_capacity']} Gbps")
+            print(f"Capacity delta: {data['capacity_delta_gbps']} Gbps")
+            if set(data["links"]) == {"1", "3"}:
+                print("SUCCESS: What-if received.")
+    except urllib.error.HTTPError as e:
+        # Deployment mode has no per-cell data and answers 400
+        print(f"HTTP Error: {e.code} - {e.read().decode()}")
+    except Exception as e:
+        print(f"ERROR: {e}")
+
+if __name__ == "__main__":
+    test_whatif()
@@ -0,0 +1,9 @@
+"""
+File names of the Phase 1 raw logs, shared by main.py (ingestion) and
+pipeline.py (input hashing) without pulling in main.py's dependencies.
+"""
+import re
+
+# pkt-stats-cell-<id>.dat / throughput-cell-<id>.dat, optionally .gz or .zst compressed
+LOG_NAME_RE = re.compile(r"^(?P<kind>pkt-stats|throughput)-cell-(?P<cell>[A-Za-z0-9]+)\.dat(?:\.gz|\.zst)?$")
+LOG_KINDS = {"pkt-stats": "pkt", "throughput": "thr"}
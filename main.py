@@ -1,97 +1,369 @@
 import argparse
+import gzip
+import io
+import os
 import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+from numba import jit
 from pathlib import Path
 import random
+from render_queue import PLOT_MODES, RenderQueue
+from log_names import LOG_KINDS, LOG_NAME_RE
+
+try:
+    import zstandard  # Optional: only needed for .dat.zst archives
+except ImportError:
+    zstandard = None
 
 # Constants
 SYMBOL_DURATION = 0.0000357
 
+# Spike removal. --despike global: above max(median * 10, mean * 5, 100 kbits) of the
+# whole file. --despike rolling: above max(median * 10, 100 kbits) of the last
+# DESPIKE_WINDOW active (non-zero, non-spike) samples, so idle gaps and the spikes
+# themselves don't drag the cutoff around
+SPIKE_MEDIAN_FACTOR = 10.0
+SPIKE_MEAN_FACTOR = 5.0
+SPIKE_FLOOR_KBITS = 100.0
+DESPIKE_WINDOW = 2001          # Active samples in the rolling window
+DESPIKE_MIN_PERIODS = 64       # Until the window holds this many, only gross spikes are removed...
+DESPIKE_WARMUP_KBITS = 1000.0  # ...i.e. those above this
+DESPIKE_CHUNK = 1 << 16        # Rows per chunk read and despiked by --despike rolling
+SPIKES_CSV = "despike_spikes.csv"
+
+# Alignment. Both modes search packet-loss shifts on SHIFT_GRID (-1.5 s to 1.5 s in
+# 0.05 s steps). --align drift does it per sliding window, refines each window's
+# best shift to DRIFT_FINE_STEP_SEC and fits a piecewise-linear warp through them
+SHIFT_GRID = np.linspace(-1.5, 1.5, 61)
+DRIFT_WINDOW_SEC = 30.0
+DRIFT_FINE_STEP_SEC = 0.0005   # One slot
+DRIFT_MIN_CORR = 0.05          # Windows below this carry no usable loss signal and are not fitted
+SHIFT_BLOCK_ELEMENTS = 1 << 22 # Interpolated samples held at once when scoring shifts
+DRIFT_CSV = "alignment_drift.csv"
+
 def get_args():
     parser = argparse.ArgumentParser(description="Telecom Telemetry Phase 1: Cleaning & Alignment")
     parser.add_argument("log_dir", type=str, help="Path to the folder containing .dat logs")
+    parser.add_argument("--plots", choices=PLOT_MODES, default="deferred",
+                        help="Render sample alignment plots in background processes (default), inline, or not at all")
+    parser.add_argument("--prefetch", type=int, default=2,
+                        help="Cells to read ahead in a background thread while the current one is processed (0 = off)")
+    parser.add_argument("--despike", choices=("global", "rolling"), default="global",
+                        help="Spike cutoff from whole-file statistics, or 10x the rolling median of the preceding active samples")
+    parser.add_argument("--despike-window", type=int, default=DESPIKE_WINDOW,
+                        help="Samples in the rolling despike window")
+    parser.add_argument("--align", choices=("constant", "drift"), default="constant",
+                        help="One shift per cell, or a piecewise-linear shift fitted on sliding windows (clock drift)")
+    parser.add_argument("--drift-window", type=float, default=DRIFT_WINDOW_SEC,
+                        help="Seconds per sliding window in --align drift (windows overlap by half)")
     return parser.parse_args()
 
 def scan_files(log_dir):
     """
-    Scans the directory for pkt-stats-cell-*.dat and throughput-cell-*.dat files.
-    Returns a dict: { cell_id: {'pkt': path, 'thr': path} }
+    Scans the directory tree (e.g. day/site subfolders) for pkt-stats-cell-*.dat
+    and throughput-cell-*.dat files, plain or .gz/.zst compressed.
+    Returns a dict: { cell_id: {'pkt': [paths], 'thr': [paths]} }, one path
+    per directory holding a pair for that cell (a multi-day capture), in
+    sorted directory order.
     """
-    path = Path(log_dir)
-    if not path.is_dir():
+    if not os.path.isdir(log_dir):
         print(f"Error: Directory '{log_dir}' not found.")
         sys.exit(1)
         
-    cell_map = {}
+    valid_cells = {}
+    
+    # One pass per directory; pkt/thr files are paired within the same directory
+    stack = [log_dir]
+    while stack:
+        directory = stack.pop()
+        found = {}
+        subdirs = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                    continue
+                m = LOG_NAME_RE.match(entry.name)
+                if m and entry.is_file():
+                    found.setdefault(m.group("cell"), {})[LOG_KINDS[m.group("kind")]] = Path(entry.path)
+        
+        for cell_id, files in found.items():
+            if 'pkt' not in files or 'thr' not in files: continue
+            cell = valid_cells.setdefault(cell_id, {'pkt': [], 'thr': []})
+            cell['pkt'].append(files['pkt'])
+            cell['thr'].append(files['thr'])
+        # Reversed so the walk visits subdirectories in sorted order
+        stack.extend(sorted(subdirs, reverse=True))
     
-    # Scan for packet stats
-    for p in path.glob("pkt-stats-cell-*.dat"):
-        try:
-            parts = p.name.split('-')
-            cell_id = parts[3].replace('.dat', '')
-            if cell_id not in cell_map: cell_map[cell_id] = {}
-            cell_map[cell_id]['pkt'] = p
-        except: continue
-            
-    # Scan for throughput
-    for p in path.glob("throughput-cell-*.dat"):
-        try:
-            parts = p.name.split('-')
-            cell_id = parts[2].replace('.dat', '')
-            if cell_id not in cell_map: cell_map[cell_id] = {}
-            cell_map[cell_id]['thr'] = p
-        except: continue
-    
-    # Filter incomplete cells
-    valid_cells = {k: v for k, v in cell_map.items() if 'pkt' in v and 'thr' in v}
     print(f"Found {len(valid_cells)} complete cells (pkt + thr pair).")
+    split = sum(len(files['thr']) > 1 for files in valid_cells.values())
+    if split:
+        print(f"{split} cell(s) have log pairs in several directories; each is joined into one timeline.")
     return valid_cells
 
-def process_throughput(file_path):
+def open_log(file_path):
+    """
+    Opens a log as a text stream, decompressing .gz/.zst on the fly
+    (no temporary files), so pandas can parse it directly.
+    """
+    name = str(file_path)
+    if name.endswith(".gz"):
+        return gzip.open(file_path, "rt")
+    if name.endswith(".zst"):
+        if zstandard is None:
+            raise ImportError("reading .zst logs requires the 'zstandard' package")
+        raw = open(file_path, "rb")
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True))
+    return open(file_path, "r")
+
+def read_logs(file_paths, **read_csv_options):
+    """
+    Parses one cell's logs of one kind, one per capture directory, into a
+    single DataFrame with the parts in timestamp order. Parts whose time
+    ranges overlap are not pieces of one capture: ValueError.
+    """
+    parts = []
+    for file_path in file_paths:
+        with open_log(file_path) as f:
+            df = pd.read_csv(f, **read_csv_options)
+        if len(df):
+            parts.append((df["timestamp"].min(), df["timestamp"].max(), file_path, df))
+    parts.sort(key=lambda part: part[0])
+    for (_, prev_end, prev_path, _), (start, _, path, _) in zip(parts, parts[1:]):
+        if start <= prev_end:
+            raise ValueError(f"{path} overlaps {prev_path} in time")
+    if not parts:
+        return pd.DataFrame(columns=read_csv_options["names"])
+    return pd.concat([part[3] for part in parts], ignore_index=True)
+
+def stream_throughput(file_paths, despike_window=DESPIKE_WINDOW):
+    """
+    process_throughput with --despike rolling, without loading the logs
+    whole: they are parsed DESPIKE_CHUNK rows at a time, and each chunk is
+    despiked and converted to Gbps before the next is read, so only the
+    timestamp and gbps columns of the result are kept. Needs the samples in
+    timestamp order across the files, as they are logged; returns None at
+    the first out-of-order chunk.
+    """
+    despiker = RollingDespiker(despike_window)
+    timestamps, gbps, spikes = [], [], []
+    last = -np.inf
+    row = 0
+    for file_path in file_paths:
+        with open_log(file_path) as f:
+            for chunk in pd.read_csv(f, sep=r'\s+', header=None, names=["timestamp", "kbits"],
+                                     chunksize=DESPIKE_CHUNK):
+                ts = chunk["timestamp"].to_numpy(dtype=np.float64)
+                if len(ts) == 0: continue
+                if ts[0] < last or np.any(ts[1:] < ts[:-1]):
+                    return None
+                last = ts[-1]
+
+                kbits = chunk["kbits"].to_numpy(dtype=np.float64, copy=True)
+                cutoffs = despiker.feed(kbits)
+                spikes_mask = kbits > cutoffs
+                rows = np.flatnonzero(spikes_mask)
+                spikes.append(pd.DataFrame({"row": rows + row, "timestamp": ts[rows],
+                                            "kbits": kbits[rows], "cutoff": cutoffs[rows]}))
+                kbits[spikes_mask] = 0.0
+                timestamps.append(ts)
+                gbps.append((kbits * 1000) / SYMBOL_DURATION / 1e9)
+                row += len(ts)
+
+    if not timestamps:
+        return pd.DataFrame(columns=["timestamp", "gbps"]), pd.DataFrame(columns=["row", "timestamp", "kbits", "cutoff"])
+    # Rebinding drops each list of chunks as soon as it is joined, and copy=False keeps
+    # pandas from copying the joined columns once more into a single block
+    timestamps = np.concatenate(timestamps)
+    gbps = np.concatenate(gbps)
+    return pd.DataFrame({"timestamp": timestamps, "gbps": gbps}, copy=False), pd.concat(spikes, ignore_index=True)
+
+def process_throughput(file_paths, despike="global", despike_window=DESPIKE_WINDOW):
     """
-    Loads, sorts, cleans, and converts throughput data.
-    Returns DataFrame with ['timestamp', 'gbps']
+    Loads, sorts, cleans, and converts throughput data (see read_logs).
+    Returns DataFrame with ['timestamp', 'gbps'] and the removed spikes
+    (row, timestamp, kbits and the cutoff they exceeded) for the audit CSV.
     """
+    if despike == "rolling":
+        try:
+            streamed = stream_throughput(file_paths, despike_window)
+        except Exception as e:
+            print(f"Error reading throughput {', '.join(map(str, file_paths))}: {e}")
+            return None, None
+        if streamed is not None:
+            return streamed
+        # Out of order: read everything and sort it first, as --despike global does
+
     try:
-        df = pd.read_csv(file_path, sep=r'\s+', header=None, names=["timestamp", "kbits"])
+        df = read_logs(file_paths, sep=r'\s+', header=None, names=["timestamp", "kbits"])
     except Exception as e:
-        print(f"Error reading throughput {file_path}: {e}")
-        return None
+        print(f"Error reading throughput {', '.join(map(str, file_paths))}: {e}")
+        return None, None
 
     # Step 6: Sort
     df = df.sort_values("timestamp").reset_index(drop=True)
     
-    # Step 7: Remove spikes
-    median_val = df["kbits"].median()
-    mean_val = df["kbits"].mean()
-    
-    # Logic: If median is 0 (bursty traffic), use mean. Ensure existing floor (e.g. 0.1)
-    cutoff = max(median_val * 10, mean_val * 5, 100.0) # 100 kbits minimum floor
-    
-    # Replace spikes with 0
-    spikes_mask = df["kbits"] > cutoff
-    spike_count = spikes_mask.sum()
-    df.loc[spikes_mask, "kbits"] = 0.0
+    # Step 7: Remove spikes (replaced with 0)
+    kbits = df["kbits"].to_numpy(dtype=np.float64, copy=True)
+    if despike == "rolling":
+        # Same chunked feed as stream_throughput, on the sorted series
+        despiker = RollingDespiker(despike_window)
+        cutoffs = np.concatenate([despiker.feed(kbits[i:i + DESPIKE_CHUNK])
+                                  for i in range(0, len(kbits), DESPIKE_CHUNK)]) if len(kbits) else kbits
+    else:
+        # Logic: If median is 0 (bursty traffic), use mean. Ensure existing floor (e.g. 0.1)
+        cutoff = max(np.median(kbits) * SPIKE_MEDIAN_FACTOR, kbits.mean() * SPIKE_MEAN_FACTOR, SPIKE_FLOOR_KBITS)
+        cutoffs = np.full(len(kbits), cutoff)
+    spikes_mask = kbits > cutoffs
+    rows = np.flatnonzero(spikes_mask)
+    spikes = pd.DataFrame({"row": rows, "timestamp": df["timestamp"].values[rows],
+                           "kbits": kbits[rows], "cutoff": cutoffs[rows]})
+    kbits[spikes_mask] = 0.0
+    df["kbits"] = kbits
     
     # Step 8: Convert to Gbps
     # Gbps = (kbits * 1000) / symbol_duration / 1e9
     df["gbps"] = (df["kbits"] * 1000) / SYMBOL_DURATION / 1e9
     
-    return df, spike_count
+    return df, spikes
 
-def process_packets(file_path):
+@jit(nopython=True, cache=True)
+def _sift(heaps, h, sizes, heap_of, pos_of, ring, i):
     """
-    Loads, sorts, and computes packet loss.
+    Restores heap h around position i. Heap 0 is a max-heap (lower half of the
+    window), heap 1 a min-heap (upper half); entries are ring slots.
+    """
+    sign = -1.0 if h == 0 else 1.0
+    heap = heaps[h]
+    # Up
+    while i > 0:
+        parent = (i - 1) // 2
+        if sign * ring[heap[i]] >= sign * ring[heap[parent]]: break
+        heap[i], heap[parent] = heap[parent], heap[i]
+        pos_of[heap[i]] = i
+        pos_of[heap[parent]] = parent
+        i = parent
+    # Down
+    n = sizes[h]
+    while True:
+        best = i
+        left, right = 2 * i + 1, 2 * i + 2
+        if left < n and sign * ring[heap[left]] < sign * ring[heap[best]]: best = left
+        if right < n and sign * ring[heap[right]] < sign * ring[heap[best]]: best = right
+        if best == i: break
+        heap[i], heap[best] = heap[best], heap[i]
+        pos_of[heap[i]] = i
+        pos_of[heap[best]] = best
+        i = best
+
+@jit(nopython=True, cache=True)
+def _push(heaps, h, sizes, heap_of, pos_of, ring, slot):
+    i = sizes[h]
+    heaps[h, i] = slot
+    heap_of[slot] = h
+    pos_of[slot] = i
+    sizes[h] += 1
+    _sift(heaps, h, sizes, heap_of, pos_of, ring, i)
+
+@jit(nopython=True, cache=True)
+def _pop(heaps, h, sizes, heap_of, pos_of, ring):
+    top = heaps[h, 0]
+    sizes[h] -= 1
+    if sizes[h] > 0:
+        heaps[h, 0] = heaps[h, sizes[h]]
+        pos_of[heaps[h, 0]] = 0
+        _sift(heaps, h, sizes, heap_of, pos_of, ring, 0)
+    return top
+
+@jit(nopython=True, cache=True)
+def rolling_despike_jit(values, ring, heaps, sizes, heap_of, pos_of, state,
+                        median_factor, floor, min_periods, warmup_cutoff):
+    """
+    Spike cutoff of each sample from the window of active samples before it:
+    max(median * median_factor, floor), with the median kept by two indexed
+    heaps (O(log w) per sample). Idle (0) samples and spikes never enter the
+    window, so neither can drag the cutoff of later samples. All state lives
+    in the arrays passed in (state = [samples in window, next ring slot]), so
+    consecutive chunks of a stream give the same result as one call.
+    Returns the cutoffs.
+    """
+    w = ring.shape[0]
+    cutoffs = np.empty(values.shape[0])
+    for k in range(values.shape[0]):
+        x = values[k]
+        count = state[0]
+        if count < min_periods:
+            cutoff = warmup_cutoff
+        else:
+            if sizes[0] > sizes[1]:
+                median = ring[heaps[0, 0]]
+            else:
+                median = 0.5 * (ring[heaps[0, 0]] + ring[heaps[1, 0]])
+            cutoff = max(median * median_factor, floor)
+        cutoffs[k] = cutoff
+        if x <= 0.0 or x > cutoff: continue
+
+        clean = x
+        slot = state[1]
+        if count < w:
+            # Filling up: insert, then keep len(lower) - len(upper) in {0, 1}
+            ring[slot] = clean
+            if sizes[0] == 0 or clean <= ring[heaps[0, 0]]:
+                _push(heaps, 0, sizes, heap_of, pos_of, ring, slot)
+            else:
+                _push(heaps, 1, sizes, heap_of, pos_of, ring, slot)
+            if sizes[0] > sizes[1] + 1:
+                _push(heaps, 1, sizes, heap_of, pos_of, ring, _pop(heaps, 0, sizes, heap_of, pos_of, ring))
+            elif sizes[1] > sizes[0]:
+                _push(heaps, 0, sizes, heap_of, pos_of, ring, _pop(heaps, 1, sizes, heap_of, pos_of, ring))
+            state[0] = count + 1
+        else:
+            # Full: the oldest sample's slot takes the new value in place
+            ring[slot] = clean
+            _sift(heaps, heap_of[slot], sizes, heap_of, pos_of, ring, pos_of[slot])
+            if sizes[1] > 0 and ring[heaps[0, 0]] > ring[heaps[1, 0]]:
+                lo, hi = heaps[0, 0], heaps[1, 0]
+                heaps[0, 0], heaps[1, 0] = hi, lo
+                heap_of[hi], heap_of[lo] = 0, 1
+                _sift(heaps, 0, sizes, heap_of, pos_of, ring, 0)
+                _sift(heaps, 1, sizes, heap_of, pos_of, ring, 0)
+        state[1] = (slot + 1) % w
+    return cutoffs
+
+class RollingDespiker:
+    """Streaming state for rolling_despike_jit: feed() consecutive chunks of one series."""
+
+    def __init__(self, window=DESPIKE_WINDOW, min_periods=DESPIKE_MIN_PERIODS):
+        window = max(1, int(window))
+        self.min_periods = min(min_periods, window)
+        self.ring = np.zeros(window)
+        self.heaps = np.zeros((2, window), dtype=np.int64)
+        self.sizes = np.zeros(2, dtype=np.int64)
+        self.heap_of = np.zeros(window, dtype=np.int64)
+        self.pos_of = np.zeros(window, dtype=np.int64)
+        self.state = np.zeros(2, dtype=np.int64)
+
+    def feed(self, values):
+        """Cutoff for each sample of the chunk; samples above theirs are spikes."""
+        return rolling_despike_jit(np.ascontiguousarray(values, dtype=np.float64), self.ring, self.heaps,
+                                   self.sizes, self.heap_of, self.pos_of, self.state,
+                                   SPIKE_MEDIAN_FACTOR, SPIKE_FLOOR_KBITS, self.min_periods, DESPIKE_WARMUP_KBITS)
+
+def process_packets(file_paths):
+    """
+    Loads, sorts, and computes packet loss (see read_logs).
     Returns DataFrame with ['timestamp', 'loss']
     """
     try:
         # Step 4: Load raw (skipping header)
-        df = pd.read_csv(file_path, sep=r'\s+', header=None, comment='<', 
-                         names=["timestamp", "tx", "rx", "tooLate"])
+        df = read_logs(file_paths, sep=r'\s+', header=None, comment='<',
+                       names=["timestamp", "tx", "rx", "tooLate"])
     except Exception as e:
-        print(f"Error reading packets {file_path}: {e}")
+        print(f"Error reading packets {', '.join(map(str, file_paths))}: {e}")
         return None
 
     # Step 6: Sort
@@ -104,6 +376,33 @@ def process_packets(file_path):
     
     return df
 
+def load_cell(files, **options):
+    """Reads and cleans both logs of one cell: ((df_thr, spikes), df_pkt)."""
+    return process_throughput(files['thr'], **options), process_packets(files['pkt'])
+
+def read_ahead(cells, depth, **options):
+    """
+    Yields (cell_id, load_cell(files)) in order while a background thread is
+    already reading the next `depth` cells, so slow storage and decompression
+    overlap with alignment and CSV writing. `options` go to process_throughput.
+    """
+    if depth <= 0:
+        for cell_id, files in cells.items():
+            yield cell_id, load_cell(files, **options)
+        return
+
+    items = iter(cells.items())
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        for cell_id, files in items:
+            pending.append((cell_id, pool.submit(load_cell, files, **options)))
+            if len(pending) > depth:
+                done_id, future = pending.popleft()
+                yield done_id, future.result()
+        while pending:
+            done_id, future = pending.popleft()
+            yield done_id, future.result()
+
 def align_timelines(df_thr, df_pkt):
     """
     Step 10: Find best shift to align packet loss to throughput.
@@ -119,7 +418,7 @@ def align_timelines(df_thr, df_pkt):
     best_corr = -1
     
     # Grid search for shift: -1.5 to 1.5
-    shifts = np.linspace(-1.5, 1.5, 61) # 61 steps implies 0.05s resolution
+    shifts = SHIFT_GRID # 61 steps implies 0.05s resolution
     
     for s in shifts:
         # Shift packet timestamps: t_pkt_shifted = t_pkt + s
@@ -158,6 +457,96 @@ def align_timelines(df_thr, df_pkt):
     
     return aligned_df, best_shift, best_corr
 
+def shift_correlations(thr_ts, thr_vals, pkt_ts, pkt_loss, shifts):
+    """
+    Pearson correlation between throughput and packet loss probed at
+    thr_ts + s, for every shift s at once: each block of shifts is one
+    np.interp call and one matrix-vector product.
+    """
+    x = thr_vals - thr_vals.mean()
+    x_norm = np.sqrt(x @ x)
+    corrs = np.zeros(len(shifts))
+    if len(thr_ts) == 0 or x_norm == 0:
+        return corrs
+    block = max(1, SHIFT_BLOCK_ELEMENTS // len(thr_ts))
+    for i in range(0, len(shifts), block):
+        s = shifts[i:i + block]
+        loss = np.interp((thr_ts[None, :] + s[:, None]).ravel(), pkt_ts, pkt_loss, left=0, right=0)
+        loss = loss.reshape(len(s), len(thr_ts))
+        loss -= loss.mean(axis=1, keepdims=True)
+        den = np.sqrt(np.einsum("ij,ij->i", loss, loss)) * x_norm
+        corrs[i:i + block] = np.divide(loss @ x, den, out=np.zeros(len(s)), where=den > 0)
+    return corrs
+
+def align_timelines_drift(df_thr, df_pkt, window_sec=DRIFT_WINDOW_SEC):
+    """
+    Alignment for captures whose RU/DU clocks drift apart. The best shift is
+    searched on windows of window_sec (overlapping by half): first on
+    SHIFT_GRID, then in tenths of the step around the winner down to
+    DRIFT_FINE_STEP_SEC. Shifts of
+    windows with enough loss signal are median-filtered over neighbouring
+    windows, and linearly interpolated between window centres. Packet loss
+    is then resampled onto the throughput timeline in one np.interp pass.
+    Cost is linear in capture length. Falls back to align_timelines if no
+    window has a usable signal.
+    Returns the aligned DataFrame, the per-window fit and the final correlation.
+    """
+    thr_ts = df_thr["timestamp"].values
+    thr_vals = df_thr["gbps"].values
+    pkt_ts = df_pkt["timestamp"].values
+    pkt_loss = df_pkt["loss"].values.astype(np.float64)
+    if len(thr_ts) == 0:
+        aligned_df, shift, corr = align_timelines(df_thr, df_pkt)
+        return aligned_df, pd.DataFrame(), corr
+
+    # Short captures still get a few windows
+    span = thr_ts[-1] - thr_ts[0]
+    window_sec = min(window_sec, max(span / 2, DRIFT_FINE_STEP_SEC))
+    hop = window_sec / 2
+    starts = thr_ts[0] + hop * np.arange(max(1, int(np.ceil((span - window_sec) / hop)) + 1))
+
+    windows = []
+    for start in starts:
+        lo, hi = np.searchsorted(thr_ts, [start, start + window_sec])
+        if hi - lo < 2: continue
+        ts, vals = thr_ts[lo:hi], thr_vals[lo:hi]
+        # Only the packet rows any probed shift can reach
+        p_lo, p_hi = np.searchsorted(pkt_ts, [ts[0] + SHIFT_GRID[0] - 1.0, ts[-1] + SHIFT_GRID[-1] + 1.0])
+        p_ts, p_loss = pkt_ts[p_lo:p_hi], pkt_loss[p_lo:p_hi]
+        corrs = shift_correlations(ts, vals, p_ts, p_loss, SHIFT_GRID)
+        best_shift, best_corr = SHIFT_GRID[np.argmax(corrs)], corrs.max()
+        # Refine by tenths around the best shift until the step is DRIFT_FINE_STEP_SEC
+        step = SHIFT_GRID[1] - SHIFT_GRID[0]
+        while step > DRIFT_FINE_STEP_SEC * 1.001:
+            fine = max(step / 10, DRIFT_FINE_STEP_SEC)
+            candidates = best_shift + fine * np.arange(-round(step / fine), round(step / fine) + 1)
+            corrs = shift_correlations(ts, vals, p_ts, p_loss, candidates)
+            if corrs.max() > best_corr:
+                best_shift, best_corr = candidates[np.argmax(corrs)], corrs.max()
+            step = fine
+        windows.append((ts[0] + (ts[-1] - ts[0]) / 2, best_shift, best_corr))
+
+    warp = pd.DataFrame(windows, columns=["window_center", "shift", "correlation"])
+    warp["used"] = warp["correlation"] >= DRIFT_MIN_CORR
+    used = warp[warp["used"]]
+    if used.empty:
+        aligned_df, shift, corr = align_timelines(df_thr, df_pkt)
+        return aligned_df, warp, corr
+
+    # A median of 3 neighbours rejects single windows that locked onto the wrong burst
+    knots = used["shift"].rolling(3, center=True).median().fillna(used["shift"]).values
+    warp.loc[warp["used"], "fitted_shift"] = knots
+    shift_at = np.interp(thr_ts, used["window_center"].values, knots)
+
+    final_aligned_loss = np.interp(thr_ts + shift_at, pkt_ts, pkt_loss, left=0, right=0)
+    corr = np.corrcoef(thr_vals, final_aligned_loss)[0, 1] if final_aligned_loss.std() > 0 else 0.0
+    aligned_df = pd.DataFrame({
+        "timestamp": thr_ts,
+        "gbps": thr_vals,
+        "packet_loss": final_aligned_loss
+    })
+    return aligned_df, warp, 0.0 if np.isnan(corr) else corr
+
 def plot_alignment(aligned_df, cell_id, output_dir):
     """
     Plots aligned throughput and packet loss.
@@ -197,23 +586,36 @@ def main():
     output_dir.mkdir(exist_ok=True)
     
     processed_count = 0
+    renderer = RenderQueue(args.plots)
+    spike_log = []
+    drift_log = []
     
-    for cell_id, files in cells.items():
+    for cell_id, ((df_thr, spikes), df_pkt) in read_ahead(cells, args.prefetch, despike=args.despike,
+                                                          despike_window=args.despike_window):
         print(f"Processing Cell {cell_id}...")
         
         # Process Throughput
-        df_thr, spikes = process_throughput(files['thr'])
         if df_thr is None: continue
-        print(f"  -> Throughput loaded: {len(df_thr)} rows, {spikes} spikes removed.")
+        print(f"  -> Throughput loaded: {len(df_thr)} rows, {len(spikes)} spikes removed ({args.despike} cutoff).")
+        spike_log.append(spikes.assign(cell=cell_id))
         
         # Process Packets
-        df_pkt = process_packets(files['pkt'])
         if df_pkt is None: continue
         print(f"  -> Packets loaded: {len(df_pkt)} rows.")
         
         # Align
-        aligned_df, shift, corr = align_timelines(df_thr, df_pkt)
-        print(f"  -> Best Shift: {shift:.2f}s, Correlation: {corr:.4f}")
+        if args.align == "drift":
+            aligned_df, warp, corr = align_timelines_drift(df_thr, df_pkt, args.drift_window)
+            fitted = warp["fitted_shift"].dropna() if "fitted_shift" in warp else warp.iloc[:0]
+            if len(fitted):
+                print(f"  -> Shift: {fitted.iloc[0]:.4f}s -> {fitted.iloc[-1]:.4f}s "
+                      f"({len(fitted)}/{len(warp)} windows fitted), Correlation: {corr:.4f}")
+            else:
+                print(f"  -> No window with a usable loss signal; constant shift used. Correlation: {corr:.4f}")
+            drift_log.append(warp.assign(cell=cell_id))
+        else:
+            aligned_df, shift, corr = align_timelines(df_thr, df_pkt)
+            print(f"  -> Best Shift: {shift:.2f}s, Correlation: {corr:.4f}")
         
         # Save
         csv_path = output_dir / f"cell_{cell_id}_aligned.csv"
@@ -222,10 +624,20 @@ def main():
         processed_count += 1
         
         # Plot sample (randomly ~10% chance or if count is low)
+        # Queued: the CSV above is already usable while the figure renders
         if processed_count <= 3: 
-            plot_alignment(aligned_df, cell_id, output_dir)
+            renderer.submit(plot_alignment, aligned_df, cell_id, output_dir)
             
+    # Every removed sample, for auditing the despiking
+    spike_columns = ["cell", "row", "timestamp", "kbits", "cutoff"]
+    spikes_df = pd.concat(spike_log)[spike_columns] if spike_log else pd.DataFrame(columns=spike_columns)
+    spikes_df.to_csv(output_dir / SPIKES_CSV, index=False)
+    print(f"\nRemoved spikes listed in '{output_dir / SPIKES_CSV}'.")
+    if drift_log:
+        pd.concat(drift_log).to_csv(output_dir / DRIFT_CSV, index=False)
+        print(f"Per-window shifts of the drift fit saved to '{output_dir / DRIFT_CSV}'.")
     print(f"\nPhase 1 Complete. Processed {processed_count} cells.")
+    renderer.close()
 
 if __name__ == "__main__":
     main()
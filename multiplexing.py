@@ -0,0 +1,105 @@
+import argparse
+import sys
+import numpy as np
+import pandas as pd
+from itertools import combinations
+from pathlib import Path
+from dashboard.backend.kernels import MAX_DROP_RATE, group_capacities_jit
+from dashboard.backend.logic import NetworkLogic
+
+# Constants
+BUFFER_TIME_SEC = 143e-6 # 143 microseconds (4 symbols), as in topology.py
+SEARCH_ITERATIONS = 15   # Same bisection depth as NetworkLogic.find_optimal_capacity
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Statistical-multiplexing gain of sharing a buffered link")
+    parser.add_argument("--data-dir", type=str, default="output", help="Directory with the Phase 2 outputs")
+    parser.add_argument("--buffer-us", type=float, default=BUFFER_TIME_SEC * 1e6, help="Switch buffer in µs")
+    parser.add_argument("--group-size", type=int, default=2, help="Cells per group (2 = pairwise matrix)")
+    parser.add_argument("--target-gbps", type=float, default=None,
+                        help="Link rate; groups whose summed peaks fit under it are pruned without simulation")
+    return parser.parse_args()
+
+def multiplexing_gains(thr_df, buffer_time_sec, group_size=2, target_gbps=None):
+    """
+    Buffered capacity each group of cells needs on a shared link, compared with
+    separate links. Runs one parallel kernel over all singles and one over all
+    groups on the slot-grid throughput matrix. Groups whose summed individual
+    peaks are already <= target_gbps fit on one link even without a buffer, so
+    they are pruned (Pruned=True, shared capacity not simulated).
+    """
+    cells = list(thr_df.columns)
+    cell_series = np.ascontiguousarray(thr_df.values.T, dtype=np.float64)
+
+    singles = np.arange(len(cells), dtype=np.int64).reshape(-1, 1)
+    single_caps, single_peaks = group_capacities_jit(
+        cell_series, singles, buffer_time_sec, SEARCH_ITERATIONS, MAX_DROP_RATE)
+
+    groups = np.array(list(combinations(range(len(cells)), group_size)), dtype=np.int64).reshape(-1, group_size)
+    peak_sums = single_peaks[groups].sum(axis=1)
+    separate = single_caps[groups].sum(axis=1)
+
+    pruned = np.zeros(len(groups), dtype=bool)
+    if target_gbps is not None:
+        pruned = peak_sums <= target_gbps
+
+    shared = np.full(len(groups), np.nan)
+    combined_peaks = np.full(len(groups), np.nan)
+    active = np.flatnonzero(~pruned)
+    if len(active):
+        caps, peaks = group_capacities_jit(
+            cell_series, groups[active], buffer_time_sec, SEARCH_ITERATIONS, MAX_DROP_RATE)
+        shared[active] = caps
+        combined_peaks[active] = peaks
+
+    gain = separate - shared
+    with np.errstate(invalid="ignore", divide="ignore"):
+        gain_pct = np.where(separate > 0, gain / separate * 100, 0.0)
+
+    return pd.DataFrame({
+        "Cells": [" ".join(cells[i] for i in g) for g in groups],
+        "Peak_Sum_Gbps": peak_sums.round(2),
+        "Peak_Combined_Gbps": combined_peaks.round(2),
+        "Capacity_Separate_Gbps": separate.round(2),
+        "Capacity_Shared_Gbps": shared.round(2),
+        "Gain_Gbps": gain.round(2),
+        "Gain_Pct": np.round(gain_pct, 1),
+        "Pruned": pruned,
+    })
+
+def gain_matrix(report, cells):
+    """Cell x cell matrix of Gain_Gbps from a pairwise report."""
+    matrix = pd.DataFrame(np.nan, index=cells, columns=cells)
+    for pair, gain in zip(report["Cells"], report["Gain_Gbps"]):
+        a, b = pair.split()
+        matrix.loc[a, b] = matrix.loc[b, a] = gain
+    return matrix
+
+def main():
+    args = get_args()
+    logic = NetworkLogic(args.data_dir, allow_deployment=False)
+    if logic.thr_df is None or logic.thr_df.empty:
+        print("No aligned data found. Run main.py first.")
+        sys.exit(1)
+
+    n = len(logic.thr_df.columns)
+    print(f"Computing {args.group_size}-cell multiplexing gains for {n} cells "
+          f"(buffer {args.buffer_us:.0f} µs)...")
+    report = multiplexing_gains(logic.thr_df, args.buffer_us / 1e6, args.group_size, args.target_gbps)
+
+    out_dir = Path(args.data_dir)
+    report.to_csv(out_dir / "multiplexing_gains.csv", index=False)
+    print(f"  {len(report)} groups, {int(report['Pruned'].sum())} pruned below {args.target_gbps} Gbps.")
+    print(f"Gains saved to '{out_dir / 'multiplexing_gains.csv'}'.")
+
+    if args.group_size == 2:
+        gain_matrix(report, list(logic.thr_df.columns)).to_csv(out_dir / "multiplexing_gain_matrix.csv")
+        print(f"Pairwise matrix saved to '{out_dir / 'multiplexing_gain_matrix.csv'}'.")
+
+    best = report.dropna(subset=["Gain_Gbps"]).nlargest(5, "Gain_Gbps")
+    for _, row in best.iterrows():
+        print(f"  Cells {row['Cells']}: {row['Capacity_Separate_Gbps']} -> "
+              f"{row['Capacity_Shared_Gbps']} Gbps (saves {row['Gain_Pct']}%)")
+
+if __name__ == "__main__":
+    main()
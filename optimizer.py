@@ -0,0 +1,158 @@
+import argparse
+import sys
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from dashboard.backend.kernels import MAX_DROP_RATE, evaluate_moves_jit, min_capacity_jit
+from dashboard.backend.logic import NetworkLogic
+
+# Constants
+BUFFER_TIME_SEC = 143e-6 # 143 microseconds (4 symbols), as in topology.py
+SEARCH_ITERATIONS = 15   # Same bisection depth as NetworkLogic.find_optimal_capacity
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Capacity-minimizing cell-to-link assignment")
+    parser.add_argument("--data-dir", type=str, default="output", help="Directory with the Phase 2 outputs")
+    parser.add_argument("--buffer-us", type=float, default=BUFFER_TIME_SEC * 1e6, help="Switch buffer in µs")
+    parser.add_argument("--max-ports", type=int, default=None, help="Maximum cells per link")
+    parser.add_argument("--max-capacity-gbps", type=float, default=None, help="Maximum required capacity per link")
+    parser.add_argument("--iterations", type=int, default=200, help="Maximum search steps")
+    parser.add_argument("--temperature", type=float, default=0.0,
+                        help="Initial annealing temperature in Gbps (0 = pure steepest descent)")
+    parser.add_argument("--cooling", type=float, default=0.95, help="Temperature decay per step")
+    parser.add_argument("--threads", type=int, default=None, help="Threads for parallel move evaluation")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+def link_capacity(series, buffer_time_sec):
+    peak = series.max() if len(series) else 0.0
+    if peak <= 0: return 0.0
+    return min_capacity_jit(series, buffer_time_sec, peak * 1.5, SEARCH_ITERATIONS, MAX_DROP_RATE)
+
+def candidate_moves(assignment, link_ids, counts, max_ports):
+    """Every single-cell move that respects the port limit of the destination."""
+    cells, src, dst = [], [], []
+    for c, l in enumerate(assignment):
+        for m in range(len(link_ids)):
+            if m == l: continue
+            if max_ports is not None and counts[m] >= max_ports: continue
+            cells.append(c)
+            src.append(l)
+            dst.append(m)
+    return np.array(cells, dtype=np.int64), np.array(src, dtype=np.int64), np.array(dst, dtype=np.int64)
+
+def optimize_assignment(cell_series, assignment, n_links, buffer_time_sec,
+                        max_ports=None, max_capacity=None, iterations=200,
+                        temperature=0.0, cooling=0.95, seed=0):
+    """
+    Local search over cell-to-link partitions minimizing the summed buffered
+    capacity. Each step scores every single-cell move in parallel on
+    incrementally updated link aggregates, then takes the best improving one;
+    with a temperature > 0, a stalled search accepts a random worse move with
+    Metropolis probability (simulated annealing). Returns the best assignment
+    seen and the capacity of each of its links.
+    """
+    rng = np.random.default_rng(seed)
+    assignment = np.array(assignment, dtype=np.int64)
+    link_ids = np.arange(n_links)
+
+    aggregates = np.zeros((n_links, cell_series.shape[1]))
+    for c, l in enumerate(assignment):
+        aggregates[l] += cell_series[c]
+    caps = np.array([link_capacity(aggregates[l], buffer_time_sec) for l in link_ids])
+    counts = np.bincount(assignment, minlength=n_links)
+
+    # Moves inside the bisection's own resolution are noise, not gains
+    tolerance = 2 * 1.5 * aggregates.max(axis=1).max() / 2**SEARCH_ITERATIONS if aggregates.size else 0.0
+
+    best_assignment, best_caps = assignment.copy(), caps.copy()
+    for step in range(iterations):
+        move_cells, move_src, move_dst = candidate_moves(assignment, link_ids, counts, max_ports)
+        if len(move_cells) == 0: break
+
+        cap_src, cap_dst, _, _ = evaluate_moves_jit(
+            aggregates, cell_series, move_cells, move_src, move_dst,
+            buffer_time_sec, SEARCH_ITERATIONS, MAX_DROP_RATE)
+        deltas = cap_src + cap_dst - caps[move_src] - caps[move_dst]
+
+        feasible = np.ones(len(deltas), dtype=bool)
+        if max_capacity is not None:
+            feasible &= (cap_dst <= max_capacity) & (cap_src <= max_capacity)
+        if not feasible.any(): break
+        deltas = np.where(feasible, deltas, np.inf)
+
+        k = int(np.argmin(deltas))
+        if deltas[k] >= -tolerance:
+            if temperature <= 0: break
+            # Annealing: try a random feasible move instead of stopping at the local optimum
+            k = int(rng.choice(np.flatnonzero(feasible)))
+            accept = rng.random() < np.exp(-max(deltas[k], 0.0) / temperature)
+            temperature *= cooling
+            if not accept: continue
+
+        c, a, b = move_cells[k], move_src[k], move_dst[k]
+        aggregates[a] -= cell_series[c]
+        np.maximum(aggregates[a], 0, out=aggregates[a])
+        aggregates[b] += cell_series[c]
+        caps[a], caps[b] = cap_src[k], cap_dst[k]
+        counts[a] -= 1
+        counts[b] += 1
+        assignment[c] = b
+
+        if caps.sum() < best_caps.sum() - tolerance:
+            best_assignment, best_caps = assignment.copy(), caps.copy()
+        print(f"  step {step + 1}: moved 1 cell, total {caps.sum():.2f} Gbps")
+
+    return best_assignment, best_caps
+
+def main():
+    args = get_args()
+    if args.threads:
+        import numba
+        numba.set_num_threads(args.threads)
+
+    logic = NetworkLogic(args.data_dir, allow_deployment=False)
+    if logic.thr_df is None or not logic.links:
+        print("No topology or cell data found. Run main.py and topology.py first.")
+        sys.exit(1)
+
+    link_ids = sorted(logic.links.keys())
+    cells = [c for l in link_ids for c in logic.links[l] if c in logic.thr_df.columns]
+    cell_series = np.ascontiguousarray(logic.thr_df[cells].values.T, dtype=np.float64)
+    start = np.array([link_ids.index(l) for l in link_ids for c in logic.links[l] if c in logic.thr_df.columns])
+
+    counts = np.bincount(start, minlength=len(link_ids))
+    if args.max_ports is not None and counts.max() > args.max_ports:
+        print(f"Warning: current topology already exceeds {args.max_ports} ports on some links.")
+
+    buffer_time_sec = args.buffer_us / 1e6
+    print(f"Optimizing assignment of {len(cells)} cells over {len(link_ids)} links "
+          f"(buffer {args.buffer_us:.0f} µs)...")
+    before = sum(link_capacity(np.ascontiguousarray(cell_series[start == i].sum(axis=0)), buffer_time_sec)
+                 for i in range(len(link_ids)))
+    best, caps = optimize_assignment(
+        cell_series, start, len(link_ids), buffer_time_sec,
+        max_ports=args.max_ports, max_capacity=args.max_capacity_gbps,
+        iterations=args.iterations, temperature=args.temperature,
+        cooling=args.cooling, seed=args.seed)
+    after = float(caps.sum())
+
+    # Net re-homing plan: where each cell starts vs. where the best assignment puts it
+    plan = [{
+        "Cell": cells[c],
+        "From_Link": link_ids[start[c]],
+        "To_Link": link_ids[best[c]],
+    } for c in range(len(cells)) if best[c] != start[c]]
+
+    out_path = Path(args.data_dir) / "rehoming_plan.csv"
+    pd.DataFrame(plan, columns=["Cell", "From_Link", "To_Link"]).to_csv(out_path, index=False)
+
+    print(f"\nRequired capacity: {before:.2f} Gbps -> {after:.2f} Gbps "
+          f"(saves {before - after:.2f} Gbps, {len(plan)} cell moves)")
+    for i, l in enumerate(link_ids):
+        members = [cells[c] for c in range(len(cells)) if best[c] == i]
+        print(f"  Link {l}: {caps[i]:.2f} Gbps, cells {' '.join(members)}")
+    print(f"Re-homing plan saved to '{out_path}'.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+Single entry point for the whole pipeline.
+
+Stages run as subprocesses in dependency order:
+
+    align (main.py) -> topology (topology.py) -> visualization (visualization.py)
+                                              -> deployment (precompute_deployment_data.py)
+
+Every stage is keyed by a hash of its script and helper modules, its
+arguments, and the contents of the files it reads. Its outputs are stored in
+a content-addressed cache under output/.pipeline/. On a key that was seen
+before, the outputs are restored instead of recomputed. Only stages whose
+inputs or parameters changed rerun, and a rerun that reproduces identical
+outputs does not invalidate anything downstream. Stages whose dependencies
+are done run concurrently.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from log_names import LOG_NAME_RE
+
+ROOT = Path(__file__).resolve().parent
+OUTPUT_DIR = ROOT / "output"
+CACHE_DIR = OUTPUT_DIR / ".pipeline"
+
+CELL_CSVS = "cell_*_aligned.csv"
+ESTIMATES_CSV = "link_capacity_estimates.csv"
+
+# The simulation kernels, and logic.py with every backend module it imports: a change
+# to any of them changes the Phase 2 results
+KERNEL_CODE = ["dashboard/backend/__init__.py", "dashboard/backend/kernels.py"]
+BACKEND_CODE = KERNEL_CODE + ["dashboard/backend/logic.py", "dashboard/backend/metrics.py",
+                              "dashboard/backend/profiling.py", "dashboard/backend/shared_dataset.py",
+                              "dashboard/backend/deployment_snapshot.py"]
+
+
+class Stage:
+    def __init__(self, name, script, deps=(), inputs=(), outputs=(), code=(), args=()):
+        self.name = name
+        self.script = script
+        self.deps = list(deps)
+        self.inputs = list(inputs)    # Glob patterns under output/ read by the stage
+        self.outputs = list(outputs)  # Glob patterns under output/ written by the stage
+        self.code = [script] + list(code)
+        self.args = list(args)
+
+    def input_files(self):
+        return sorted({p for pattern in self.inputs for p in OUTPUT_DIR.glob(pattern) if p.is_file()})
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Run the pipeline as a cached DAG of stages")
+    parser.add_argument("log_dir", nargs="?", default=None,
+                        help="Folder with the .dat logs; without it, the aligned CSVs already in output/ are the source")
+    parser.add_argument("--only", type=str, default=None,
+                        help="Comma separated stages to bring up to date (plus whatever they depend on)")
+    parser.add_argument("--force", type=str, default=None,
+                        help="Comma separated stages to rerun even if cached ('all' for every stage)")
+    parser.add_argument("--jobs", type=int, default=2, help="Stages run concurrently")
+    parser.add_argument("--dry-run", action="store_true", help="Print what would run without running it")
+    for stage in ("align", "topology", "visualization", "deployment"):
+        parser.add_argument(f"--{stage}-args", type=str, default="",
+                            help=f"Extra arguments for the {stage} stage, e.g. --topology-args \"--max-lag 3\"")
+    return parser.parse_args()
+
+
+def build_stages(args):
+    stages = {}
+    if args.log_dir:
+        stages["align"] = Stage(
+            "align", "main.py", code=["render_queue.py", "log_names.py"],
+            outputs=[CELL_CSVS, "cell_*_aligned.png", "despike_spikes.csv", "alignment_drift.csv"],
+            args=[args.log_dir] + shlex.split(args.align_args))
+    stages["topology"] = Stage(
+        "topology", "topology.py", deps=["align"] if args.log_dir else [],
+        code=["render_queue.py"] + KERNEL_CODE,
+        inputs=[CELL_CSVS],
+        outputs=[ESTIMATES_CSV, "correlation_*.csv", "lsh_report.csv", "link_capacity_windows.csv",
+                 "link_capacity_preview.csv",
+                 "topology_graph.png", "link_*_loss_pattern.png", "link_*_traffic.png"],
+        args=shlex.split(args.topology_args))
+    stages["visualization"] = Stage(
+        "visualization", "visualization.py", deps=["topology"],
+        inputs=[CELL_CSVS, ESTIMATES_CSV],
+        outputs=["link_*_utilization.png", "link_*_loss_heatmap.png"],
+        args=shlex.split(args.visualization_args))
+    stages["deployment"] = Stage(
+        "deployment", "precompute_deployment_data.py", deps=["topology"],
+        code=BACKEND_CODE,
+        inputs=[CELL_CSVS, ESTIMATES_CSV, "hierarchy.json"],
+        outputs=["deployment_snapshot.bin"],
+        args=shlex.split(args.deployment_args))
+    return stages
+
+
+class ContentStore:
+    """Content-addressed objects plus a (path, size, mtime) -> digest memo so unchanged files are not re-read."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.memo_path = self.root / "hashes.json"
+        self.memo = {}
+        if self.memo_path.exists():
+            with open(self.memo_path, "r") as f:
+                self.memo = json.load(f)
+
+    def digest(self, path):
+        st = path.stat()
+        key = str(path)
+        cached = self.memo.get(key)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        self.memo[key] = [st.st_size, st.st_mtime_ns, h.hexdigest()]
+        return self.memo[key][2]
+
+    def object_path(self, digest):
+        return self.root / "objects" / digest[:2] / digest[2:]
+
+    def put(self, path):
+        digest = self.digest(path)
+        target = self.object_path(digest)
+        if not target.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_suffix(".tmp")
+            shutil.copyfile(path, tmp)
+            os.replace(tmp, target)
+        return digest
+
+    def matches(self, digest, path):
+        return path.exists() and self.digest(path) == digest
+
+    def restore(self, digest, path):
+        if self.matches(digest, path):
+            return False
+        tmp = path.with_name(path.name + ".restore")
+        shutil.copyfile(self.object_path(digest), tmp)
+        os.replace(tmp, path)
+        return True
+
+    def save_memo(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.memo_path, "w") as f:
+            json.dump(self.memo, f)
+
+
+def log_files(log_dir):
+    """Every raw log main.py would consider, at any depth."""
+    files = []
+    for dirpath, _, names in os.walk(log_dir):
+        files.extend(Path(dirpath) / n for n in names if LOG_NAME_RE.match(n))
+    return sorted(files)
+
+
+def stage_key(stage, store, log_dir=None):
+    h = hashlib.sha256()
+    h.update(stage.name.encode())
+    h.update(json.dumps(stage.args).encode())
+    for rel in stage.code:
+        h.update(f"code:{rel}:{store.digest(ROOT / rel)}".encode())
+    inputs = [(p.relative_to(OUTPUT_DIR), p) for p in stage.input_files()]
+    if stage.name == "align":
+        inputs = [(p.relative_to(log_dir), p) for p in log_files(log_dir)]
+    for rel, p in inputs:
+        h.update(f"in:{rel}:{store.digest(p)}".encode())
+    return h.hexdigest()
+
+
+def manifest_path(stage, key):
+    return CACHE_DIR / "stages" / stage.name / f"{key}.json"
+
+
+def run_stage(stage, log_path):
+    """Runs the stage's script; returns (returncode, seconds, start time in ns)."""
+    start_ns = time.time_ns()
+    t0 = time.perf_counter()
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_path, "w") as log:
+        proc = subprocess.run([sys.executable, stage.script] + stage.args,
+                              cwd=ROOT, stdout=log, stderr=subprocess.STDOUT)
+    return proc.returncode, time.perf_counter() - t0, start_ns
+
+
+def collect_outputs(stage, store, since_ns):
+    """Caches the files the stage wrote during this run; returns {relative path: digest}."""
+    produced = {}
+    for pattern in stage.outputs:
+        for p in OUTPUT_DIR.glob(pattern):
+            if p.is_file() and p.stat().st_mtime_ns >= since_ns:
+                produced[str(p.relative_to(OUTPUT_DIR))] = store.put(p)
+    return produced
+
+
+def select(stages, only):
+    """The requested stages plus everything upstream of them."""
+    if not only:
+        return list(stages)
+    wanted, stack = set(), [s.strip() for s in only.split(",")]
+    while stack:
+        name = stack.pop()
+        if name not in stages:
+            print(f"Unknown stage '{name}'. Stages: {', '.join(stages)}")
+            sys.exit(1)
+        if name not in wanted:
+            wanted.add(name)
+            stack.extend(d for d in stages[name].deps if d in stages)
+    return [name for name in stages if name in wanted]
+
+
+def main():
+    args = get_args()
+    stages = build_stages(args)
+    selected = select(stages, args.only)
+    forced = set(stages) if args.force == "all" else set((args.force or "").split(","))
+    OUTPUT_DIR.mkdir(exist_ok=True)
+    store = ContentStore(CACHE_DIR)
+
+    done, failed, running = set(), set(), {}
+    summary = []
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        while len(done) + len(failed) < len(selected):
+            for name in selected:
+                stage = stages[name]
+                if name in done or name in failed or name in (n for n, _ in running.values()): continue
+                deps = [d for d in stage.deps if d in selected]
+                if any(d in failed for d in deps):
+                    failed.add(name)
+                    summary.append((name, "skipped (upstream failed)"))
+                    continue
+                if not all(d in done for d in deps): continue
+
+                # Inputs are final once every dependency is done, so the key can be taken now
+                key = stage_key(stage, store, args.log_dir)
+                manifest = manifest_path(stage, key)
+                if manifest.exists() and name not in forced:
+                    with open(manifest, "r") as f:
+                        outputs = json.load(f)["outputs"]
+                    if args.dry_run:
+                        restored = sum(not store.matches(d, OUTPUT_DIR / rel) for rel, d in outputs.items())
+                    else:
+                        restored = sum(store.restore(d, OUTPUT_DIR / rel) for rel, d in outputs.items())
+                    done.add(name)
+                    summary.append((name, f"cached ({restored} file(s) restored)" if restored else "up to date"))
+                    continue
+                if args.dry_run:
+                    done.add(name)
+                    summary.append((name, "would run"))
+                    continue
+
+                print(f"[{name}] running {stage.script} {' '.join(stage.args)}".rstrip())
+                future = pool.submit(run_stage, stage, CACHE_DIR / "logs" / f"{name}.log")
+                running[future] = (name, key)
+
+            if not running:
+                continue
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, key = running.pop(future)
+                stage = stages[name]
+                returncode, seconds, start_ns = future.result()
+                log_path = CACHE_DIR / "logs" / f"{name}.log"
+                if returncode != 0:
+                    failed.add(name)
+                    summary.append((name, f"FAILED (exit {returncode}, see {log_path.relative_to(ROOT)})"))
+                    print(f"[{name}] failed:")
+                    with open(log_path, "r") as f:
+                        print("".join(f.readlines()[-15:]))
+                    continue
+                outputs = collect_outputs(stage, store, start_ns)
+                manifest = manifest_path(stage, key)
+                manifest.parent.mkdir(parents=True, exist_ok=True)
+                with open(manifest, "w") as f:
+                    json.dump({"args": stage.args, "outputs": outputs, "seconds": round(seconds, 2)}, f, indent=1)
+                done.add(name)
+                summary.append((name, f"ran in {seconds:.1f}s ({len(outputs)} output(s))"))
+                print(f"[{name}] done in {seconds:.1f}s")
+
+    store.save_memo()
+    print("\nPipeline summary:")
+    for name, status in summary:
+        print(f"  {name:<14} {status}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,89 @@
 
 import os
 import json
-import pandas as pd
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from dashboard.backend.logic import NetworkLogic
+from dashboard.backend.deployment_snapshot import SNAPSHOT_NAME, write_snapshot
 
-def precompute_data():
+# Buffer settings offered by the dashboard slider (0-500 µs, step 5) plus the 143 µs default
+DEFAULT_BUFFERS_US = sorted(set(range(0, 501, 5)) | {143})
+
+LEGACY_JSONS = ("traffic_summary.json", "link_stats.json", "optimization_cache.json")
+
+_worker_logic = None
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Pre-compute the deployment snapshot served by the backend")
+    parser.add_argument("--buffers", type=str, default=None,
+                        help="Comma separated buffer sizes in µs (default: 0-500 step 5, plus 143)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--from-json", action="store_true",
+                        help="Convert existing JSON caches in output/ instead of recomputing")
+    return parser.parse_args()
+
+def _init_worker(data_dir):
+    # Each worker attaches to the shared dataset snapshot instead of re-parsing CSVs
+    global _worker_logic
+    _worker_logic = NetworkLogic(data_dir, allow_deployment=False)
+
+def _optimize_task(task):
+    buffer_us, link_id = task
+    return buffer_us, link_id, _worker_logic.optimize_link(link_id, buffer_us / 1e6)
+
+def convert_legacy_jsons(data_dir):
+    """Builds the snapshot from traffic_summary/link_stats/optimization_cache JSONs."""
+    loaded = []
+    for name in LEGACY_JSONS:
+        with open(os.path.join(data_dir, name), "r") as f:
+            loaded.append(json.load(f))
+    traffic_summary, link_stats, optimization_cache = loaded
+
+    write_snapshot(os.path.join(data_dir, SNAPSHOT_NAME), traffic_summary, link_stats, optimization_cache)
+    print(f"Converted legacy JSONs to {SNAPSHOT_NAME} "
+          f"(buffers: {', '.join(sorted(optimization_cache))} µs).")
+
+def precompute_data(buffers_us=None, workers=None):
     base_dir = os.path.dirname(os.path.abspath(__file__))
     data_dir = os.path.join(base_dir, "output")
-    
+    buffers_us = buffers_us or DEFAULT_BUFFERS_US
+
     print("Loading data via NetworkLogic...")
-    logic = NetworkLogic(data_dir)
-    
+    logic = NetworkLogic(data_dir, allow_deployment=False)
+
     # 1. Traffic Summaries
     print("Generating Traffic Summaries...")
     traffic_summary = {}
     for link_id in logic.links.keys():
         traffic_data = logic.get_traffic_sample(link_id)
         traffic_summary[str(link_id)] = traffic_data
-        
-    with open(os.path.join(data_dir, "traffic_summary.json"), "w") as f:
-        json.dump(traffic_summary, f)
-        
+
     # 2. Link Stats
     print("Generating Link Stats...")
     link_stats = {}
     for link_id in logic.links.keys():
         stats = logic.get_link_stats(link_id)
         link_stats[str(link_id)] = stats
-        
-    with open(os.path.join(data_dir, "link_stats.json"), "w") as f:
-        json.dump(link_stats, f)
-        
-    # 3. Optimization/Financials Lookups
-    # (These are computed on demand usually, but we can pre-compute common cases if needed)
-    # Actually, logic.find_optimal_capacity uses huge thr_df. We MUST pre-compute this.
-    # We'll compute for Standard Buffer (143us) and maybe a few others if needed?
-    # Or just store the 'thr_df' in a much more compressed way? 
-    # No, let's just pre-compute the specific endpoints needed for the demo.
-    
-    print("Pre-computing Optimal Capacity (143us)...")
-    defaults_143 = logic.find_optimal_capacity(0.000143)
-    
-    optimization_cache = {
-        "143": defaults_143
-    }
-    
-    with open(os.path.join(data_dir, "optimization_cache.json"), "w") as f:
-        json.dump(optimization_cache, f)
-
-    print("Done! JSON files saved to output/.")
+
+    # 3. Optimization Lookups
+    # Every (buffer, link) bisection is independent, so fan them out over all cores.
+    tasks = [(b, link_id) for b in buffers_us for link_id in logic.links.keys()]
+    print(f"Pre-computing Optimal Capacity ({len(buffers_us)} buffer settings x {len(logic.links)} links)...")
+
+    optimization_cache = {b: {} for b in buffers_us}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data_dir,)) as pool:
+        for buffer_us, link_id, res in pool.map(_optimize_task, tasks, chunksize=8):
+            if res is not None:
+                optimization_cache[buffer_us][str(link_id)] = res
+
+    snapshot_path = os.path.join(data_dir, SNAPSHOT_NAME)
+    write_snapshot(snapshot_path, traffic_summary, link_stats, optimization_cache)
+    print(f"Done! Snapshot saved to output/{SNAPSHOT_NAME}.")
 
 if __name__ == "__main__":
-    precompute_data()
+    args = get_args()
+    if args.from_json:
+        convert_legacy_jsons(os.path.join(os.path.dirname(os.path.abspath(__file__)), "output"))
+    else:
+        buffers = [int(b) for b in args.buffers.split(",")] if args.buffers else None
+        precompute_data(buffers, args.workers)
@@ -0,0 +1,76 @@
+"""
+Deferred figure rendering for the pipeline scripts.
+
+Plot calls are queued as render requests and drained by a background process
+pool, so main.py and topology.py can write their numeric outputs without
+waiting on matplotlib. Modes:
+    deferred  render in background processes (default)
+    inline    render immediately in the calling process (previous behaviour)
+    off       skip figures entirely
+
+Workers are started with forkserver (spawn where that is unavailable), never
+fork: main.py's read-ahead thread is running when the first figure is queued,
+and a forked child can inherit a lock that thread holds.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+PLOT_MODES = ("deferred", "inline", "off")
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def _init_worker():
+    # Off-screen backend; workers never open windows
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+class RenderQueue:
+    def __init__(self, mode="deferred", workers=None):
+        if mode not in PLOT_MODES:
+            raise ValueError(f"Unknown plot mode '{mode}', expected one of {PLOT_MODES}")
+        self.mode = mode
+        self.workers = workers
+        self._pool = None
+        self._pending = []
+
+    def submit(self, fn, *args, **kwargs):
+        """Queues fn(*args, **kwargs). Arguments must be picklable in deferred mode."""
+        if self.mode == "off":
+            return
+        if self.mode == "inline":
+            fn(*args, **kwargs)
+            return
+        if self._pool is None:
+            # Started lazily so runs that queue nothing start no workers
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                             mp_context=multiprocessing.get_context(START_METHOD))
+        self._pending.append((getattr(fn, "__name__", "render"), self._pool.submit(fn, *args, **kwargs)))
+
+    def close(self, wait=True):
+        """Waits for queued figures (if wait) and reports failures; returns the count rendered."""
+        if self._pool is None:
+            return 0
+        if wait and self._pending:
+            print(f"Waiting for {len(self._pending)} queued figure(s)...")
+        self._pool.shutdown(wait=wait, cancel_futures=not wait)
+
+        rendered = 0
+        for name, future in self._pending:
+            if not future.done() or future.cancelled():
+                continue
+            if future.exception() is not None:
+                print(f"Warning: figure {name} failed: {future.exception()}")
+            else:
+                rendered += 1
+        self._pool = None
+        self._pending = []
+        return rendered
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # On error, don't hold the process open for figures nobody will look at
+        self.close(wait=exc_type is None)
+        return False
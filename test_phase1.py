@@ -0,0 +1,136 @@
+"""
+Phase 1 despiking and alignment against brute-force references and known drift, on synthetic data:
+
+    python test_phase1.py
+"""
+import os
+import sys
+import tempfile
+from collections import deque
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+
+import main
+from main import (
+    DESPIKE_WARMUP_KBITS, SHIFT_GRID, SPIKE_FLOOR_KBITS, SPIKE_MEDIAN_FACTOR, RollingDespiker,
+    align_timelines, align_timelines_drift, process_throughput, shift_correlations, stream_throughput
+)
+
+def brute_force_cutoffs(kbits, window, min_periods):
+    # The rolling rule written out: np.median over the last `window` accepted samples
+    active = deque(maxlen=window)
+    cutoffs = np.empty(len(kbits))
+    for k, x in enumerate(kbits):
+        if len(active) < min_periods:
+            cutoff = DESPIKE_WARMUP_KBITS
+        else:
+            cutoff = max(np.median(active) * SPIKE_MEDIAN_FACTOR, SPIKE_FLOOR_KBITS)
+        cutoffs[k] = cutoff
+        if 0.0 < x <= cutoff:
+            active.append(x)
+    return cutoffs
+
+def test_rolling_despike(seed=0):
+    # Bursty traffic with idle gaps and spikes, fed in uneven chunks so the
+    # window has to carry across chunk boundaries
+    rng = np.random.default_rng(seed)
+    failures = 0
+    for window, min_periods in [(1, 1), (2, 2), (7, 3), (64, 16), (501, 64)]:
+        kbits = rng.lognormal(4.0, 1.0, 5000) * (rng.random(5000) > 0.3)
+        kbits[rng.choice(5000, 40, replace=False)] = 50000.0
+        despiker = RollingDespiker(window, min_periods)
+        bounds = np.sort(rng.choice(np.arange(1, 5000), 12, replace=False))
+        streamed = np.concatenate([despiker.feed(chunk) for chunk in np.split(kbits, bounds)])
+        expected = brute_force_cutoffs(kbits, window, min(min_periods, window))
+        mismatches = int(np.sum(streamed != expected))
+        print(f"window {window:3d}: {mismatches} mismatch(es), {int(np.sum(kbits > expected))} spikes")
+        failures += mismatches
+    if failures == 0:
+        print("SUCCESS: Streamed cutoffs match the brute-force rolling median.")
+    assert failures == 0
+
+def test_streamed_throughput(seed=0):
+    # A capture split over two day files, read in small chunks, against the same samples
+    # shuffled into one file, which has to be read whole and sorted
+    rng = np.random.default_rng(seed)
+    ts = np.arange(6000) * 0.0005
+    kbits = rng.lognormal(4.0, 1.0, len(ts)) * (rng.random(len(ts)) > 0.3)
+    kbits[rng.choice(len(ts), 30, replace=False)] = 50000.0
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [os.path.join(tmp, name) for name in ("day1.dat", "day2.dat", "shuffled.dat")]
+        for path, rows in zip(paths, (np.arange(3500), np.arange(3500, len(ts)), rng.permutation(len(ts)))):
+            np.savetxt(path, np.column_stack([ts[rows], kbits[rows]]), fmt="%.4f %.6f")
+        chunk = main.DESPIKE_CHUNK
+        main.DESPIKE_CHUNK = 777
+        try:
+            streamed, streamed_spikes = process_throughput(paths[:2], despike="rolling", despike_window=501)
+            unsorted = stream_throughput(paths[2:], despike_window=501)
+            whole, whole_spikes = process_throughput(paths[2:], despike="rolling", despike_window=501)
+        finally:
+            main.DESPIKE_CHUNK = chunk
+    same = (np.array_equal(streamed["gbps"], whole["gbps"]) and np.array_equal(streamed["timestamp"], whole["timestamp"])
+            and np.array_equal(streamed_spikes.to_numpy(), whole_spikes.to_numpy()))
+    print(f"Streamed: {len(streamed)} rows, {len(streamed_spikes)} spikes; read whole: {len(whole)} rows, "
+          f"{len(whole_spikes)} spikes; shuffled file streamed: {unsorted}")
+    if same and unsorted is None:
+        print("SUCCESS: Chunked reading matches reading the log whole.")
+    assert same and unsorted is None
+
+def test_shift_correlations(seed=0):
+    # The batched scoring against one np.interp + np.corrcoef per shift, with
+    # blocks small enough that the shifts are split across several of them
+    rng = np.random.default_rng(seed)
+    thr_ts = np.sort(rng.uniform(0, 20, 4000))
+    thr_vals = rng.exponential(1.0, 4000)
+    pkt_ts = np.sort(rng.uniform(-2, 22, 3000))
+    pkt_loss = rng.random(3000) * (rng.random(3000) > 0.8)
+    expected = np.array([np.corrcoef(thr_vals, np.interp(thr_ts + s, pkt_ts, pkt_loss, left=0, right=0))[0, 1]
+                         for s in SHIFT_GRID])
+    block = main.SHIFT_BLOCK_ELEMENTS
+    main.SHIFT_BLOCK_ELEMENTS = 7 * len(thr_ts)
+    try:
+        corrs = shift_correlations(thr_ts, thr_vals, pkt_ts, pkt_loss, SHIFT_GRID)
+    finally:
+        main.SHIFT_BLOCK_ELEMENTS = block
+    error = np.max(np.abs(corrs - expected))
+    print(f"Batched shift correlations: max deviation {error:.2e} over {len(SHIFT_GRID)} shifts")
+    if error < 1e-9:
+        print("SUCCESS: Batched correlations match the per-shift loop.")
+    assert error < 1e-9
+
+def test_drift_alignment(seed=0):
+    # Loss logged on a clock that drifts from 0.2 s to 0.8 s ahead over the capture
+    rng = np.random.default_rng(seed)
+    duration, window_sec = 240.0, 20.0
+    ts = np.arange(0, duration, 0.0005)
+    gbps = rng.random(len(ts)) * 0.2
+    for start in rng.choice(len(ts) - 400, 1200, replace=False):
+        gbps[start:start + rng.integers(50, 400)] += 3
+    true_shift = 0.2 + 0.6 * ts / duration
+    loss = (gbps > 2) * rng.random(len(ts))
+    df_thr = pd.DataFrame({"timestamp": ts, "gbps": gbps})
+    df_pkt = pd.DataFrame({"timestamp": ts + true_shift, "loss": loss})
+
+    _, shift, constant_corr = align_timelines(df_thr, df_pkt)
+    _, warp, corr = align_timelines_drift(df_thr, df_pkt, window_sec=window_sec)
+    fitted = warp.dropna(subset=["fitted_shift"])
+    error = np.max(np.abs(fitted["fitted_shift"] - (0.2 + 0.6 * fitted["window_center"] / duration)))
+    print(f"Constant shift {shift:.2f}s: correlation {constant_corr:.3f}")
+    print(f"Drift fit over {len(fitted)}/{len(warp)} windows: max shift error {error * 1000:.2f} ms, "
+          f"correlation {corr:.3f}")
+    # A window's best shift lies somewhere in the drift it spans (50 ms here), so allow a
+    # fifth of that; and the fit must align clearly better than one shift for the capture
+    tolerance = 0.6 * window_sec / duration / 5
+    if error <= tolerance and corr > constant_corr + 0.2:
+        print("SUCCESS: Drift fit recovers the clock drift.")
+    assert error <= tolerance and corr > constant_corr + 0.2
+
+if __name__ == "__main__":
+    test_rolling_despike()
+    test_streamed_throughput()
+    test_shift_correlations()
+    test_drift_alignment()
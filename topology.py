@@ -1,14 +1,86 @@
 import sys
+import argparse
 import pandas as pd
 import numpy as np
 import networkx as nx
 import matplotlib.pyplot as plt
+from scipy import fft as sp_fft
 from pathlib import Path
+from render_queue import PLOT_MODES, RenderQueue
+from dashboard.backend.kernels import (
+    window_bounds, window_capacities_jit, bootstrap_capacity_interval, bootstrap_capacities_jit,
+    idle_runs, min_capacity_jit, run_leaky_bucket_rle_jit
+)
 
 # Constants
 SLOT_DURATION = 0.0005  # 500 microseconds
 BUFFER_TIME_SEC = 143e-6 # 143 microseconds (4 symbols)
 MAX_DROP_RATE = 0.01    # 1% packet loss allowed
+LAG_CORR_MEMORY_BYTES = 256 * 1024**2 # Working-set cap for the batched FFT cross-correlation
+
+# Approximate discovery (--discovery lsh): 126 MinHashes in 42 bands of 3 rows,
+# i.e. pairs with loss-event Jaccard similarity above ~(1/42)^(1/3) = 0.29 collide
+MINHASH_PERMUTATIONS = 126
+LSH_BANDS = 42
+MINHASH_PRIME = (1 << 31) - 1
+LSH_REPORT_THRESHOLDS = (0.3, 0.5, 0.7, 0.9)
+
+# Preview (--preview): a coarser capacity search (peak / 2^12 resolution instead of
+# peak / 2^20) and the number of window-bootstrap replicates behind its error bounds
+PREVIEW_ITERATIONS = 12
+PREVIEW_REPLICATES = 200
+PREVIEW_MIN_WINDOW_SEC = 0.25 # Shorter windows rarely contain the bursts that set the buffered capacity
+
+def confidence_level(text):
+    """argparse type for --confidence: a level strictly between 0 and 1."""
+    try:
+        value = float(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid confidence level: {text!r}")
+    if not 0 < value < 1:
+        raise argparse.ArgumentTypeError(f"confidence must be between 0 and 1 (exclusive), got {text}")
+    return value
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Telecom Telemetry Phase 2: Topology & Capacity")
+    parser.add_argument("--plots", choices=PLOT_MODES, default="deferred",
+                        help="Render figures in background processes (default), inline, or not at all")
+    parser.add_argument("--window-sec", type=float, default=None,
+                        help="Also profile required capacity per time window of this length (seconds)")
+    parser.add_argument("--carry-state", action="store_true",
+                        help="Warm each window's buffer up on the preceding window instead of starting empty")
+    parser.add_argument("--discovery", choices=("exact", "lsh"), default="exact",
+                        help="Correlate all cell pairs, or only MinHash/LSH candidate pairs (for very large inventories)")
+    parser.add_argument("--lsh-report", action="store_true",
+                        help="With --discovery lsh, also run the exact method and report candidate recall/precision")
+    parser.add_argument("--max-lag", type=int, default=0,
+                        help="Correlate loss at up to this many slots of lag and keep each pair's peak (0 = zero lag only)")
+    parser.add_argument("--bootstrap", type=int, default=0,
+                        help="Block-bootstrap replicates for a confidence interval on the buffered capacity (0 = off)")
+    parser.add_argument("--confidence", type=confidence_level, default=0.95,
+                        help="Confidence level of the bootstrap interval, between 0 and 1")
+    parser.add_argument("--preview", action="store_true",
+                        help="Quick approximate run on a stratified sample of time windows; writes link_capacity_preview.csv only")
+    parser.add_argument("--preview-fraction", type=float, default=0.05,
+                        help="Share of the capture the preview samples")
+    parser.add_argument("--preview-windows", type=int, default=20,
+                        help="Number of strata (one sampled window each) the capture is split into")
+    parser.add_argument("--preview-decimate", type=int, default=4,
+                        help="Slots summed into each point of the preview's loss correlation grid")
+    args = parser.parse_args()
+
+    # Flags that would otherwise be silently ignored
+    if args.lsh_report and args.discovery != "lsh":
+        parser.error("--lsh-report requires --discovery lsh")
+    if args.max_lag > 0 and args.discovery == "lsh":
+        parser.error("--max-lag is only supported with --discovery exact (LSH candidates are correlated at zero lag)")
+    if args.preview:
+        ignored = [flag for flag, used in (("--discovery lsh", args.discovery == "lsh"), ("--max-lag", args.max_lag > 0),
+                                           ("--bootstrap", args.bootstrap > 0), ("--window-sec", args.window_sec))
+                   if used]
+        if ignored:
+            parser.error(f"--preview cannot be combined with {', '.join(ignored)}")
+    return args
 
 def load_aligned_data(output_dir):
     """
@@ -29,9 +101,10 @@ def load_aligned_data(output_dir):
     print(f"Loaded data for {len(cells)} cells.")
     return cells
 
-def resample_and_correlate(cells):
+def resample_and_correlate(cells, correlate=True):
     """
-    Resamples packet loss series to a common timeline and computes correlation.
+    Resamples packet loss series to a common timeline and computes correlation
+    (skipped, returning None, with correlate=False).
     """
     # 1. Union of all timestamps to create a master index
     all_timestamps = set()
@@ -63,19 +136,178 @@ def resample_and_correlate(cells):
     throughput_df = throughput_df.fillna(0)
     
     # 3. Correlation
-    corr_matrix = loss_df.corr()
+    corr_matrix = loss_df.corr() if correlate else None
     
     return loss_df, throughput_df, corr_matrix
 
-def build_topology(corr_matrix):
+def lagged_correlation(loss_df, max_lag):
+    """
+    Peak Pearson correlation of every cell pair over lags -max_lag..max_lag
+    slots, so loss smeared into neighbouring slots by residual clock skew still
+    registers. Computed for the whole loss matrix at once: one matrix product
+    per lag for short lag windows, otherwise a batched FFT cross-correlation
+    (all columns transformed once, each block of rows inverted in one call).
+    Returns (peak correlation, lag of the peak in slots); a positive lag means
+    the column cell's loss trails the row cell's.
+    """
+    cells = loss_df.columns
+    x = loss_df.values.astype(np.float64)
+    x -= x.mean(axis=0)
+    norms = np.sqrt((x ** 2).sum(axis=0))
+    z = np.divide(x, norms, out=np.zeros_like(x), where=norms > 0)
+
+    n_slots, n_cells = z.shape
+    max_lag = min(max_lag, n_slots - 1)
+    lags = np.arange(-max_lag, max_lag + 1)
+    nfft = sp_fft.next_fast_len(n_slots + max_lag)  # Zero padding keeps lags from wrapping around
+
+    if len(lags) <= 2 * np.log2(nfft):
+        # Few lags: a matrix product per lag beats transforming every pair's full spectrum
+        # window[i, k, j] = sum_t z[t, i] * z[t + k, j]
+        window = np.empty((n_cells, len(lags), n_cells))
+        for idx, k in enumerate(lags):
+            window[:, idx, :] = z[:n_slots - k].T @ z[k:] if k >= 0 else z[-k:].T @ z[:n_slots + k]
+        k = window.argmax(axis=1)
+        peak = np.take_along_axis(window, k[:, None, :], axis=1)[:, 0, :]
+        best_lag = lags[k]
+    else:
+        spectra = sp_fft.rfft(z, n=nfft, axis=0, workers=-1)
+        peak = np.zeros((n_cells, n_cells))
+        best_lag = np.zeros((n_cells, n_cells), dtype=np.int64)
+        block = max(1, LAG_CORR_MEMORY_BYTES // (nfft * n_cells * 8))
+        for start in range(0, n_cells, block):
+            rows = slice(start, min(start + block, n_cells))
+            # xcorr[b, k, j] = sum_t z[t, i_b] * z[t + k, j]
+            xcorr = sp_fft.irfft(np.conj(spectra[:, rows]).T[:, :, None] * spectra[None, :, :],
+                                 n=nfft, axis=1, workers=-1)
+            window = xcorr[:, lags % nfft, :]
+            k = window.argmax(axis=1)
+            peak[rows] = np.take_along_axis(window, k[:, None, :], axis=1)[:, 0, :]
+            best_lag[rows] = lags[k]
+
+    np.fill_diagonal(peak, 1.0)
+    np.fill_diagonal(best_lag, 0)
+    return (pd.DataFrame(peak, index=cells, columns=cells),
+            pd.DataFrame(best_lag, index=cells, columns=cells))
+
+def minhash_signatures(loss_df, num_perm=MINHASH_PERMUTATIONS, seed=0):
+    """
+    MinHash signature (num_perm x cells) of each cell's set of loss-event slots.
+    Cells without any loss get no signature and are left out (returned mask).
+    """
+    cols, slots = np.nonzero(loss_df.values.T > 0)  # Grouped by cell
+    slots = slots.astype(np.int64)
+    has_loss = np.bincount(cols, minlength=loss_df.shape[1]) > 0
+    starts = np.flatnonzero(np.r_[True, cols[1:] != cols[:-1]]) if len(cols) else np.array([], dtype=np.int64)
+
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, MINHASH_PRIME, size=num_perm, dtype=np.int64)
+    b = rng.integers(0, MINHASH_PRIME, size=num_perm, dtype=np.int64)
+    signatures = np.empty((num_perm, int(has_loss.sum())), dtype=np.int64)
+    for k in range(num_perm):
+        hashed = (a[k] * slots + b[k]) % MINHASH_PRIME
+        signatures[k] = np.minimum.reduceat(hashed, starts) if len(starts) else []
+    return signatures, has_loss
+
+def lsh_candidate_pairs(signatures, bands=LSH_BANDS):
+    """
+    Banded LSH over MinHash signatures: two cells are candidates if all rows
+    of any band agree. Returns an (n, 2) array of column-index pairs, i < j.
+    """
+    rows = signatures.shape[0] // bands
+    mixers = np.random.default_rng(1).integers(1, 1 << 62, size=rows, dtype=np.int64) | 1
+    pairs = set()
+    for band in range(bands):
+        # One 64-bit key per cell and band (wrapping multiply-add of the band's rows)
+        keys = (signatures[band * rows:(band + 1) * rows] * mixers[:rows, None]).sum(axis=0)
+        order = np.argsort(keys, kind="stable")
+        sorted_bucket = keys[order]
+        bounds = np.flatnonzero(np.r_[True, sorted_bucket[1:] != sorted_bucket[:-1], True])
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            if hi - lo < 2: continue
+            members = order[lo:hi]
+            i, j = np.triu_indices(len(members), 1)
+            pairs.update(zip(members[i].tolist(), members[j].tolist()))
+    return np.array(sorted(pairs), dtype=np.int64).reshape(-1, 2)
+
+def candidate_correlations(loss_df, pairs, chunk=256):
+    """Exact Pearson correlation of the given column-index pairs only."""
+    x = np.array(loss_df.values.T, dtype=np.float64, order="C")  # Cell-major copy: each gather is one contiguous row
+    x -= x.mean(axis=1, keepdims=True)
+    norms = np.sqrt((x ** 2).sum(axis=1, keepdims=True))
+    z = np.divide(x, norms, out=np.zeros_like(x), where=norms > 0)
+    corr = np.empty(len(pairs))
+    for start in range(0, len(pairs), chunk):
+        i, j = pairs[start:start + chunk].T
+        corr[start:start + chunk] = np.einsum("it,it->i", z[i], z[j])
+    return corr
+
+def lsh_correlation_edges(loss_df, num_perm=MINHASH_PERMUTATIONS, bands=LSH_BANDS, seed=0):
+    """
+    Approximate discovery: exact correlation, but only for the cell pairs whose
+    loss events collide under MinHash/LSH. Returns an edge list for
+    build_topology_from_edges.
+    """
+    signatures, has_loss = minhash_signatures(loss_df, num_perm, seed)
+    cells = loss_df.columns[has_loss]
+    pairs = lsh_candidate_pairs(signatures, bands)
+    corr = candidate_correlations(loss_df[cells], pairs)
+    n = len(cells)
+    print(f"LSH: {len(pairs)} candidate pairs out of {n * (n - 1) // 2} ({len(loss_df.columns) - n} cells without loss skipped).")
+    return pd.DataFrame({
+        "Cell_A": cells[pairs[:, 0]] if len(pairs) else [],
+        "Cell_B": cells[pairs[:, 1]] if len(pairs) else [],
+        "Correlation": corr,
+    })
+
+def lsh_report(edges, corr_matrix, thresholds=LSH_REPORT_THRESHOLDS):
+    """
+    Recall and precision of the LSH candidate pairs against the exact
+    correlation matrix: at each threshold, the true pairs are those whose exact
+    correlation exceeds it.
+    """
+    cells = list(corr_matrix.columns)
+    i, j = np.triu_indices(len(cells), 1)
+    exact = corr_matrix.values[i, j]
+    index = {c: k for k, c in enumerate(cells)}
+    candidates = {(min(index[a], index[b]), max(index[a], index[b]))
+                  for a, b in zip(edges["Cell_A"], edges["Cell_B"])}
+
+    rows = []
+    for threshold in thresholds:
+        true_pairs = {(a, b) for a, b, c in zip(i, j, exact) if c > threshold}
+        found = len(true_pairs & candidates)
+        rows.append({
+            "Threshold": threshold,
+            "True_Pairs": len(true_pairs),
+            "Candidate_Pairs": len(candidates),
+            "Recall": round(found / len(true_pairs), 4) if true_pairs else 1.0,
+            "Precision": round(found / len(candidates), 4) if candidates else 1.0,
+        })
+    return pd.DataFrame(rows)
+
+def build_topology(corr_matrix, lag_matrix=None):
     """
     Builds a graph where edges exist if correlation > threshold.
+    With a lag_matrix (from lagged_correlation), edges also carry the lag of the peak.
     Dynamically adjusts threshold to try and find exactly 3 connected components (Links 1, 2, 3).
     """
-    cells = corr_matrix.columns
-    best_G = None
-    best_components = []
-    
+    cells = list(corr_matrix.columns)
+    i, j = np.triu_indices(len(cells), 1)
+    edges = pd.DataFrame({
+        "Cell_A": np.array(cells, dtype=object)[i],
+        "Cell_B": np.array(cells, dtype=object)[j],
+        "Correlation": corr_matrix.values[i, j],
+    })
+    if lag_matrix is not None:
+        edges["Lag"] = lag_matrix.values[i, j].astype(int)
+    return build_topology_from_edges(cells, edges)
+
+def build_topology_from_edges(cells, edges):
+    """
+    build_topology over a sparse edge list with columns Cell_A, Cell_B,
+    Correlation (and optionally Lag); pairs that are not listed never connect.
+    """
     # Sweep threshold from high to low to find optimal clustering
     # We want to merge cells until we have roughly 3 groups.
     # Start high (strict) -> many components. Lower -> fewer components.
@@ -83,13 +315,10 @@ def build_topology(corr_matrix):
         G = nx.Graph()
         G.add_nodes_from(cells)
         
-        for i in range(len(cells)):
-            for j in range(i+1, len(cells)):
-                c1 = cells[i]
-                c2 = cells[j]
-                corr = corr_matrix.iloc[i, j]
-                if corr > threshold:
-                    G.add_edge(c1, c2, weight=corr)
+        for edge in edges[edges["Correlation"] > threshold].itertuples(index=False):
+            G.add_edge(edge.Cell_A, edge.Cell_B, weight=edge.Correlation)
+            if "Lag" in edges.columns:
+                G.edges[edge.Cell_A, edge.Cell_B]["lag"] = int(edge.Lag)
                     
         components = list(nx.connected_components(G))
         
@@ -170,46 +399,20 @@ def assign_link_ids(components):
 def simulate_buffer_drop(capacity_gbps, input_gbps_series):
     """
     Simulates a switch buffer and returns drop rate.
-    input_gbps_series: pandas Series of input rate per slot.
+    input_gbps_series: pandas Series of input rate per slot, or its
+    idle-run encoding from idle_runs() when called repeatedly.
+
+    Buffer size in bits depends on Link Capacity
+    Problem says: "Total buffer size at leaf switch is 4 symbols (i.e. 143 microsecond)"
+    Buffer in bits = Rate * Time; each slot adds its input and drains
+    capacity * SLOT_DURATION, dropping whatever overflows the buffer.
+    The compiled kernel skips idle slots once the buffer has drained, with
+    results identical to stepping every slot.
     """
-    dt = SLOT_DURATION
-    
-    # Buffer size in bits depends on Link Capacity
-    # Problem says: "Total buffer size at leaf switch is 4 symbols (i.e. 143 microsecond)"
-    # Buffer in bits = Rate * Time
-    max_buffer_bits = capacity_gbps * 1e9 * BUFFER_TIME_SEC
-    
-    current_buffer_bits = 0
-    total_input_bits = 0
-    total_dropped_bits = 0
-    
-    inputs = input_gbps_series.values # Gbps
-    drain_rate_bits_per_slot = capacity_gbps * 1e9 * dt
-    
-    for inp_gbps in inputs:
-        input_bits = inp_gbps * 1e9 * dt
-        total_input_bits += input_bits
-        
-        # Ingress
-        current_buffer_bits += input_bits
-        
-        # Drain
-        current_buffer_bits -= drain_rate_bits_per_slot
-        
-        # Underflow check
-        if current_buffer_bits < 0:
-            current_buffer_bits = 0
-            
-        # Overflow check
-        if current_buffer_bits > max_buffer_bits:
-            drop = current_buffer_bits - max_buffer_bits
-            total_dropped_bits += drop
-            current_buffer_bits = max_buffer_bits
-            
-    if total_input_bits == 0: return 0.0
-    
-    drop_rate = total_dropped_bits / total_input_bits
-    return drop_rate
+    if not isinstance(input_gbps_series, tuple):
+        input_gbps_series = idle_runs(input_gbps_series.values)
+    values, gaps = input_gbps_series
+    return run_leaky_bucket_rle_jit(capacity_gbps, values, gaps, BUFFER_TIME_SEC)
 
 def estimate_capacity(throughput_df, cells_in_group):
     """
@@ -236,9 +439,10 @@ def estimate_capacity(throughput_df, cells_in_group):
     # Optimization: If peak is very small, skip
     if max_cap < 0.001: return 0.0, 0.0
     
+    runs = idle_runs(group_throughput.values) # Encoded once for all 20 simulations
     for _ in range(20): 
         mid = (low + high) / 2
-        drop_rate = simulate_buffer_drop(mid, group_throughput)
+        drop_rate = simulate_buffer_drop(mid, runs)
         
         if drop_rate <= MAX_DROP_RATE:
             cap_with_buffer = mid
@@ -248,6 +452,146 @@ def estimate_capacity(throughput_df, cells_in_group):
             
     return cap_no_buffer, cap_with_buffer
 
+def estimate_capacity_interval(throughput_df, cells_in_group, replicates, confidence=0.95):
+    """
+    Percentile confidence interval for the buffered estimate_capacity result.
+    The group's trace is resampled in blocks (circular moving-block bootstrap)
+    so bursts stay intact; replicates are searched in parallel by the kernel.
+    """
+    group_throughput = throughput_df[cells_in_group].sum(axis=1)
+    # Same search as estimate_capacity: 20 bisection steps over [0, peak]
+    return bootstrap_capacity_interval(group_throughput.values, BUFFER_TIME_SEC, replicates, confidence,
+                                       high_factor=1.0, iterations=20)
+
+def estimate_capacity_windows(throughput_df, cells_in_group, window_sec, carry_state=False):
+    """
+    estimate_capacity per time window: returns a DataFrame with the no-buffer
+    and buffered capacity of every `window_sec` slice of the group's traffic.
+    Windows are searched in parallel by the compiled kernel.
+    """
+    group_throughput = throughput_df[cells_in_group].sum(axis=1)
+    timestamps = np.asarray(group_throughput.index.values, dtype=np.float64)
+    bounds = window_bounds(timestamps, window_sec)
+    # Same search as estimate_capacity: 20 bisection steps over [0, peak]
+    caps, peaks = window_capacities_jit(
+        np.ascontiguousarray(group_throughput.values, dtype=np.float64), bounds,
+        BUFFER_TIME_SEC, carry_state, 1.0, 20, MAX_DROP_RATE)
+
+    keep = bounds[1:] > bounds[:-1]
+    return pd.DataFrame({
+        "Window_Start_s": timestamps[bounds[:-1][keep]],
+        "Window_End_s": timestamps[bounds[1:][keep] - 1],
+        "Capacity_No_Buffer_Gbps": peaks[keep].round(2),
+        "Capacity_With_Buffer_Gbps": caps[keep].round(2),
+    })
+
+def sample_windows(cells, fraction, n_windows, seed=0):
+    """
+    Stratified sample of the capture: its time span is split into n_windows
+    equal strata and one window of fraction * span / n_windows (at least
+    PREVIEW_MIN_WINDOW_SEC) is placed at a random offset in each. Returns the
+    window start times, the window length and the share of the span sampled.
+    """
+    t_min = min(df["timestamp"].min() for df in cells.values())
+    t_max = max(df["timestamp"].max() for df in cells.values())
+    stratum = (t_max - t_min) / n_windows
+    length = min(max(stratum * fraction, PREVIEW_MIN_WINDOW_SEC), stratum)
+    rng = np.random.default_rng(seed)
+    starts = t_min + stratum * np.arange(n_windows) + rng.uniform(0, stratum - length, n_windows)
+    return starts, length, length / stratum if stratum > 0 else 1.0
+
+def slice_windows(cells, starts, length):
+    """Only the rows of each cell that fall inside one of the windows."""
+    sampled = {}
+    for cid, df in cells.items():
+        ts = df["timestamp"].values
+        if np.any(np.diff(ts) < 0):
+            df = df.sort_values("timestamp")
+            ts = df["timestamp"].values
+        lo = np.searchsorted(ts, starts, side="left")
+        hi = np.searchsorted(ts, starts + length, side="left")
+        rows = np.concatenate([np.arange(a, b) for a, b in zip(lo, hi)])
+        sampled[cid] = df.iloc[rows]
+    return sampled
+
+def decimated_correlation(loss_df, window_ids, decimate):
+    """
+    Loss correlation on a coarser grid: every `decimate` consecutive slots of a
+    window are summed into one point (bins never straddle two windows).
+    """
+    if decimate <= 1:
+        return loss_df.corr()
+    starts = np.r_[0, np.flatnonzero(np.diff(window_ids)) + 1]
+    run_start = np.repeat(starts, np.diff(np.r_[starts, len(window_ids)]))
+    bins = window_ids.astype(np.int64) * (len(window_ids) + 1) + (np.arange(len(window_ids)) - run_start) // decimate
+    return loss_df.groupby(bins).sum().corr()
+
+def preview_capacity(series, block_starts, confidence, seed=0):
+    """
+    estimate_capacity on the sampled trace, with a coarser bisection. The
+    error bounds are a percentile interval over bootstrap replicates that
+    redraw the sampled windows with replacement, widened by the search
+    resolution. Returns (no-buffer peak, buffered capacity, low, high).
+    """
+    series = np.array(series, dtype=np.float64) # Writable copy (pandas hands out read-only arrays)
+    peak = float(series.max()) if len(series) else 0.0
+    if peak < 0.001: return 0.0, 0.0, 0.0, 0.0
+    cap = min_capacity_jit(series, BUFFER_TIME_SEC, peak, PREVIEW_ITERATIONS, MAX_DROP_RATE)
+
+    n = len(series)
+    block_len = int(np.min(np.diff(np.r_[block_starts, n])))
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(block_starts), size=(PREVIEW_REPLICATES, -(-n // block_len)))
+    caps = bootstrap_capacities_jit(series, block_starts[picks], block_len, BUFFER_TIME_SEC,
+                                    1.0, PREVIEW_ITERATIONS, MAX_DROP_RATE)
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(caps, [alpha, 1 - alpha])
+    resolution = peak / 2**PREVIEW_ITERATIONS
+    return peak, cap, max(min(low, cap) - resolution, 0.0), max(high, cap) + resolution
+
+def run_preview(args, cells, output_dir):
+    """
+    Approximate topology and capacity from a stratified sample of the capture.
+    Nothing the full run writes is touched: results go to link_capacity_preview.csv,
+    flagged Approximate, and no figures are drawn.
+    """
+    starts, length, fraction = sample_windows(cells, args.preview_fraction, args.preview_windows)
+    print(f"PREVIEW: sampling {args.preview_windows} windows of {length:.3f}s "
+          f"({fraction:.0%} of the capture). All results below are approximate.")
+    loss_df, thr_df, _ = resample_and_correlate(slice_windows(cells, starts, length), correlate=False)
+    window_ids = np.searchsorted(starts, loss_df.index.values, side="right") - 1
+
+    print(f"Correlating loss on a {args.preview_decimate}-slot grid...")
+    G, components = build_topology(decimated_correlation(loss_df, window_ids, args.preview_decimate))
+    link_map = assign_link_ids(components)
+
+    # Row where each sampled window begins in the sampled trace
+    block_starts = np.r_[0, np.flatnonzero(np.diff(window_ids)) + 1].astype(np.int64)
+    results = []
+    print(f"\nEstimating capacity (approximate, {args.confidence:.0%} bounds)...")
+    for link_id in sorted(link_map.keys()):
+        cells_in_link = link_map[link_id]
+        peak, cap, low, high = preview_capacity(thr_df[cells_in_link].sum(axis=1).values, block_starts,
+                                                args.confidence)
+        results.append({
+            "Link_ID": link_id,
+            "Cells": " ".join(cells_in_link),
+            "Capacity_No_Buffer_Gbps": round(peak, 2),
+            "Capacity_With_Buffer_Gbps": round(cap, 2),
+            "CI_Low_Gbps": round(low, 2),
+            "CI_High_Gbps": round(high, 2),
+            "Approximate": True,
+            "Sample_Fraction": round(fraction, 4),
+            "Windows": args.preview_windows
+        })
+        print(f"  Link {link_id} (Cells: {cells_in_link}):")
+        print(f"    -> No Buffer Cap: ~{peak:.2f} Gbps (sample peak; the full capture's can only be higher)")
+        print(f"    -> With Buffer Cap: ~{cap:.2f} Gbps [{low:.2f}, {high:.2f}]")
+
+    pd.DataFrame(results).to_csv(f"{output_dir}/link_capacity_preview.csv", index=False)
+    print(f"\nPREVIEW estimates saved to '{output_dir}/link_capacity_preview.csv' (approximate; "
+          "run without --preview for the exact results).")
+
 def visualize_topology(G, output_path):
     plt.figure(figsize=(10, 8))
     # Spring layout attempts to position high-weight edges closer
@@ -306,27 +650,56 @@ def plot_link_traffic(throughput_df, link_id, group_cells, cap_no_buf, cap_buf,
     plt.close()
 
 def main():
+    args = get_args()
     output_dir = "output"
     cells = load_aligned_data(output_dir)
     if not cells: 
         print("No aligned data found. Run main.py first.")
         return
+    if args.preview:
+        run_preview(args, cells, output_dir)
+        return
     
     # 1. Resample & Correlate
     print("Resampling and calculating correlation...")
-    loss_df, thr_df, corr_matrix = resample_and_correlate(cells)
-    corr_matrix.to_csv("output/correlation_matrix.csv")
+    exact = args.discovery == "exact" or args.lsh_report
+    loss_df, thr_df, corr_matrix = resample_and_correlate(cells, correlate=exact)
+    lag_matrix = None
+    if args.max_lag > 0:
+        print(f"Correlating loss at lags up to +/-{args.max_lag} slots...")
+        corr_matrix, lag_matrix = lagged_correlation(loss_df, args.max_lag)
+        lag_matrix.to_csv("output/correlation_lag_matrix.csv")
+    if corr_matrix is not None:
+        corr_matrix.to_csv("output/correlation_matrix.csv")
     
+    edges = None
+    if args.discovery == "lsh":
+        # Zero-lag correlation on LSH candidates only (get_args rejects --max-lag here)
+        edges = lsh_correlation_edges(loss_df)
+        edges.to_csv("output/correlation_edges.csv", index=False)
+        if args.lsh_report:
+            report = lsh_report(edges, corr_matrix)
+            report.to_csv("output/lsh_report.csv", index=False)
+            print("LSH candidates vs exact correlation:")
+            print(report.to_string(index=False))
+    
+    # Figures are queued and drawn off the critical path; numeric outputs never wait on them
+    renderer = RenderQueue(args.plots)
+
     # 2. Build Topology
     print("Building topology graph...")
-    G, components = build_topology(corr_matrix)
-    visualize_topology(G, "output/topology_graph.png")
+    if edges is not None:
+        G, components = build_topology_from_edges(list(loss_df.columns), edges)
+    else:
+        G, components = build_topology(corr_matrix, lag_matrix)
+    renderer.submit(visualize_topology, G, "output/topology_graph.png")
     
     # 3. Assign Links
     link_map = assign_link_ids(components)
     
     # 4. Estimate Capacity & Report
     results = []
+    window_results = []
     print("\nEstimating Capacity for identified Links...")
     
     # Sort by Link ID
@@ -346,14 +719,32 @@ def main():
         print(f"    -> No Buffer Cap: {cap_no_buf:.2f} Gbps")
         print(f"    -> With Buffer Cap: {cap_buf:.2f} Gbps")
         
-        # Visualize
-        plot_loss_heatmap(loss_df, link_id, cells_in_link, output_dir)
-        plot_link_traffic(thr_df, link_id, cells_in_link, cap_no_buf, cap_buf, output_dir)
+        if args.bootstrap > 0:
+            ci_low, ci_high = estimate_capacity_interval(thr_df, cells_in_link, args.bootstrap, args.confidence)
+            results[-1]["CI_Low_Gbps"] = round(ci_low, 2)
+            results[-1]["CI_High_Gbps"] = round(ci_high, 2)
+            print(f"    -> {args.confidence:.0%} CI: [{ci_low:.2f}, {ci_high:.2f}] Gbps")
+        
+        # Visualize (only this link's columns are shipped to the render process)
+        renderer.submit(plot_loss_heatmap, loss_df[cells_in_link], link_id, cells_in_link, output_dir)
+        renderer.submit(plot_link_traffic, thr_df[cells_in_link], link_id, cells_in_link, cap_no_buf, cap_buf, output_dir)
+        
+        if args.window_sec:
+            windows = estimate_capacity_windows(thr_df, cells_in_link, args.window_sec, args.carry_state)
+            windows.insert(0, "Link_ID", link_id)
+            window_results.append(windows)
+            print(f"    -> Windowed ({args.window_sec}s): {windows['Capacity_With_Buffer_Gbps'].min():.2f}"
+                  f" - {windows['Capacity_With_Buffer_Gbps'].max():.2f} Gbps")
         
     # Save Results
     res_df = pd.DataFrame(results)
     res_df.to_csv("output/link_capacity_estimates.csv", index=False)
     print("\nCapacity estimates saved to 'output/link_capacity_estimates.csv'.")
+    if window_results:
+        pd.concat(window_results).to_csv("output/link_capacity_windows.csv", index=False)
+        print("Windowed capacity saved to 'output/link_capacity_windows.csv'.")
+
+    renderer.close()
 
 if __name__ == "__main__":
     main()
@@ -1,16 +1,28 @@
+import argparse
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use("Agg")  # Off-screen rendering; pool workers inherit it
 import matplotlib.pyplot as plt
-import matplotlib.cm as cm
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-import ast
+
+# Figure geometry: series are binned to the pixel width they will be drawn at
+DPI = 150
+UTILIZATION_FIGSIZE = (12, 6)
+HEATMAP_WIDTH_IN = 14
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Telecom Telemetry: Link Visualizations")
+    parser.add_argument("--workers", type=int, default=None, help="Render processes (default: all cores)")
+    return parser.parse_args()
 
 def load_data():
     """
     Loads aligned cell data and link estimates.
     """
     data_dir = Path("output")
-    
+
     # Load Link Estimates
     try:
         links_df = pd.read_csv(data_dir / "link_capacity_estimates.csv")
@@ -25,142 +37,158 @@ def load_data():
             cid = p.name.split('_')[1]
             cells[cid] = pd.read_csv(p)
         except: continue
-        
+
     return links_df, cells
 
-def plot_link_utilization(link_id, cell_ids, optimal_cap, peak_load, cells_data, output_dir):
+def build_cell_matrix(cells_data):
+    """
+    Places every cell on one shared timeline, once for all figures.
+    Returns (timeline, row_of_cell, throughput, has_loss, present) where the
+    matrices are cells x timeline; `present` marks slots a cell actually reported.
+    """
+    cell_ids = list(cells_data.keys())
+    stamps = [cells_data[cid]["timestamp"].values for cid in cell_ids]
+    timeline = np.unique(np.concatenate(stamps)) if stamps else np.array([])
+
+    shape = (len(cell_ids), len(timeline))
+    throughput = np.zeros(shape, dtype=np.float32)
+    has_loss = np.zeros(shape, dtype=bool)
+    present = np.zeros(shape, dtype=bool)
+
+    for row, (cid, ts) in enumerate(zip(cell_ids, stamps)):
+        cols = np.searchsorted(timeline, ts)
+        df = cells_data[cid]
+        throughput[row, cols] = df["gbps"].values
+        has_loss[row, cols] = df["packet_loss"].values > 0
+        present[row, cols] = True
+
+    row_of_cell = {cid: row for row, cid in enumerate(cell_ids)}
+    return timeline, row_of_cell, throughput, has_loss, present
+
+def bin_starts(n_samples, n_bins):
+    """Start index of each of (at most) n_bins equal chunks."""
+    return np.unique(np.linspace(0, n_samples, n_bins + 1).astype(np.int64)[:-1])
+
+def bin_peaks(x, y, n_bins):
+    """
+    Min/max envelope of y over n_bins chunks. Drawing the envelope keeps every
+    burst visible while plotting only ~2 points per pixel column.
+    """
+    if len(y) <= 2 * n_bins:
+        return x, y, y
+    starts = bin_starts(len(y), n_bins)
+    return x[starts], np.minimum.reduceat(y, starts), np.maximum.reduceat(y, starts)
+
+def prepare_link(link_id, cell_ids, matrix):
+    """Slices and bins the shared matrix for one link's two figures."""
+    timeline, row_of_cell, throughput, has_loss, present = matrix
+    rows = [row_of_cell[cid] for cid in cell_ids if cid in row_of_cell]
+    if not rows:
+        return None
+
+    # Only the timestamps reported by this link's own cells (as the per-link reindex did)
+    cols = present[rows].any(axis=0)
+    ts = timeline[cols]
+    total = throughput[rows][:, cols].sum(axis=0)
+
+    util_bins = UTILIZATION_FIGSIZE[0] * DPI
+    x, lo, hi = bin_peaks(ts, total, util_bins)
+
+    loss = has_loss[rows][:, cols]
+    heat_bins = HEATMAP_WIDTH_IN * DPI
+    if loss.shape[1] > heat_bins:
+        loss = np.logical_or.reduceat(loss, bin_starts(loss.shape[1], heat_bins), axis=1)
+
+    labels = [f"Cell {cid}" for cid in cell_ids if cid in row_of_cell]
+    return (x, lo, hi), (loss, ts[0], ts[-1], labels)
+
+def plot_link_utilization(link_id, cell_ids, optimal_cap, series, output_dir):
     """
     Generates 'Figure 3': Aggregated Throughput vs Capacity.
+    `series` is the (time, min, max) envelope from bin_peaks.
     """
-    # Align aggregation
-    # We need a common index. Since main.py aligns timelines, we can assume
-    # closely matching timestamps, but let's be safe and reindex to a master grid.
-    
-    # 1. Create master index from all cells in group
-    all_ts = set()
-    for cid in cell_ids:
-        if cid in cells_data:
-            all_ts.update(cells_data[cid]["timestamp"].values)
-            
-    master_index = sorted(list(all_ts))
-    agg_df = pd.DataFrame(index=master_index)
-    
-    # 2. Sum throughput
-    for cid in cell_ids:
-        if cid not in cells_data: continue
-        df = cells_data[cid].set_index("timestamp")
-        # Reindex to master, fill 0
-        df = df.reindex(master_index, fill_value=0)
-        agg_df[cid] = df["gbps"]
-        
-    agg_df["total_gbps"] = agg_df.sum(axis=1)
-    
-    # 3. Plot
-    plt.figure(figsize=(12, 6))
-    
-    # Plot total load
-    plt.plot(agg_df.index, agg_df["total_gbps"], color='black', linewidth=0.8, alpha=0.8, label="Aggregated Traffic")
-    
+    x, lo, hi = series
+
+    plt.figure(figsize=UTILIZATION_FIGSIZE)
+
+    # Plot total load (envelope of each pixel column, so peaks are never averaged away)
+    plt.fill_between(x, lo, hi, color='black', alpha=0.8, linewidth=0)
+    plt.plot(x, hi, color='black', linewidth=0.8, alpha=0.8, label="Aggregated Traffic")
+
     # Plot Optimal Capacity
-    plt.axhline(y=optimal_capacity, color='red', linestyle='--', linewidth=2, label=f"Required FH Link Capacity ({optimal_capacity} Gbps)")
-    
-    # Plot Peak (Reference)
-    # plt.axhline(y=peak_load, color='gray', linestyle=':', label=f"Peak Load ({peak_load} Gbps)")
-    
+    plt.axhline(y=optimal_cap, color='red', linestyle='--', linewidth=2, label=f"Required FH Link Capacity ({optimal_cap} Gbps)")
+
     plt.xlabel("Time [s]")
     plt.ylabel("Data rate [Gbps]")
     plt.title(f"Link {link_id} Capacity Requirement (Cells: {', '.join(cell_ids)})")
     plt.legend(loc="upper right")
     plt.grid(True, alpha=0.3)
-    
+
     out_path = output_dir / f"link_{link_id}_utilization.png"
-    plt.savefig(out_path, dpi=150)
+    plt.savefig(out_path, dpi=DPI)
     plt.close()
-    print(f"  -> Generated {out_path}")
+    return out_path
 
-def plot_loss_heatmap(link_id, cell_ids, cells_data, output_dir):
+def plot_loss_heatmap(link_id, heatmap, output_dir):
     """
     Generates 'Figure 1': Packet Loss Heatmap.
+    `heatmap` is (binary matrix binned to pixel width, t_start, t_end, labels).
     """
-    # 1. Prepare Matrix: Rows=Cells, Cols=Time
-    # Use same master index approach
-    all_ts = set()
-    for cid in cell_ids:
-        if cid in cells_data:
-            all_ts.update(cells_data[cid]["timestamp"].values)
-            
-    master_index = sorted(list(all_ts))
-    
-    # Filter to a specific window? 
-    # Validating on the WHOLE timeline might be huge image.
-    # Let's verify data duration. Usually 1-2 seconds based on logs.
-    # 2 seconds / 0.0005s (slot) = 4000 cols. Manageable.
-    
-    matrix_data = []
-    labels = []
-    
-    for cid in cell_ids:
-        if cid not in cells_data: continue
-        df = cells_data[cid].set_index("timestamp")
-        df = df.reindex(master_index, fill_value=0)
-        
-        # Binarize or Intensity? 
-        # Figure 1 shows black bars. Binary "Has Loss" or "No Loss" is cleanest.
-        loss_signal = df["packet_loss"].values
-        loss_signal[loss_signal > 0] = 1 # Binarize for simple visual
-        
-        matrix_data.append(loss_signal)
-        labels.append(f"Cell {cid}")
-        
-    if not matrix_data: return
-
-    matrix = np.array(matrix_data)
-    
-    # 2. Plot
-    plt.figure(figsize=(14, len(cell_ids)*0.8 + 2))
-    
+    matrix, t_start, t_end, labels = heatmap
+
+    plt.figure(figsize=(HEATMAP_WIDTH_IN, len(labels)*0.8 + 2))
+
     # Use binary colormap (White=No Loss, Black=Loss)
     plt.imshow(matrix, aspect='auto', cmap='Greys', interpolation='nearest',
-               extent=[master_index[0], master_index[-1], 0, len(cell_ids)])
-    
-    plt.yticks(np.arange(len(cell_ids)) + 0.5, labels[::-1]) # Reverse labels to match image top-down
+               extent=[t_start, t_end, 0, len(labels)])
+
+    plt.yticks(np.arange(len(labels)) + 0.5, labels[::-1]) # Reverse labels to match image top-down
     plt.xlabel("Time [s]")
     plt.title(f"Link {link_id}: Correlated Packet Loss Events")
-    
+
     out_path = output_dir / f"link_{link_id}_loss_heatmap.png"
-    plt.savefig(out_path, dpi=150)
+    plt.savefig(out_path, dpi=DPI)
     plt.close()
-    print(f"  -> Generated {out_path}")
+    return out_path
 
 def main():
+    args = get_args()
     links_df, cells = load_data()
     if links_df is None: return
-    
+
     output_dir = Path("output")
-    
+
+    print("Resampling cells onto a shared timeline...")
+    matrix = build_cell_matrix(cells)
+
     print("Generating Link Visualizations...")
-    
-    for _, row in links_df.iterrows():
-        link_id = row["Link_ID"]
-        
-        # Cells column is string representation of list: "['1', '2']" or space separated "1 2"
-        # topology.py saved it as space separated string "10 11 12" depending on implementation.
-        # Let's check topology.py line 205: " ".join(sorted(group_list))
-        # So it's space separated.
-        
-        cell_ids = str(row["Cells"]).split()
-        
-        opt_cap = float(row["Optimal_Capacity_Gbps"])
-        peak_load = float(row["Peak_Load_Gbps"])
-        
-        print(f"Processing Link {link_id}...")
-        
-        # 1. Utilization Plot
-        plot_link_utilization(link_id, cell_ids, opt_cap, peak_load, cells, output_dir)
-        
-        # 2. Heatmap Plot
-        plot_loss_heatmap(link_id, cell_ids, cells, output_dir)
-        
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = []
+        for _, row in links_df.iterrows():
+            link_id = row["Link_ID"]
+
+            # topology.py saves Cells as a space separated string "10 11 12"
+            cell_ids = str(row["Cells"]).split()
+
+            # Schema written by topology.py, with the older column name as fallback
+            opt_cap = float(row.get("Capacity_With_Buffer_Gbps", row.get("Optimal_Capacity_Gbps")))
+
+            prepared = prepare_link(link_id, cell_ids, matrix)
+            if prepared is None:
+                print(f"Skipping Link {link_id}: no cell data.")
+                continue
+            series, heatmap = prepared
+
+            # 1. Utilization Plot
+            futures.append(pool.submit(plot_link_utilization, link_id, cell_ids, opt_cap, series, output_dir))
+
+            # 2. Heatmap Plot
+            futures.append(pool.submit(plot_loss_heatmap, link_id, heatmap, output_dir))
+
+        for future in as_completed(futures):
+            print(f"  -> Generated {future.result()}")
+
     print("\nVisualization Complete.")
 
 if __name__ == "__main__":